@@ -0,0 +1,109 @@
+"""
+FarmTech Solutions - Fase 4: Métricas de Regressão em Uma Passada
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+
+class AcumuladorMetricas:
+    """MAE, MSE, RMSE, R² e momentos dos resíduos acumulados lote a lote (Welford/Chan)
+
+    Acumuladores de lotes ou workers diferentes se combinam com combinar(),
+    com o mesmo resultado de uma passada única sobre todas as previsões.
+    """
+
+    def __init__(self, limite_outlier=None):
+        self.n = 0
+        self.soma_abs = 0.0
+        self.media_residuo = 0.0
+        self.m2_residuo = 0.0
+        self.media_y = 0.0
+        self.m2_y = 0.0
+        # Outliers só podem ser contados em uma passada com um limite fixo de |resíduo|
+        self.limite_outlier = limite_outlier
+        self.outliers = 0
+
+    def atualizar(self, y_true, y_pred):
+        """Incorpora um lote de previsões; custo proporcional ao tamanho do lote"""
+        y_true = np.asarray(y_true, dtype=float).ravel()
+        residuos = y_true - np.asarray(y_pred, dtype=float).ravel()
+        n_lote = len(residuos)
+        if n_lote == 0:
+            return self
+
+        media_residuo = residuos.mean()
+        media_y = y_true.mean()
+
+        lote = AcumuladorMetricas(self.limite_outlier)
+        lote.n = n_lote
+        lote.soma_abs = float(np.abs(residuos).sum())
+        lote.media_residuo = float(media_residuo)
+        lote.m2_residuo = float(np.sum((residuos - media_residuo) ** 2))
+        lote.media_y = float(media_y)
+        lote.m2_y = float(np.sum((y_true - media_y) ** 2))
+        if self.limite_outlier is not None:
+            lote.outliers = int(np.count_nonzero(np.abs(residuos) > self.limite_outlier))
+
+        return self.combinar(lote)
+
+    def combinar(self, outro):
+        """Junta as estatísticas de outro acumulador (outro lote ou outro worker)"""
+        if outro.n == 0:
+            return self
+        if self.limite_outlier != outro.limite_outlier:
+            raise ValueError("Acumuladores com limites de outlier diferentes não podem ser combinados")
+
+        n_total = self.n + outro.n
+        fator = self.n * outro.n / n_total
+        delta_residuo = outro.media_residuo - self.media_residuo
+        delta_y = outro.media_y - self.media_y
+
+        self.soma_abs += outro.soma_abs
+        self.m2_residuo += outro.m2_residuo + fator * delta_residuo ** 2
+        self.m2_y += outro.m2_y + fator * delta_y ** 2
+        self.media_residuo += delta_residuo * outro.n / n_total
+        self.media_y += delta_y * outro.n / n_total
+        self.outliers += outro.outliers
+        self.n = n_total
+
+        return self
+
+    @property
+    def std_residuos(self):
+        """Desvio padrão populacional dos resíduos (como np.std)"""
+        return float(np.sqrt(self.m2_residuo / self.n)) if self.n else np.nan
+
+    def metricas(self):
+        """mae, mse, rmse e r2 (r2 segue o r2_score quando y_true é constante)"""
+        if self.n == 0:
+            return {'mae': np.nan, 'mse': np.nan, 'rmse': np.nan, 'r2': np.nan}
+
+        # Σr² = Σ(r - média)² + n·média²
+        sse = self.m2_residuo + self.n * self.media_residuo ** 2
+        mse = sse / self.n
+        if self.m2_y > 0:
+            r2 = 1 - sse / self.m2_y
+        else:
+            r2 = 1.0 if sse == 0 else 0.0
+
+        return {
+            'mae': self.soma_abs / self.n,
+            'mse': mse,
+            'rmse': float(np.sqrt(mse)),
+            'r2': r2
+        }
+
+    def resumo_residuos(self):
+        """Média, desvio padrão e |resíduo| médio (e outliers, se houver limite)"""
+        resumo = {
+            'media_residuos': self.media_residuo if self.n else np.nan,
+            'std_residuos': self.std_residuos,
+            'residuos_abs_medio': self.soma_abs / self.n if self.n else np.nan
+        }
+        if self.limite_outlier is not None:
+            resumo['outliers'] = self.outliers
+        return resumo
+
+def calcular_metricas(y_true, y_pred):
+    """Atalho para um único lote: mae, mse, rmse e r2 em uma passada"""
+    return AcumuladorMetricas().atualizar(y_true, y_pred).metricas()
@@ -0,0 +1,103 @@
+"""
+FarmTech Solutions - Fase 4: Carregamento Sob Demanda dos Artefatos Salvos
+Autor: Richard Schmitz - RM567951
+"""
+
+import os
+from collections.abc import MutableMapping
+import joblib
+
+# Início dos arquivos gravados pelo joblib: pickle (protocolo 2+) ou um dos compressores
+ASSINATURAS_COMPRESSAO = (b'\x78', b'\x1f\x8b', b'BZh', b'\xfd7zXZ', b']\x00\x00', b'\x04\x22\x4d\x18', b'ZF')
+
+def validar_artefato(caminho):
+    """Confere, sem desserializar, que o arquivo existe e parece um joblib completo
+
+    Pega arquivo ausente, vazio, de outro formato ou pickle truncado (sem o
+    STOP final); corrupção no meio do conteúdo só aparece ao carregar.
+    """
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f"Artefato não encontrado: {caminho}")
+
+    with open(caminho, 'rb') as f:
+        inicio = f.read(6)
+        if inicio[:1] == b'\x80':
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'.':
+                return
+            raise ValueError(f"Artefato truncado: {caminho}")
+        if not any(inicio.startswith(assinatura) for assinatura in ASSINATURAS_COMPRESSAO):
+            raise ValueError(f"Artefato inválido (não é um arquivo joblib): {caminho}")
+
+class ArtefatosPreguicosos(MutableMapping):
+    """Dicionário de artefatos joblib (modelo_{tipo}.pkl, scaler_{tipo}.pkl...) lidos no primeiro acesso
+
+    O cabeçalho de cada arquivo é validado na criação; como a leitura é adiada,
+    um erro de desserialização só aparece no primeiro acesso ao artefato, como
+    RuntimeError com o caminho do arquivo.
+    """
+
+    def __init__(self, diretorio, prefixo, nomes, mmap_mode=None):
+        # mmap_mode='r' abre direto do page cache (compartilhado entre os processos
+        # da máquina) só os arrays numpy guardados como tal no pickle, como os da
+        # FlorestaCompilada; modelos sklearn copiam os nós das árvores ao serem
+        # desserializados, então para eles o mmap não economiza memória
+        self.mmap_mode = mmap_mode
+        self._carregados = {}
+        self._pendentes = {}
+
+        for nome in nomes:
+            caminho = os.path.join(diretorio, f"{prefixo}_{nome}.pkl")
+            validar_artefato(caminho)
+            self._pendentes[nome] = caminho
+
+    def carregado(self, nome):
+        return nome in self._carregados
+
+    def origem(self, nome):
+        """Arquivo de um artefato ainda não lido (None se já foi carregado ou substituído)"""
+        return self._pendentes.get(nome)
+
+    def __getitem__(self, nome):
+        if nome not in self._carregados:
+            if nome not in self._pendentes:
+                raise KeyError(nome)
+            caminho = self._pendentes[nome]
+            try:
+                self._carregados[nome] = joblib.load(caminho, mmap_mode=self.mmap_mode)
+            except Exception as e:
+                raise RuntimeError(f"Erro ao carregar o artefato {caminho}: {e}") from e
+            del self._pendentes[nome]
+        return self._carregados[nome]
+
+    def __setitem__(self, nome, valor):
+        self._pendentes.pop(nome, None)
+        self._carregados[nome] = valor
+
+    def __delitem__(self, nome):
+        if nome in self._carregados:
+            del self._carregados[nome]
+        else:
+            del self._pendentes[nome]
+
+    def __contains__(self, nome):
+        # Não dispara o carregamento
+        return nome in self._carregados or nome in self._pendentes
+
+    def __iter__(self):
+        # Cópia das chaves: ler um artefato durante a iteração o move de _pendentes para _carregados
+        return iter(list(self._carregados) + list(self._pendentes))
+
+    def __len__(self):
+        return len(self._carregados) + len(self._pendentes)
+
+def carregar_artefatos(diretorio, tipos, mmap_modelos=None):
+    """Modelos e scalers de cada tipo, carregados sob demanda
+
+    A cópia compartilhada de um ensemble de árvores é a FlorestaCompilada
+    (compilado_{tipo}.pkl, aberta com mmap); o modelo sklearn só é lido quando
+    for necessário, por exemplo para um treinamento incremental.
+    """
+    modelos = ArtefatosPreguicosos(diretorio, 'modelo', tipos, mmap_mode=mmap_modelos)
+    scalers = ArtefatosPreguicosos(diretorio, 'scaler', tipos)
+    return modelos, scalers
@@ -0,0 +1,151 @@
+"""
+FarmTech Solutions - Fase 4: Avaliador Compilado de Ensembles de Árvores
+Autor: Richard Schmitz - RM567951
+"""
+
+import os
+import tempfile
+import numpy as np
+import joblib
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+# Linhas avaliadas por vez; limita a matriz (linhas x árvores) de nós correntes
+TAMANHO_BLOCO_AVALIACAO = 10_000
+
+class FlorestaCompilada:
+    """Árvores de um ensemble achatadas em arrays contíguos (feature, threshold, esquerda, direita, valor)"""
+
+    def __init__(self, feature, threshold, esquerda, direita, valor, raizes, profundidade,
+                 peso=1.0, base=0.0, n_features=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.esquerda = esquerda
+        self.direita = direita
+        self.valor = valor
+        self.raizes = raizes
+        self.profundidade = profundidade
+        self.peso = peso
+        self.base = base
+        self.n_features = n_features
+
+    @classmethod
+    def de_arvores(cls, arvores, peso=1.0, base=0.0):
+        """Concatena as árvores (DecisionTreeRegressor) em um único conjunto de arrays"""
+        features, thresholds, esquerdas, direitas, valores, raizes = [], [], [], [], [], []
+        deslocamento = 0
+        profundidade = 0
+
+        for arvore in arvores:
+            tree = arvore.tree_
+            n_nos = tree.node_count
+            indices = np.arange(n_nos) + deslocamento
+            folha = tree.children_left == -1
+
+            # Folhas apontam para si mesmas e sempre "descem" para a esquerda:
+            # todas as linhas podem andar o mesmo número de passos
+            features.append(np.where(folha, 0, tree.feature))
+            thresholds.append(np.where(folha, np.inf, tree.threshold))
+            esquerdas.append(np.where(folha, indices, tree.children_left + deslocamento))
+            direitas.append(np.where(folha, indices, tree.children_right + deslocamento))
+            valores.append(tree.value[:, 0, 0])
+            raizes.append(deslocamento)
+
+            profundidade = max(profundidade, tree.max_depth)
+            deslocamento += n_nos
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            esquerda=np.concatenate(esquerdas).astype(np.int32),
+            direita=np.concatenate(direitas).astype(np.int32),
+            valor=np.concatenate(valores).astype(np.float64),
+            raizes=np.asarray(raizes, dtype=np.int32),
+            profundidade=int(profundidade),
+            peso=float(peso),
+            base=float(base),
+            n_features=arvores[0].n_features_in_
+        )
+
+    @classmethod
+    def de_modelo(cls, modelo):
+        """Compila um RandomForestRegressor, GradientBoostingRegressor ou DecisionTreeRegressor"""
+        # Os arrays guardam um valor por folha: com várias saídas, só a primeira sobraria
+        if getattr(modelo, 'n_outputs_', 1) > 1:
+            raise ValueError(f"Modelo com {modelo.n_outputs_} saídas não é suportado")
+
+        if isinstance(modelo, RandomForestRegressor):
+            return cls.de_arvores(modelo.estimators_, peso=1.0 / len(modelo.estimators_))
+
+        if isinstance(modelo, GradientBoostingRegressor):
+            if modelo.init_ == 'zero':
+                base = 0.0
+            elif isinstance(modelo.init_, DummyRegressor):
+                base = modelo.init_.constant_.ravel()[0]
+            else:
+                raise ValueError("Gradient Boosting com estimador inicial personalizado não é suportado")
+            return cls.de_arvores(modelo.estimators_[:, 0], peso=modelo.learning_rate, base=base)
+
+        if isinstance(modelo, DecisionTreeRegressor):
+            return cls.de_arvores([modelo])
+
+        raise ValueError(f"Modelo não suportado: {type(modelo).__name__}")
+
+    @property
+    def n_arvores(self):
+        return len(self.raizes)
+
+    def folhas(self, X):
+        """Índice (global) da folha alcançada por cada linha em cada árvore"""
+        # O sklearn compara as features em float32 com limiares em float64
+        X = np.asarray(X, dtype=np.float32)
+        linhas = np.arange(len(X))[:, None]
+        nos = np.broadcast_to(self.raizes, (len(X), self.n_arvores))
+
+        for _ in range(self.profundidade):
+            vai_esquerda = X[linhas, self.feature[nos]] <= self.threshold[nos]
+            nos = np.where(vai_esquerda, self.esquerda[nos], self.direita[nos])
+
+        return nos
+
+    def predict(self, X):
+        """Previsões do ensemble, equivalentes ao predict do modelo original"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+
+        previsoes = np.empty(len(X))
+        for inicio in range(0, len(X), TAMANHO_BLOCO_AVALIACAO):
+            bloco = slice(inicio, inicio + TAMANHO_BLOCO_AVALIACAO)
+            previsoes[bloco] = self.valor[self.folhas(X[bloco])].sum(axis=1)
+
+        return self.base + self.peso * previsoes
+
+    def salvar(self, caminho):
+        """Grava os arrays sem compressão, para que possam ser abertos com mmap
+
+        O arquivo é escrito ao lado e trocado com os.replace: processos que já
+        mapearam a versão anterior continuam lendo o inode antigo.
+        """
+        descritor, temporario = tempfile.mkstemp(prefix=os.path.basename(caminho) + '.',
+                                                 suffix='.tmp', dir=os.path.dirname(caminho) or '.')
+        os.close(descritor)
+        try:
+            joblib.dump(self, temporario)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.remove(temporario)
+            raise
+
+    @staticmethod
+    def carregar(caminho, mmap_mode='r'):
+        # Com mmap_mode='r' os processos da máquina compartilham os arrays pelo page cache
+        return joblib.load(caminho, mmap_mode=mmap_mode)
+
+def compilar_modelo(modelo):
+    """FlorestaCompilada equivalente ao modelo, ou None se ele não for um ensemble de árvores"""
+    try:
+        return FlorestaCompilada.de_modelo(modelo)
+    except ValueError:
+        return None
@@ -0,0 +1,132 @@
+"""
+FarmTech Solutions - Fase 4: Leitura e Armazenamento dos Dados dos Sensores
+Autor: Richard Schmitz - RM567951
+"""
+
+import glob
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+try:
+    import pyarrow  # backend Parquet do pandas
+    PARQUET_DISPONIVEL = True
+except ImportError:
+    PARQUET_DISPONIVEL = False
+
+# Tipos explícitos das colunas do CSV exportado pelos sensores IoT
+DTYPES_SENSORES = {
+    'umidade_solo': 'float64',
+    'ph_solo': 'float64',
+    'nitrogenio': 'int8',
+    'fosforo': 'int8',
+    'potassio': 'int8',
+    'temperatura': 'float64',
+    'chuva_mm': 'float64',
+    'irrigacao_ativa': 'int8'
+}
+
+# Tipos usados no armazenamento colunar: os mesmos do CSV, para que os valores
+# lidos da cópia Parquet sejam idênticos aos do CSV (sem perda em float32)
+DTYPES_ARMAZENAMENTO = dict(DTYPES_SENSORES)
+
+# Quantidade de linhas lidas por bloco no modo streaming
+TAMANHO_BLOCO_PADRAO = 100_000
+
+def ler_csv_em_blocos(arquivo_path="../data/dados_treinamento.csv", tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Lê o CSV dos sensores em blocos de tamanho fixo, sem carregar o arquivo inteiro"""
+    leitor = pd.read_csv(
+        arquivo_path,
+        dtype=DTYPES_SENSORES,
+        parse_dates=['timestamp'],
+        chunksize=tamanho_bloco
+    )
+
+    with leitor:
+        for bloco in leitor:
+            yield bloco
+
+def caminho_parquet(arquivo_csv):
+    """Diretório Parquet correspondente a um CSV de sensores"""
+    return os.path.splitext(arquivo_csv)[0] + '.parquet'
+
+def _assinatura_origem(arquivo_csv):
+    # Os tipos entram na assinatura: cópias gravadas com outros tipos são refeitas
+    info = os.stat(arquivo_csv)
+    return {'tamanho': info.st_size, 'mtime_ns': info.st_mtime_ns, 'tipos': DTYPES_ARMAZENAMENTO}
+
+def parquet_atualizado(arquivo_csv, diretorio=None):
+    """Verifica se a cópia Parquet corresponde à versão atual do CSV"""
+    diretorio = diretorio or caminho_parquet(arquivo_csv)
+    arquivo_origem = os.path.join(diretorio, '_origem.json')
+
+    if not os.path.exists(arquivo_origem):
+        return False
+
+    with open(arquivo_origem, 'r') as f:
+        return json.load(f) == _assinatura_origem(arquivo_csv)
+
+def converter_csv_para_parquet(arquivo_csv="../data/dados_treinamento.csv", diretorio=None,
+                               tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """Converte o CSV uma única vez em partes Parquet (uma por bloco lido)"""
+    diretorio = diretorio or caminho_parquet(arquivo_csv)
+
+    # Escreve em diretório temporário próprio (processos simultâneos não colidem)
+    # e troca no final para não deixar conversão pela metade
+    pasta, nome = os.path.split(os.path.abspath(diretorio))
+    temporario = tempfile.mkdtemp(prefix=f"{nome}.", suffix='.tmp', dir=pasta)
+
+    for i, bloco in enumerate(ler_csv_em_blocos(arquivo_csv, tamanho_bloco)):
+        bloco = bloco.astype(DTYPES_ARMAZENAMENTO)
+        bloco.to_parquet(os.path.join(temporario, f"parte_{i:05d}.parquet"), index=False)
+
+    with open(os.path.join(temporario, '_origem.json'), 'w') as f:
+        json.dump(_assinatura_origem(arquivo_csv), f)
+
+    shutil.rmtree(diretorio, ignore_errors=True)
+    try:
+        os.replace(temporario, diretorio)
+    except OSError:
+        # Outro processo terminou a mesma conversão antes
+        shutil.rmtree(temporario, ignore_errors=True)
+        if not parquet_atualizado(arquivo_csv, diretorio):
+            raise
+
+    return diretorio
+
+def _ler_csv(arquivo_path, colunas, nrows=None):
+    return pd.read_csv(
+        arquivo_path,
+        usecols=colunas,
+        dtype=DTYPES_SENSORES,
+        parse_dates=['timestamp'] if colunas is None or 'timestamp' in colunas else False,
+        nrows=nrows
+    )
+
+def carregar_sensores(arquivo_path="../data/dados_treinamento.csv", colunas=None):
+    """Carrega os dados dos sensores lendo apenas as colunas pedidas
+
+    Os valores e tipos são os mesmos do CSV, venham eles do CSV ou da cópia Parquet.
+    """
+    colunas = list(colunas) if colunas is not None else None
+
+    # Sem pyarrow, lê direto do CSV
+    if not PARQUET_DISPONIVEL:
+        return _ler_csv(arquivo_path, colunas)
+
+    # A cópia Parquet é (re)gerada automaticamente quando o CSV muda
+    diretorio = caminho_parquet(arquivo_path)
+    if not parquet_atualizado(arquivo_path, diretorio):
+        converter_csv_para_parquet(arquivo_path, diretorio)
+
+    partes = sorted(glob.glob(os.path.join(diretorio, 'parte_*.parquet')))
+    if not partes:
+        # CSV só com o cabeçalho: nenhum bloco foi convertido
+        return _ler_csv(arquivo_path, colunas, nrows=0)
+
+    return pd.concat(
+        [pd.read_parquet(parte, columns=colunas) for parte in partes],
+        ignore_index=True
+    )
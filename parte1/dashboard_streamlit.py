@@ -11,6 +11,7 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
 from ml_pipeline import FarmTechMLPipeline
+from feature_store import FeatureStore
 
 # Configuração da página
 st.set_page_config(
@@ -19,10 +20,19 @@ st.set_page_config(
     layout="wide"
 )
 
+# Colunas usadas pelas páginas de dados (as demais não são lidas do feature store)
+COLUNAS_DASHBOARD = ['timestamp', 'umidade_solo', 'ph_solo', 'nitrogenio', 'fosforo', 'potassio',
+                     'temperatura', 'chuva_mm', 'irrigacao_ativa', 'hora', 'nutrientes_total']
+
+# Feature store compartilhado entre as páginas
+@st.cache_resource
+def carregar_feature_store():
+    return FeatureStore()
+
 # Inicializar pipeline ML
 @st.cache_resource
 def carregar_pipeline():
-    pipeline = FarmTechMLPipeline()
+    pipeline = FarmTechMLPipeline(carregar_feature_store())
     if not pipeline.carregar_modelos():
         # Se não conseguir carregar, treinar novos modelos
         pipeline.executar_pipeline_completo()
@@ -55,9 +65,7 @@ def dashboard_principal(pipeline):
     st.header("Dashboard Principal")
     
     # Carregar dados
-    df = pd.read_csv("../data/dados_treinamento.csv")
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['nutrientes_total'] = df['nitrogenio'] + df['fosforo'] + df['potassio']
+    df = carregar_feature_store().obter("../data/dados_treinamento.csv", COLUNAS_DASHBOARD)
     
     # Métricas principais
     col1, col2, col3, col4 = st.columns(4)
@@ -207,14 +215,13 @@ def analise_dados():
     st.header("Análise Exploratória dos Dados")
     
     # Carregar dados
-    df = pd.read_csv("../data/dados_treinamento.csv")
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['hora'] = df['timestamp'].dt.hour
-    df['nutrientes_total'] = df['nitrogenio'] + df['fosforo'] + df['potassio']
+    df = carregar_feature_store().obter("../data/dados_treinamento.csv", COLUNAS_DASHBOARD)
     
     # Estatísticas descritivas
     st.subheader("Estatísticas Descritivas")
-    st.dataframe(df.describe())
+    colunas_descritivas = ['umidade_solo', 'ph_solo', 'nitrogenio', 'fosforo', 'potassio',
+                           'temperatura', 'chuva_mm', 'irrigacao_ativa', 'hora', 'nutrientes_total']
+    st.dataframe(df[colunas_descritivas].describe())
     
     # Distribuições
     col1, col2 = st.columns(2)
@@ -9,31 +9,71 @@ from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
+from joblib import Parallel, delayed
 import os
+from dados_sensores import ler_csv_em_blocos, TAMANHO_BLOCO_PADRAO
+from feature_store import FeatureStore, criar_features_basicas
+from treino_incremental import EstatisticasSuficientes, aplicar_coeficientes
+from artefatos import ArtefatosPreguicosos, carregar_artefatos
+from arvores_compiladas import compilar_modelo
+from acumulador_metricas import calcular_metricas
+
+# Modelos do pipeline básico: (tipo, método de treino, mensagem de progresso)
+ETAPAS_TREINAMENTO = [
+    ('umidade', 'treinar_modelo_umidade', "Treinando modelo de umidade..."),
+    ('ph', 'treinar_modelo_ph', "Treinando modelo de pH..."),
+    ('irrigacao', 'treinar_modelo_irrigacao', "Treinando modelo de irrigação...")
+]
+
+# Variável alvo de cada modelo
+ALVOS = {
+    'umidade': 'umidade_solo',
+    'ph': 'ph_solo',
+    'irrigacao': 'irrigacao_ativa'
+}
+
+# Colunas que o pipeline lê do feature store (features dos três modelos e alvos)
+COLUNAS_PIPELINE = ['temperatura', 'chuva_mm', 'hora', 'nutrientes_total', 'nitrogenio', 'fosforo',
+                    'potassio', 'umidade_solo', 'ph_solo', 'irrigacao_ativa']
+
+def _ja_salvo(artefatos, nome, arquivo):
+    """O artefato ainda não foi lido e vem exatamente desse arquivo"""
+    origem = artefatos.origem(nome) if isinstance(artefatos, ArtefatosPreguicosos) else None
+    return origem is not None and os.path.abspath(origem) == os.path.abspath(arquivo)
+
+def _treinar_modelo_isolado(tipo, nome_metodo, df):
+    """Treina um único modelo em um processo separado"""
+    pipeline = FarmTechMLPipeline()
+    model, scaler, metrics = getattr(pipeline, nome_metodo)(df)
+    return model, scaler, metrics, pipeline.estatisticas.get(tipo)
 
 class FarmTechMLPipeline:
-    def __init__(self):
+    def __init__(self, feature_store=None):
         self.models = {}
         self.scalers = {}
         self.metrics = {}
+        self.estatisticas = {}
+        self.compilados = {}
+        self.feature_store = feature_store or FeatureStore()
         
     def carregar_dados(self, arquivo_path="../data/dados_treinamento.csv"):
         """Carrega e prepara os dados para treinamento"""
         try:
-            df = pd.read_csv(arquivo_path)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            # Criar features adicionais
-            df['hora'] = df['timestamp'].dt.hour
-            df['nutrientes_total'] = df['nitrogenio'] + df['fosforo'] + df['potassio']
-            
-            return df
+            return self.feature_store.obter(arquivo_path, COLUNAS_PIPELINE)
         except Exception as e:
             print(f"Erro ao carregar dados: {e}")
             return None
     
+    def carregar_dados_em_blocos(self, arquivo_path="../data/dados_treinamento.csv", tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """Modo streaming: gera blocos do histórico já com as features, com memória limitada"""
+        for bloco in ler_csv_em_blocos(arquivo_path, tamanho_bloco):
+            yield self.criar_features(bloco)
+    
+    def criar_features(self, df):
+        """Cria features adicionais a partir das leituras brutas"""
+        return criar_features_basicas(df)
+    
     def preparar_features(self, df):
         """Prepara features para os modelos"""
         features = {
@@ -65,18 +105,16 @@ class FarmTechMLPipeline:
         y_pred = model.predict(X_test_scaled)
         
         # Calcular métricas
-        metrics = {
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred)
-        }
+        metrics = calcular_metricas(y_test, y_pred)
         
         # Salvar modelo e scaler
         self.models['umidade'] = model
         self.scalers['umidade'] = scaler
         self.metrics['umidade'] = metrics
         
+        # Estatísticas para atualizações incrementais
+        self.estatisticas['umidade'] = EstatisticasSuficientes(len(features)).atualizar(X_train, y_train)
+        
         return model, scaler, metrics
     
     def treinar_modelo_ph(self, df):
@@ -96,16 +134,12 @@ class FarmTechMLPipeline:
         
         y_pred = model.predict(X_test_scaled)
         
-        metrics = {
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred)
-        }
+        metrics = calcular_metricas(y_test, y_pred)
         
         self.models['ph'] = model
         self.scalers['ph'] = scaler
         self.metrics['ph'] = metrics
+        self.estatisticas['ph'] = EstatisticasSuficientes(len(features)).atualizar(X_train, y_train)
         
         return model, scaler, metrics
     
@@ -126,16 +160,12 @@ class FarmTechMLPipeline:
         
         y_pred = model.predict(X_test_scaled)
         
-        metrics = {
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred)
-        }
+        metrics = calcular_metricas(y_test, y_pred)
         
         self.models['irrigacao'] = model
         self.scalers['irrigacao'] = scaler
         self.metrics['irrigacao'] = metrics
+        self.compilados.pop('irrigacao', None)
         
         return model, scaler, metrics
     
@@ -143,9 +173,27 @@ class FarmTechMLPipeline:
         """Salva todos os modelos treinados"""
         os.makedirs(diretorio, exist_ok=True)
         
-        for nome, modelo in self.models.items():
-            joblib.dump(modelo, f"{diretorio}/modelo_{nome}.pkl")
-            joblib.dump(self.scalers[nome], f"{diretorio}/scaler_{nome}.pkl")
+        for nome in self.models:
+            # Artefatos ainda não lidos já estão nesse arquivo: não são carregados
+            # (a floresta sklearn) nem regravados sobre um arquivo em uso
+            for prefixo, artefatos in (('modelo', self.models), ('scaler', self.scalers)):
+                arquivo = f"{diretorio}/{prefixo}_{nome}.pkl"
+                if not _ja_salvo(artefatos, nome, arquivo):
+                    joblib.dump(artefatos[nome], arquivo)
+        
+        for nome, estatisticas in self.estatisticas.items():
+            joblib.dump(estatisticas, f"{diretorio}/estatisticas_{nome}.pkl")
+        
+        # Ensembles de árvores também são salvos achatados, prontos para mmap
+        for nome in self.models:
+            arquivo = f"{diretorio}/compilado_{nome}.pkl"
+            if _ja_salvo(self.compilados, nome, arquivo):
+                continue
+            compilado = self.avaliador_compilado(nome)
+            if compilado is not None:
+                compilado.salvar(arquivo)
+            elif os.path.exists(arquivo):
+                os.remove(arquivo)
         
         # Salvar métricas
         import json
@@ -153,11 +201,21 @@ class FarmTechMLPipeline:
             json.dump(self.metrics, f, indent=2)
     
     def carregar_modelos(self, diretorio="../models/modelos_treinados"):
-        """Carrega modelos salvos"""
+        """Carrega modelos salvos (cada tipo é lido do disco só quando usado pela primeira vez)"""
         try:
-            for nome in ['umidade', 'ph', 'irrigacao']:
-                self.models[nome] = joblib.load(f"{diretorio}/modelo_{nome}.pkl")
-                self.scalers[nome] = joblib.load(f"{diretorio}/scaler_{nome}.pkl")
+            self.models, self.scalers = carregar_artefatos(diretorio, list(ALVOS))
+            
+            # Com a versão compilada disponível, o modelo sklearn nem precisa ser lido
+            self.compilados = ArtefatosPreguicosos(
+                diretorio, 'compilado',
+                [nome for nome in ALVOS if os.path.exists(f"{diretorio}/compilado_{nome}.pkl")],
+                mmap_mode='r'
+            )
+            
+            for nome in ALVOS:
+                # Estatísticas só existem para modelos treinados com suporte incremental
+                if os.path.exists(f"{diretorio}/estatisticas_{nome}.pkl"):
+                    self.estatisticas[nome] = joblib.load(f"{diretorio}/estatisticas_{nome}.pkl")
             
             import json
             with open(f"{diretorio}/metricas.json", 'r') as f:
@@ -168,18 +226,41 @@ class FarmTechMLPipeline:
             print(f"Erro ao carregar modelos: {e}")
             return False
     
-    def fazer_previsao(self, tipo, dados):
-        """Faz previsão usando modelo específico"""
+    def avaliador_compilado(self, tipo):
+        """FlorestaCompilada do modelo (None se ele não for um ensemble de árvores)"""
+        if tipo not in self.compilados:
+            self.compilados[tipo] = compilar_modelo(self.models[tipo])
+        return self.compilados[tipo]
+    
+    def fazer_previsoes_em_lote(self, tipo, matriz):
+        """Faz previsões para várias leituras de uma só vez (uma linha por leitura)"""
         if tipo not in self.models:
             return None
         
-        dados_scaled = self.scalers[tipo].transform([dados])
-        previsao = self.models[tipo].predict(dados_scaled)[0]
+        # DataFrames mantêm os nomes das colunas usados no treinamento
+        if not isinstance(matriz, pd.DataFrame):
+            matriz = np.asarray(matriz, dtype=float)
+            if matriz.ndim == 1:
+                matriz = matriz.reshape(1, -1)
+        
+        dados_scaled = self.scalers[tipo].transform(matriz)
+        
+        # Ensembles de árvores são avaliados pelos arrays achatados, sem passar pelo sklearn
+        modelo = self.avaliador_compilado(tipo) or self.models[tipo]
+        previsoes = modelo.predict(dados_scaled)
         
-        return previsao
+        return previsoes
     
-    def executar_pipeline_completo(self):
-        """Executa pipeline completo de treinamento"""
+    def fazer_previsao(self, tipo, dados):
+        """Faz previsão usando modelo específico"""
+        previsoes = self.fazer_previsoes_em_lote(tipo, [dados])
+        if previsoes is None:
+            return None
+        
+        return previsoes[0]
+    
+    def executar_pipeline_completo(self, n_jobs=1):
+        """Executa pipeline completo de treinamento (n_jobs > 1 treina em paralelo)"""
         print("Iniciando pipeline de Machine Learning...")
         
         # Carregar dados
@@ -190,20 +271,83 @@ class FarmTechMLPipeline:
         print(f"Dados carregados: {len(df)} registros")
         
         # Treinar modelos
-        print("Treinando modelo de umidade...")
-        self.treinar_modelo_umidade(df)
-        
-        print("Treinando modelo de pH...")
-        self.treinar_modelo_ph(df)
-        
-        print("Treinando modelo de irrigação...")
-        self.treinar_modelo_irrigacao(df)
+        self.treinar_modelos(df, n_jobs=n_jobs)
         
         # Salvar modelos
         print("Salvando modelos...")
         self.salvar_modelos()
         
         # Exibir métricas
+        self.exibir_metricas()
+        
+        print("\nPipeline concluído com sucesso!")
+        return True
+    
+    def treinar_modelos(self, df, n_jobs=1):
+        """Treina os modelos de umidade, pH e irrigação (n_jobs > 1 treina em paralelo)"""
+        if n_jobs == 1:
+            for _, nome_metodo, mensagem in ETAPAS_TREINAMENTO:
+                print(mensagem)
+                getattr(self, nome_metodo)(df)
+        else:
+            print(f"Treinando {len(ETAPAS_TREINAMENTO)} modelos em paralelo (n_jobs={n_jobs})...")
+            saidas = Parallel(n_jobs=n_jobs)(
+                delayed(_treinar_modelo_isolado)(tipo, nome_metodo, df)
+                for tipo, nome_metodo, _ in ETAPAS_TREINAMENTO
+            )
+            
+            for (tipo, _, _), (model, scaler, metrics, estatisticas) in zip(ETAPAS_TREINAMENTO, saidas):
+                self.models[tipo] = model
+                self.scalers[tipo] = scaler
+                self.metrics[tipo] = metrics
+                self.compilados.pop(tipo, None)
+                if estatisticas is not None:
+                    self.estatisticas[tipo] = estatisticas
+    
+    def atualizar_modelo_linear(self, tipo, df_novos):
+        """Atualiza o modelo de umidade ou pH usando apenas as linhas novas"""
+        features = self.preparar_features(df_novos)[tipo]
+        X = df_novos[features]
+        y = df_novos[ALVOS[tipo]]
+        
+        # Scaler e estatísticas acumulam as linhas novas; os coeficientes saem
+        # das estatísticas, sem revisitar o histórico
+        self.scalers[tipo].partial_fit(X)
+        self.estatisticas[tipo].atualizar(X, y)
+        aplicar_coeficientes(self.models[tipo], self.estatisticas[tipo], self.scalers[tipo])
+        
+        return self.models[tipo]
+    
+    def atualizar_modelo_irrigacao(self, df_novos, arvores_adicionais=10):
+        """Acrescenta árvores treinadas só com as linhas novas à Random Forest"""
+        features = self.preparar_features(df_novos)['irrigacao']
+        X = df_novos[features]
+        y = df_novos[ALVOS['irrigacao']]
+        
+        # O scaler fica congelado: os limiares das árvores existentes foram
+        # aprendidos no espaço normalizado original
+        X_scaled = self.scalers['irrigacao'].transform(X)
+        
+        model = self.models['irrigacao']
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + arvores_adicionais)
+        model.fit(X_scaled, y)
+        self.compilados.pop('irrigacao', None)
+        
+        return model
+    
+    def atualizar_modelos(self, df_novos, arvores_adicionais=10):
+        """Treinamento incremental: atualiza os modelos com as linhas novas"""
+        df_novos = self.criar_features(df_novos.copy())
+        
+        for tipo in ['umidade', 'ph']:
+            if tipo in self.models and tipo in self.estatisticas:
+                self.atualizar_modelo_linear(tipo, df_novos)
+        
+        if 'irrigacao' in self.models:
+            self.atualizar_modelo_irrigacao(df_novos, arvores_adicionais)
+    
+    def exibir_metricas(self):
+        """Exibe as métricas dos modelos treinados"""
         print("\nMétricas dos Modelos:")
         for modelo, metricas in self.metrics.items():
             print(f"\n{modelo.upper()}:")
@@ -211,9 +355,6 @@ class FarmTechMLPipeline:
             print(f"  MSE: {metricas['mse']:.4f}")
             print(f"  RMSE: {metricas['rmse']:.4f}")
             print(f"  R²: {metricas['r2']:.4f}")
-        
-        print("\nPipeline concluído com sucesso!")
-        return True
 
 def main():
     pipeline = FarmTechMLPipeline()
@@ -0,0 +1,74 @@
+"""
+FarmTech Solutions - Fase 4: Treinamento Incremental de Modelos Lineares
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+
+class EstatisticasSuficientes:
+    """Médias e co-momentos de X e y, acumulados lote a lote (fórmula de Chan)"""
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.media_x = np.zeros(n_features)
+        self.media_y = 0.0
+        self.cxx = np.zeros((n_features, n_features))
+        self.cxy = np.zeros(n_features)
+
+    def atualizar(self, X, y):
+        """Incorpora um lote de linhas novas; custo proporcional ao tamanho do lote"""
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n_lote = len(y)
+        if n_lote == 0:
+            return self
+
+        media_x_lote = X.mean(axis=0)
+        media_y_lote = y.mean()
+        Xc = X - media_x_lote
+        yc = y - media_y_lote
+
+        n_total = self.n + n_lote
+        delta_x = media_x_lote - self.media_x
+        delta_y = media_y_lote - self.media_y
+        fator = self.n * n_lote / n_total
+
+        self.cxx += Xc.T @ Xc + fator * np.outer(delta_x, delta_x)
+        self.cxy += Xc.T @ yc + fator * delta_x * delta_y
+        self.media_x += delta_x * n_lote / n_total
+        self.media_y += delta_y * n_lote / n_total
+        self.n = n_total
+
+        return self
+
+    def coeficientes(self, scaler=None, alpha=0.0):
+        """Coeficientes e intercepto no espaço de entrada do regressor"""
+        # Com scaler, as features chegam ao regressor como (x - mean_) / scale_;
+        # alpha > 0 reproduz a penalização do Ridge, alpha = 0 a LinearRegression
+        if scaler is not None:
+            media = scaler.mean_
+            escala = scaler.scale_
+        else:
+            media = np.zeros_like(self.media_x)
+            escala = np.ones_like(self.media_x)
+
+        szz = self.cxx / np.outer(escala, escala)
+        szy = self.cxy / escala
+
+        if alpha > 0:
+            coef = np.linalg.solve(szz + alpha * np.eye(len(szy)), szy)
+        else:
+            # lstsq devolve a solução de norma mínima, como a LinearRegression
+            coef = np.linalg.lstsq(szz, szy, rcond=None)[0]
+
+        intercepto = self.media_y - ((self.media_x - media) / escala) @ coef
+        return coef, intercepto
+
+def aplicar_coeficientes(regressor, estatisticas, scaler=None):
+    """Atualiza coef_/intercept_ de uma LinearRegression ou Ridge a partir das estatísticas"""
+    alpha = getattr(regressor, 'alpha', 0.0)
+    coef, intercepto = estatisticas.coeficientes(scaler, alpha)
+
+    regressor.coef_ = coef
+    regressor.intercept_ = intercepto
+    return regressor
@@ -18,6 +18,7 @@ from ml_pipeline import FarmTechMLPipeline
 from modelos_preditivos import ModelosPreditivosAvancados
 from avaliacao_modelos import AvaliacaoModelos
 from recomendacoes import SistemaRecomendacoes
+from feature_store import FeatureStore
 
 # Configuração da página
 st.set_page_config(
@@ -62,11 +63,14 @@ st.markdown("""
 @st.cache_resource
 def inicializar_sistema():
     """Inicializa todos os componentes do sistema"""
+    # Features calculadas uma vez e compartilhadas por todos os componentes
+    feature_store = FeatureStore()
+    
     # Pipeline básico
-    pipeline_basico = FarmTechMLPipeline()
+    pipeline_basico = FarmTechMLPipeline(feature_store)
     
     # Modelos avançados
-    modelos_avancados = ModelosPreditivosAvancados()
+    modelos_avancados = ModelosPreditivosAvancados(feature_store)
     
     # Sistema de recomendações
     sistema_rec = SistemaRecomendacoes()
@@ -74,14 +78,14 @@ def inicializar_sistema():
     # Avaliação
     avaliacao = AvaliacaoModelos()
     
-    return pipeline_basico, modelos_avancados, sistema_rec, avaliacao
+    return pipeline_basico, modelos_avancados, sistema_rec, avaliacao, feature_store
 
 def main():
     st.markdown('<h1 class="main-header">🌱 FarmTech Solutions - Assistente Agrícola IA</h1>', unsafe_allow_html=True)
     st.markdown("**Sistema Completo de Inteligência Artificial para Otimização do Cultivo de Soja**")
     
     # Inicializar sistema
-    pipeline_basico, modelos_avancados, sistema_rec, avaliacao = inicializar_sistema()
+    pipeline_basico, modelos_avancados, sistema_rec, avaliacao, feature_store = inicializar_sistema()
     
     # Sidebar
     st.sidebar.title("🚀 Navegação")
@@ -102,7 +106,7 @@ def main():
     
     # Executar funcionalidade selecionada
     if opcao == "🏠 Dashboard Principal":
-        dashboard_principal()
+        dashboard_principal(feature_store)
     elif opcao == "🤖 Pipeline ML Completo":
         pipeline_ml_completo(pipeline_basico, modelos_avancados)
     elif opcao == "📊 Modelos Preditivos":
@@ -116,14 +120,12 @@ def main():
     elif opcao == "📋 Relatório Executivo":
         relatorio_executivo()
 
-def dashboard_principal():
+def dashboard_principal(feature_store):
     st.header("🏠 Dashboard Principal")
     
     # Carregar dados
     try:
-        df = pd.read_csv("../data/dados_treinamento.csv")
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['nutrientes_total'] = df['nitrogenio'] + df['fosforo'] + df['potassio']
+        df = feature_store.obter("../data/dados_treinamento.csv")
     except:
         st.error("Erro ao carregar dados. Verifique se o arquivo existe.")
         return
@@ -237,7 +239,7 @@ def pipeline_ml_completo(pipeline_basico, modelos_avancados):
                 # Etapa 2: Modelos avançados
                 status_text.text("Treinando modelos avançados...")
                 progress_bar.progress(60)
-                resultados, cv_results = modelos_avancados.treinar_todos_modelos()
+                resultados, cv_results = modelos_avancados.treinar_todos_modelos(salvar=False)
                 
                 # Etapa 3: Salvando modelos
                 status_text.text("Salvando modelos...")
@@ -351,8 +353,8 @@ def modelos_preditivos_interface(modelos_avancados):
                 )
                 
                 # Linha de referência perfeita
-                min_val = min(min(resultado['y_test']), min(resultado['y_pred']))
-                max_val = max(max(resultado['y_test']), max(resultado['y_pred']))
+                min_val = min(np.min(resultado['y_test']), np.min(resultado['y_pred']))
+                max_val = max(np.max(resultado['y_test']), np.max(resultado['y_pred']))
                 fig.add_shape(
                     type="line",
                     x0=min_val, y0=min_val,
@@ -413,7 +415,7 @@ def avaliacao_performance(avaliacao):
             st.success("✅ Resultados carregados com sucesso!")
             
             # Calcular métricas comparativas
-            metricas = avaliacao.calcular_metricas_comparativas()
+            avaliacao.calcular_metricas_comparativas()
             
             # Rankings
             rankings = avaliacao.ranking_modelos()
@@ -439,11 +441,12 @@ def avaliacao_performance(avaliacao):
             # Gráfico comparativo
             st.subheader("📊 Comparação Visual")
             
-            modelos = list(metricas['r2'].keys())
-            r2_values = list(metricas['r2'].values())
+            # Mesmos dados da figura de comparacao_visual, sem renderizar a imagem
+            grafico_r2 = avaliacao.especificacao_visual()['graficos'][0]
+            r2_values = grafico_r2['y']
             
             fig = px.bar(
-                x=modelos, 
+                x=grafico_r2['x'], 
                 y=r2_values,
                 title="Coeficiente de Determinação (R²) por Modelo",
                 color=r2_values,
@@ -649,12 +652,8 @@ def previsoes_interativas(pipeline_basico):
         st.subheader("📈 Simulação de Tendências")
         
         horas = list(range(24))
-        umidades = []
-        
-        for h in horas:
-            dados_sim = [temperatura, chuva, h, nutrientes_total]
-            umidade_sim = pipeline_basico.fazer_previsao('umidade', dados_sim)
-            umidades.append(umidade_sim)
+        dados_sim = [[temperatura, chuva, h, nutrientes_total] for h in horas]
+        umidades = pipeline_basico.fazer_previsoes_em_lote('umidade', dados_sim)
         
         fig = px.line(x=horas, y=umidades, 
                      title="Previsão de Umidade ao Longo do Dia",
@@ -0,0 +1,115 @@
+"""
+FarmTech Solutions - Fase 4: Armazenamento Binário dos Resultados dos Modelos
+Autor: Richard Schmitz - RM567951
+"""
+
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+import numpy as np
+
+# Campos de cada resultado gravados como arrays .npy em vez de listas no JSON
+VETORES_RESULTADO = {'y_test': float, 'y_pred': float, 'indices_teste': np.int64}
+
+class ResultadoSalvo(Mapping):
+    """Resultado de um modelo: métricas do índice JSON e vetores .npy lidos no primeiro acesso"""
+
+    def __init__(self, escalares, vetores, mmap_mode='r'):
+        self.mmap_mode = mmap_mode
+        self._escalares = escalares
+        self._vetores = vetores
+        self._carregados = {}
+
+    def carregado(self, campo):
+        return campo in self._carregados
+
+    def __getitem__(self, campo):
+        if campo in self._escalares:
+            return self._escalares[campo]
+        if campo not in self._vetores:
+            raise KeyError(campo)
+        if campo not in self._carregados:
+            self._carregados[campo] = np.load(self._vetores[campo], mmap_mode=self.mmap_mode)
+        return self._carregados[campo]
+
+    def __contains__(self, campo):
+        # Não dispara a leitura dos vetores
+        return campo in self._escalares or campo in self._vetores
+
+    def __iter__(self):
+        yield from self._escalares
+        yield from self._vetores
+
+    def __len__(self):
+        return len(self._escalares) + len(self._vetores)
+
+def _substituir(destino, gravar, modo='wb'):
+    """Grava num temporário do mesmo diretório e troca com os.replace
+
+    Leitores que já abriram (ou mapearam) o arquivo antigo continuam com o
+    inode anterior, em vez de ver o conteúdo mudar ou encolher sob o mmap.
+    """
+    descritor, temporario = tempfile.mkstemp(prefix=os.path.basename(destino) + '.',
+                                             suffix='.tmp', dir=os.path.dirname(destino))
+    try:
+        with os.fdopen(descritor, modo) as f:
+            gravar(f)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+def salvar_resultados(resultados, diretorio, nome="resultados_parte2"):
+    """Grava as métricas em {nome}.json e cada vetor em {nome}/{modelo}_{campo}.npy
+
+    Vetores de modelos que não estão mais nos resultados são removidos.
+    """
+    diretorio_vetores = os.path.join(diretorio, nome)
+    os.makedirs(diretorio_vetores, exist_ok=True)
+
+    indice = {}
+    gravados = set()
+    for modelo, resultado in resultados.items():
+        escalares = {campo: valor for campo, valor in resultado.items() if campo not in VETORES_RESULTADO}
+        escalares['vetores'] = {}
+        for campo in VETORES_RESULTADO:
+            if campo in resultado:
+                arquivo = f"{modelo}_{campo}.npy"
+                vetor = np.asarray(resultado[campo], dtype=VETORES_RESULTADO[campo])
+                _substituir(os.path.join(diretorio_vetores, arquivo), lambda f: np.save(f, vetor))
+                escalares['vetores'][campo] = f"{nome}/{arquivo}"
+                gravados.add(arquivo)
+        indice[modelo] = escalares
+
+    arquivo_indice = os.path.join(diretorio, f"{nome}.json")
+    _substituir(arquivo_indice, lambda f: json.dump(indice, f, indent=2), modo='w')
+
+    # Só depois do novo índice: o anterior ainda pode apontar para esses arquivos
+    for arquivo in os.listdir(diretorio_vetores):
+        if arquivo.endswith('.npy') and arquivo not in gravados:
+            os.remove(os.path.join(diretorio_vetores, arquivo))
+
+    return arquivo_indice
+
+def carregar_resultados(arquivo, mmap_mode='r'):
+    """Lê o índice de resultados; os vetores só são abertos (em mmap) quando acessados
+
+    Aceita também o formato antigo, com os vetores como listas dentro do JSON.
+    """
+    with open(arquivo, 'r') as f:
+        indice = json.load(f)
+
+    diretorio = os.path.dirname(os.path.abspath(arquivo))
+    resultados = {}
+    for modelo, escalares in indice.items():
+        if 'vetores' not in escalares:
+            resultados[modelo] = {campo: np.asarray(valor) if campo in VETORES_RESULTADO else valor
+                                  for campo, valor in escalares.items()}
+            continue
+
+        vetores = {campo: os.path.join(diretorio, caminho)
+                   for campo, caminho in escalares.pop('vetores').items()}
+        resultados[modelo] = ResultadoSalvo(escalares, vetores, mmap_mode)
+
+    return resultados
@@ -3,13 +3,25 @@ FarmTech Solutions - Fase 4: Avaliação de Modelos
 Autor: Richard Schmitz - RM567951
 """
 
+import os
+import hashlib
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import json
 import joblib
+import sys
+from relatorios import RelatorioAvaliacao
+import armazem_resultados
+from bootstrap_metricas import bootstrap_metricas
+from avaliacao_segmentada import IndiceSegmentos, SEGMENTOS_AVALIACAO, conferir_indices
+
+sys.path.append('../parte1')
+from acumulador_metricas import AcumuladorMetricas
+from feature_store import FeatureStore
 
 class AvaliacaoModelos:
     def __init__(self):
@@ -17,10 +29,9 @@ class AvaliacaoModelos:
         self.metricas_comparativas = {}
         
     def carregar_resultados(self, arquivo="../models/modelos_treinados/resultados_parte2.json"):
-        """Carrega resultados dos modelos treinados"""
+        """Carrega resultados dos modelos treinados (vetores lidos sob demanda, em mmap)"""
         try:
-            with open(arquivo, 'r') as f:
-                self.resultados = json.load(f)
+            self.resultados = armazem_resultados.carregar_resultados(arquivo)
             return True
         except Exception as e:
             print(f"Erro ao carregar resultados: {e}")
@@ -57,24 +68,48 @@ class AvaliacaoModelos:
             'mae': ranking_mae
         }
     
+    def intervalos_confianca(self, n_amostras=2000, confianca=0.95, semente=42, n_jobs=-1):
+        """Bootstrap de R², RMSE e MAE: intervalos e probabilidade de cada modelo liderar o ranking"""
+        y_test = {nome: resultado['y_test'] for nome, resultado in self.resultados.items()}
+        y_pred = {nome: resultado['y_pred'] for nome, resultado in self.resultados.items()}
+        indices = {nome: resultado['indices_teste'] for nome, resultado in self.resultados.items()
+                   if 'indices_teste' in resultado}
+        
+        return bootstrap_metricas(y_test, y_pred, n_amostras, confianca, semente, n_jobs, indices)
+    
+    def avaliacao_segmentada(self, dados=None, segmentos=SEGMENTOS_AVALIACAO, janela='D'):
+        """MAE, RMSE e R² por hora, categoria de chuva e janela de datas (MultiIndex modelo, segmento, grupo)
+        
+        dados: histórico usado no treino (as posições de indices_teste se referem a
+        ele); por padrão, o arquivo de treinamento lido pelo feature store. Levanta
+        ValueError se os alvos nas linhas de teste não baterem com o y_test salvo.
+        """
+        if dados is None:
+            dados = FeatureStore().obter("../data/dados_treinamento.csv")
+        conferir_indices(dados, self.resultados)
+        
+        return IndiceSegmentos(dados, segmentos, janela).metricas(self.resultados)
+    
     def analise_residuos(self, nome_modelo):
         """Análise de resíduos para um modelo específico"""
         if nome_modelo not in self.resultados:
             return None
         
         resultado = self.resultados[nome_modelo]
-        y_test = np.array(resultado['y_test'])
-        y_pred = np.array(resultado['y_pred'])
+        y_test = np.asarray(resultado['y_test'])
+        y_pred = np.asarray(resultado['y_pred'])
         
         residuos = y_test - y_pred
         
+        # Média, desvio e |resíduo| médio em uma passada; o desvio é calculado uma vez
+        acumulador = AcumuladorMetricas().atualizar(y_test, y_pred)
+        std = acumulador.std_residuos
+        
         analise = {
             'residuos': residuos,
-            'residuos_padronizados': residuos / np.std(residuos),
-            'media_residuos': np.mean(residuos),
-            'std_residuos': np.std(residuos),
-            'residuos_abs_medio': np.mean(np.abs(residuos)),
-            'outliers': np.sum(np.abs(residuos) > 2 * np.std(residuos))
+            'residuos_padronizados': residuos / std,
+            **acumulador.resumo_residuos(),
+            'outliers': np.sum(np.abs(residuos) > 2 * std)
         }
         
         return analise
@@ -133,11 +168,82 @@ class AvaliacaoModelos:
         
         return interpretacao
     
-    def comparacao_visual(self):
-        """Cria visualizações comparativas dos modelos"""
-        # Configurar estilo
-        plt.style.use('default')
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+    def _chave_visual(self, **opcoes):
+        """Hash das métricas comparativas e das opções de renderização"""
+        conteudo = json.dumps({'metricas': self.metricas_comparativas, 'opcoes': opcoes},
+                              sort_keys=True, default=float)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+    
+    def especificacao_visual(self):
+        """Dados dos quatro gráficos comparativos em JSON, para o dashboard desenhar"""
+        modelos = list(self.metricas_comparativas['r2'].keys())
+        metricas = {metrica: [float(valor) for valor in valores.values()]
+                    for metrica, valores in self.metricas_comparativas.items()}
+        
+        return {
+            'modelos': modelos,
+            'graficos': [
+                {'tipo': 'barras', 'titulo': 'Comparação R² por Modelo', 'x': modelos, 'y': metricas['r2']},
+                {'tipo': 'barras', 'titulo': 'Comparação RMSE por Modelo', 'x': modelos, 'y': metricas['rmse']},
+                {'tipo': 'dispersao', 'titulo': 'R² vs RMSE', 'x': metricas['r2'], 'y': metricas['rmse'],
+                 'rotulos': modelos},
+                {'tipo': 'heatmap', 'titulo': 'Heatmap de Métricas', 'linhas': list(metricas),
+                 'colunas': modelos, 'valores': list(metricas.values())}
+            ]
+        }
+    
+    def comparacao_visual(self, arquivo="../screenshots/comparacao_modelos.png", dpi=300, mostrar=True,
+                          usar_cache=True):
+        """Cria visualizações comparativas dos modelos
+        
+        mostrar=False renderiza sem interface gráfica (Agg, sem pyplot) para execuções
+        em lote. O formato sai da extensão: .png (dpi), .svg/.pdf (vetorial) ou .json
+        (especificacao_visual). Com usar_cache, um arquivo já gerado para as mesmas
+        métricas e opções não é renderizado de novo; nesse caso retorna o caminho
+        do arquivo (ou a especificação lida dele, no formato .json).
+        """
+        if not self.metricas_comparativas:
+            self.calcular_metricas_comparativas()
+        
+        formato = os.path.splitext(arquivo)[1].lstrip('.').lower()
+        chave = self._chave_visual(formato=formato, dpi=dpi)
+        arquivo_chave = f"{arquivo}.sha256"
+        
+        if usar_cache and not mostrar and os.path.exists(arquivo) and os.path.exists(arquivo_chave):
+            with open(arquivo_chave) as f:
+                if f.read().strip() == chave:
+                    if formato == 'json':
+                        with open(arquivo) as especificacao:
+                            return json.load(especificacao)
+                    return arquivo
+        
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+        
+        if formato == 'json':
+            especificacao = self.especificacao_visual()
+            with open(arquivo, 'w') as f:
+                json.dump(especificacao, f)
+            fig = especificacao
+        else:
+            # Estilo aplicado só a esta figura, sem alterar o rcParams global
+            with plt.style.context('default'):
+                fig = self._desenhar_comparacao(mostrar)
+                fig.savefig(arquivo, dpi=dpi, bbox_inches='tight')
+            if mostrar:
+                plt.show()
+        
+        with open(arquivo_chave, 'w') as f:
+            f.write(chave)
+        
+        return fig
+    
+    def _desenhar_comparacao(self, mostrar):
+        # Sem interface, a figura é criada fora do pyplot (canvas Agg, nada fica aberto)
+        if mostrar:
+            fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+        else:
+            fig = Figure(figsize=(15, 12))
+            axes = fig.subplots(2, 2)
         
         # Gráfico 1: Comparação R²
         modelos = list(self.metricas_comparativas['r2'].keys())
@@ -174,111 +280,54 @@ class AvaliacaoModelos:
                    ax=axes[1, 1], cbar_kws={'label': 'Valor da Métrica'})
         axes[1, 1].set_title('Heatmap de Métricas')
         
-        plt.tight_layout()
-        plt.savefig('../screenshots/comparacao_modelos.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.tight_layout()
         
         return fig
     
-    def relatorio_completo(self):
-        """Gera relatório completo de avaliação"""
-        print("="*80)
-        print("RELATÓRIO DE AVALIAÇÃO DOS MODELOS - FARMTECH SOLUTIONS")
-        print("="*80)
-        
+    def construir_relatorio(self):
+        """Relatório estruturado da avaliação (sem imprimir nada)"""
         # Métricas comparativas
         self.calcular_metricas_comparativas()
         
         # Rankings
         rankings = self.ranking_modelos()
         
-        print(f"\n{'RANKING DOS MODELOS':<30}")
-        print("-" * 50)
-        
-        print(f"\nPor R² (Coeficiente de Determinação):")
-        for i, (modelo, valor) in enumerate(rankings['r2'], 1):
-            print(f"  {i}. {modelo:<20} R² = {valor:.4f}")
-        
-        print(f"\nPor RMSE (Erro Quadrático Médio):")
-        for i, (modelo, valor) in enumerate(rankings['rmse'], 1):
-            print(f"  {i}. {modelo:<20} RMSE = {valor:.4f}")
-        
-        print(f"\nPor MAE (Erro Absoluto Médio):")
-        for i, (modelo, valor) in enumerate(rankings['mae'], 1):
-            print(f"  {i}. {modelo:<20} MAE = {valor:.4f}")
-        
         # Análise detalhada por modelo
-        print(f"\n{'ANÁLISE DETALHADA POR MODELO':<30}")
-        print("-" * 50)
-        
-        for nome_modelo in self.resultados.keys():
-            print(f"\n{nome_modelo.upper()}:")
-            
-            resultado = self.resultados[nome_modelo]
-            print(f"  Target: {resultado['target']}")
-            print(f"  Features: {len(resultado['features'])}")
-            print(f"  MAE: {resultado['mae']:.4f}")
-            print(f"  RMSE: {resultado['rmse']:.4f}")
-            print(f"  R²: {resultado['r2']:.4f}")
-            
-            # Interpretação
-            interpretacao = self.interpretacao_metricas(nome_modelo)
-            if interpretacao:
-                print(f"  Qualidade: {interpretacao['qualidade_geral']}")
-                print(f"  Precisão: {interpretacao['precisao']}")
-                print(f"  Aplicabilidade: {interpretacao['aplicabilidade']}")
-                
-                if interpretacao['recomendacoes']:
-                    print(f"  Recomendações:")
-                    for rec in interpretacao['recomendacoes']:
-                        print(f"    - {rec}")
-            
-            # Análise de resíduos
-            analise_res = self.analise_residuos(nome_modelo)
-            if analise_res:
-                print(f"  Média dos resíduos: {analise_res['media_residuos']:.4f}")
-                print(f"  Desvio padrão dos resíduos: {analise_res['std_residuos']:.4f}")
-                print(f"  Outliers detectados: {analise_res['outliers']}")
-        
-        # Recomendações gerais
-        print(f"\n{'RECOMENDAÇÕES GERAIS':<30}")
-        print("-" * 50)
-        
-        melhor_modelo = rankings['r2'][0]
-        print(f"\nMelhor modelo geral: {melhor_modelo[0]} (R² = {melhor_modelo[1]:.4f})")
-        
-        if melhor_modelo[1] >= 0.8:
-            print("✓ Modelo adequado para uso em produção")
-        elif melhor_modelo[1] >= 0.6:
-            print("⚠ Modelo adequado para análises, mas pode ser melhorado")
-        else:
-            print("✗ Modelo necessita melhorias significativas")
-        
-        print(f"\nPara melhorar a performance:")
-        print("- Coletar mais dados históricos")
-        print("- Adicionar features meteorológicas")
-        print("- Implementar ensemble de modelos")
-        print("- Ajustar hiperparâmetros via grid search")
-        
-        return rankings
+        detalhes = {}
+        for nome_modelo, resultado in self.resultados.items():
+            detalhes[nome_modelo] = {
+                'target': resultado['target'],
+                'n_features': len(resultado['features']),
+                'mae': resultado['mae'],
+                'rmse': resultado['rmse'],
+                'r2': resultado['r2'],
+                'interpretacao': self.interpretacao_metricas(nome_modelo),
+                'residuos': self._resumo_residuos(nome_modelo)
+            }
+        
+        return RelatorioAvaliacao(rankings, detalhes)
     
-    def salvar_relatorio(self, arquivo="../docs/relatorio_avaliacao.txt"):
-        """Salva relatório em arquivo"""
-        import sys
-        from io import StringIO
-        
-        # Capturar output do relatório
-        old_stdout = sys.stdout
-        sys.stdout = buffer = StringIO()
-        
-        self.relatorio_completo()
+    def _resumo_residuos(self, nome_modelo):
+        analise_res = self.analise_residuos(nome_modelo)
+        if not analise_res:
+            return None
         
-        sys.stdout = old_stdout
-        relatorio_texto = buffer.getvalue()
+        return {
+            'media_residuos': float(analise_res['media_residuos']),
+            'std_residuos': float(analise_res['std_residuos']),
+            'outliers': int(analise_res['outliers'])
+        }
+    
+    def relatorio_completo(self):
+        """Gera e imprime o relatório completo de avaliação"""
+        relatorio = self.construir_relatorio()
+        print(relatorio.para_texto(), end='')
         
-        # Salvar em arquivo
-        with open(arquivo, 'w', encoding='utf-8') as f:
-            f.write(relatorio_texto)
+        return relatorio.rankings
+    
+    def salvar_relatorio(self, arquivo="../docs/relatorio_avaliacao.txt", formato=None):
+        """Salva relatório em arquivo (texto, JSON ou Markdown, pela extensão ou por formato)"""
+        self.construir_relatorio().salvar(arquivo, formato)
         
         print(f"Relatório salvo em: {arquivo}")
 
@@ -293,7 +342,7 @@ def main():
         
         # Criar visualizações
         print("\nGerando visualizações...")
-        avaliacao.comparacao_visual()
+        avaliacao.comparacao_visual(mostrar=False)
         
         # Salvar relatório
         avaliacao.salvar_relatorio()
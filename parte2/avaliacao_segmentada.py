@@ -0,0 +1,109 @@
+"""
+FarmTech Solutions - Fase 4: Avaliação de Modelos por Segmento (Hora, Chuva e Janela de Datas)
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+import pandas as pd
+from bootstrap_metricas import colunas_metricas, metricas_das_somas
+
+SEGMENTOS_AVALIACAO = ['hora', 'chuva_categoria', 'janela']
+
+def conferir_indices(dados, resultados):
+    """Garante que dados é o histórico em que os modelos foram testados
+
+    As posições de indices_teste precisam existir em dados e apontar para as
+    mesmas linhas: o alvo nessas posições deve ser igual ao y_test salvo.
+    """
+    for nome, resultado in resultados.items():
+        if 'indices_teste' not in resultado:
+            continue
+        indices = np.asarray(resultado['indices_teste'])
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(dados)):
+            raise ValueError(f"Índices de teste de '{nome}' fora do histórico ({len(dados)} linhas): "
+                             f"os dados não são os usados no treinamento")
+
+        alvo = resultado.get('target')
+        if alvo is None:
+            continue
+        if alvo not in dados:
+            raise ValueError(f"Coluna alvo '{alvo}' de '{nome}' ausente nos dados de avaliação")
+        if not np.allclose(dados[alvo].to_numpy(dtype=float)[indices], np.asarray(resultado['y_test'], dtype=float),
+                           equal_nan=True):
+            raise ValueError(f"O alvo '{alvo}' nas linhas de teste de '{nome}' difere do y_test salvo: "
+                             f"os dados não são os usados no treinamento")
+
+class IndiceSegmentos:
+    """Grupo de cada linha do histórico em cada segmento, montado uma vez para todos os modelos
+
+    Os grupos de todos os segmentos ocupam um único espaço de códigos (com
+    deslocamento por segmento); cada segmento tem ainda um código extra para
+    valores ausentes, descartado no resultado.
+    """
+
+    def __init__(self, dados, segmentos=SEGMENTOS_AVALIACAO, janela='D'):
+        self.segmentos = list(segmentos)
+        codigos = []
+        segmento_do_grupo = []
+        rotulos = []
+        deslocamento = 0
+
+        for i, segmento in enumerate(self.segmentos):
+            valores = dados['timestamp'].dt.floor(janela) if segmento == 'janela' else dados[segmento]
+            codigo, valores_unicos = pd.factorize(valores, sort=True)
+            ausente = len(valores_unicos)
+            codigos.append(np.where(codigo < 0, ausente, codigo) + deslocamento)
+
+            segmento_do_grupo.append(np.full(ausente + 1, i))
+            rotulos.extend(list(valores_unicos) + [None])
+            deslocamento += ausente + 1
+
+        self.grupos = np.column_stack(codigos) if codigos else np.empty((len(dados), 0), dtype=np.int64)
+        self.n_grupos = deslocamento
+        self.segmento_do_grupo = np.concatenate(segmento_do_grupo) if segmento_do_grupo else np.empty(0, dtype=int)
+        self.valido = np.array([rotulo is not None for rotulo in rotulos], dtype=bool)
+        self.rotulos = np.empty(len(rotulos), dtype=object)
+        self.rotulos[:] = rotulos
+
+    def metricas(self, resultados):
+        """n, mae, rmse e r2 por (modelo, segmento, grupo) em uma única redução agrupada
+
+        resultados: modelo -> dict com y_test, y_pred e indices_teste (posições
+        das linhas de teste em dados).
+        """
+        modelos = [nome for nome, resultado in resultados.items() if 'indices_teste' in resultado]
+        n_segmentos = len(self.segmentos)
+
+        ids = []
+        colunas = []
+        for m, nome in enumerate(modelos):
+            resultado = resultados[nome]
+            grupos = self.grupos[np.asarray(resultado['indices_teste'])] + m * self.n_grupos
+            ids.append(grupos.ravel())
+            # Cada linha de teste entra uma vez em cada segmento
+            colunas.append(np.repeat(np.column_stack(colunas_metricas(resultado['y_test'], resultado['y_pred'])),
+                                     n_segmentos, axis=0))
+
+        total = len(modelos) * self.n_grupos
+        ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+        colunas = np.concatenate(colunas) if colunas else np.empty((0, 4))
+
+        contagem = np.bincount(ids, minlength=total)
+        somas = np.column_stack([np.bincount(ids, weights=colunas[:, j], minlength=total) for j in range(4)])
+
+        grupo = np.tile(np.arange(self.n_grupos), len(modelos))
+        manter = (contagem > 0) & self.valido[grupo]
+        metricas = metricas_das_somas(somas[manter], contagem[manter])
+
+        indice = pd.MultiIndex.from_arrays([
+            np.repeat(modelos, self.n_grupos)[manter],
+            np.asarray(self.segmentos, dtype=object)[self.segmento_do_grupo[grupo[manter]]],
+            self.rotulos[grupo[manter]]
+        ], names=['modelo', 'segmento', 'grupo'])
+
+        return pd.DataFrame({
+            'n': contagem[manter],
+            'mae': metricas[:, 0],
+            'rmse': metricas[:, 1],
+            'r2': metricas[:, 2]
+        }, index=indice)
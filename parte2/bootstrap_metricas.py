@@ -0,0 +1,122 @@
+"""
+FarmTech Solutions - Fase 4: Intervalos de Confiança Bootstrap das Métricas
+Autor: Richard Schmitz - RM567951
+"""
+
+import hashlib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+METRICAS_BOOTSTRAP = ['mae', 'rmse', 'r2']
+MAIOR_MELHOR = {'mae': False, 'rmse': False, 'r2': True}
+
+# Reamostras por tarefa: a matriz de contagens de um bloco tem BLOCO_REAMOSTRAS x n
+BLOCO_REAMOSTRAS = 250
+
+def _contagens(n, n_amostras, rng):
+    """Quantas vezes cada linha de teste aparece em cada reamostra (n_amostras x n)"""
+    indices = rng.integers(0, n, size=(n_amostras, n))
+    indices += np.arange(n_amostras)[:, None] * n
+    return np.bincount(indices.ravel(), minlength=n_amostras * n).reshape(n_amostras, n).astype(float)
+
+def _r2(sse, sst):
+    # Mesma convenção do r2_score quando y_true é constante
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(sst > 0, 1 - sse / sst, np.where(sse == 0, 1.0, 0.0))
+
+def metricas_das_somas(somas, n):
+    """mae, rmse e r2 a partir das somas de |r|, r², y e y² (últimos eixos: modelo, 4)"""
+    soma_abs, sse, soma_y, soma_y2 = np.moveaxis(somas, -1, 0)
+    return np.stack([soma_abs / n, np.sqrt(sse / n), _r2(sse, soma_y2 - soma_y ** 2 / n)], axis=-1)
+
+def _metricas_bloco(colunas, n, n_amostras, semente):
+    """Métricas de um bloco de reamostras para todos os modelos de um mesmo conjunto de teste
+
+    colunas: |r|, r², y e y² de cada modelo; as somas ponderadas de todas as
+    reamostras e modelos saem de um único produto de matrizes.
+    """
+    somas = _contagens(n, n_amostras, np.random.default_rng(semente)) @ colunas
+    return metricas_das_somas(somas.reshape(n_amostras, -1, 4), n)
+
+def colunas_metricas(y_true, y_pred):
+    """|r|, r², y e y² de um modelo: as somas dessas colunas determinam mae, rmse e r2"""
+    y_true = np.asarray(y_true, dtype=float)
+    residuos = y_true - np.asarray(y_pred, dtype=float)
+    # A soma de quadrados total não muda com a translação; centrar evita cancelamento
+    y_centrado = y_true - y_true.mean()
+    return [np.abs(residuos), residuos ** 2, y_centrado, y_centrado ** 2]
+
+def _conjunto_teste(y_true, indices):
+    """Identidade do conjunto de teste: as posições das linhas ou, sem elas, os próprios valores"""
+    vetor = np.ascontiguousarray(indices if indices is not None else y_true,
+                                 dtype=np.int64 if indices is not None else float)
+    return len(vetor), hashlib.sha256(vetor.tobytes()).hexdigest()
+
+def _resultado_vazio():
+    intervalos = {metrica: pd.DataFrame(columns=['estimativa', 'inferior', 'superior', 'prob_primeiro'],
+                                        dtype=float) for metrica in METRICAS_BOOTSTRAP}
+    superioridade = {metrica: pd.DataFrame(dtype=float) for metrica in METRICAS_BOOTSTRAP}
+    return {'intervalos': intervalos, 'superioridade': superioridade}
+
+def bootstrap_metricas(y_true, y_pred, n_amostras=2000, confianca=0.95, semente=42, n_jobs=1,
+                       indices=None):
+    """Intervalos de confiança e probabilidades de superioridade por bootstrap
+
+    y_true, y_pred: dicionários modelo -> vetor. indices (opcional): modelo ->
+    posições das linhas de teste no histórico. Modelos avaliados no mesmo
+    conjunto de teste (mesmos índices ou, sem eles, mesmo y_true) compartilham
+    as reamostras, então as comparações entre eles são pareadas. Retorna
+    'intervalos' (estimativa, inferior, superior e prob_primeiro por métrica) e
+    'superioridade' (P[linha melhor que coluna] por métrica).
+    """
+    modelos = list(y_true)
+    if not modelos:
+        return _resultado_vazio()
+
+    indices = indices or {}
+    conjuntos = [_conjunto_teste(y_true[modelo], indices.get(modelo)) for modelo in modelos]
+
+    estimativas = np.empty((len(modelos), len(METRICAS_BOOTSTRAP)))
+    tarefas = []
+    for conjunto in dict.fromkeys(conjuntos):
+        n = conjunto[0]
+        posicoes = np.array([i for i, outro in enumerate(conjuntos) if outro == conjunto])
+        colunas = np.column_stack([coluna for i in posicoes
+                                   for coluna in colunas_metricas(y_true[modelos[i]], y_pred[modelos[i]])])
+        for inicio in range(0, n_amostras, BLOCO_REAMOSTRAS):
+            fim = min(inicio + BLOCO_REAMOSTRAS, n_amostras)
+            tarefas.append((posicoes, inicio, fim, colunas, int(n)))
+        estimativas[posicoes] = metricas_das_somas(colunas.sum(axis=0).reshape(-1, 4), n)
+
+    # Threads: o trabalho está no bincount e no produto de matrizes (BLAS), sem cópia de dados
+    sementes = np.random.SeedSequence(semente).spawn(len(tarefas))
+    blocos = Parallel(n_jobs=n_jobs, prefer='threads')(
+        delayed(_metricas_bloco)(colunas, n, fim - inicio, sementes[i])
+        for i, (_, inicio, fim, colunas, n) in enumerate(tarefas)
+    )
+
+    distribuicao = np.empty((n_amostras, len(modelos), len(METRICAS_BOOTSTRAP)))
+    for (posicoes, inicio, fim, _, _), bloco in zip(tarefas, blocos):
+        distribuicao[inicio:fim, posicoes] = bloco
+
+    alfa = (1 - confianca) / 2
+    inferior, superior = np.quantile(distribuicao, [alfa, 1 - alfa], axis=0)
+
+    intervalos = {}
+    superioridade = {}
+    for k, metrica in enumerate(METRICAS_BOOTSTRAP):
+        valores = distribuicao[:, :, k] if MAIOR_MELHOR[metrica] else -distribuicao[:, :, k]
+        primeiro = np.bincount(valores.argmax(axis=1), minlength=len(modelos)) / n_amostras
+
+        intervalos[metrica] = pd.DataFrame({
+            'estimativa': estimativas[:, k],
+            'inferior': inferior[:, k],
+            'superior': superior[:, k],
+            'prob_primeiro': primeiro
+        }, index=modelos)
+        superioridade[metrica] = pd.DataFrame(
+            (valores[:, :, None] > valores[:, None, :]).mean(axis=0), index=modelos, columns=modelos
+        )
+
+    return {'intervalos': intervalos, 'superioridade': superioridade}
@@ -0,0 +1,74 @@
+"""
+FarmTech Solutions - Fase 4: Cache de Previsões dos Modelos
+Autor: Richard Schmitz - RM567951
+"""
+
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Resolução da quantização das entradas: leituras dentro do mesmo passo
+# (ex.: sondas vizinhas) compartilham a mesma previsão
+PASSOS_QUANTIZACAO = {
+    'temperatura': 0.5,
+    'chuva_mm': 0.5,
+    'hora': 1,
+    'nutrientes_total': 1,
+    'umidade_solo': 0.5,
+    'ph_solo': 0.05,
+    'nitrogenio': 1,
+    'fosforo': 1,
+    'potassio': 1
+}
+PASSO_PADRAO = 0.01
+
+class CachePrevisoes:
+    """Cache LRU com validade (TTL) de previsões, indexado pelas entradas quantizadas"""
+
+    def __init__(self, capacidade=4096, ttl_segundos=900, passos=None, relogio=time.monotonic):
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self.passos = passos or PASSOS_QUANTIZACAO
+        self.relogio = relogio
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+
+    def _passos(self, features):
+        return np.array([self.passos.get(feature, PASSO_PADRAO) for feature in features])
+
+    def quantizar(self, features, X):
+        """Códigos inteiros das entradas (uma linha por leitura, uma coluna por feature)"""
+        return np.round(np.asarray(X, dtype=float) / self._passos(features)).astype(np.int64)
+
+    def representantes(self, features, codigos):
+        """Valores usados na previsão de cada código: o centro do passo, não a primeira leitura que chegou"""
+        return codigos * self._passos(features)
+
+    def obter(self, chave):
+        item = self._itens.get(chave)
+        if item is None:
+            self.falhas += 1
+            return None
+
+        valor, expira_em = item
+        if self.relogio() >= expira_em:
+            del self._itens[chave]
+            self.falhas += 1
+            return None
+
+        self._itens.move_to_end(chave)
+        self.acertos += 1
+        return valor
+
+    def guardar(self, chave, valor):
+        self._itens[chave] = (valor, self.relogio() + self.ttl_segundos)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+
+    def limpar(self):
+        self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,99 @@
+"""
+FarmTech Solutions - Fase 4: Cadastro de Talhões (Área, Vazão e Limites por Talhão)
+Autor: Richard Schmitz - RM567951
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# Valores usados para talhões fora do cadastro (ou com o campo em branco)
+AREA_PADRAO_M2 = 1000
+VAZAO_PADRAO_L_MIN = 10
+
+PARAMETROS_TALHAO = ['area_m2', 'vazao_l_min', 'umidade_min', 'umidade_max',
+                     'ph_min', 'ph_max', 'temp_max', 'nutrientes_min']
+
+# Cadastros já lidos, por caminho: o arquivo só é relido se for modificado
+_CADASTROS = {}
+
+class CadastroTalhoes:
+    """Parâmetros por talhão em arrays ordenados pelo id do talhão"""
+
+    def __init__(self, talhoes, parametros):
+        talhoes = np.asarray(talhoes)
+        if talhoes.dtype == object:
+            talhoes = talhoes.astype(str)
+        ordem = np.argsort(talhoes, kind='stable')
+        self.talhoes = talhoes[ordem]
+
+        repetidos = self.talhoes[1:][self.talhoes[1:] == self.talhoes[:-1]]
+        if len(repetidos):
+            raise ValueError(f"Talhões repetidos no cadastro: {sorted(set(repetidos.tolist()))}")
+
+        # Campos ausentes ficam NaN e caem no valor padrão na consulta
+        self.parametros = {
+            nome: (np.asarray(parametros[nome], dtype=float)[ordem] if nome in parametros
+                   else np.full(len(talhoes), np.nan))
+            for nome in PARAMETROS_TALHAO
+        }
+
+    @classmethod
+    def carregar(cls, caminho="../data/talhoes.csv"):
+        """Lê o cadastro de um CSV ou JSON (uma linha/registro por talhão, coluna 'talhao')"""
+        chave = os.path.abspath(caminho)
+        modificado = os.path.getmtime(chave)
+        if chave in _CADASTROS and _CADASTROS[chave][0] == modificado:
+            return _CADASTROS[chave][1]
+
+        if caminho.endswith('.json'):
+            df = pd.read_json(caminho)
+        else:
+            df = pd.read_csv(caminho)
+
+        if 'talhao' not in df:
+            raise ValueError(f"Cadastro sem a coluna 'talhao': {caminho}")
+
+        cadastro = cls(df['talhao'].to_numpy(), {nome: df[nome] for nome in PARAMETROS_TALHAO if nome in df})
+        _CADASTROS[chave] = (modificado, cadastro)
+        return cadastro
+
+    def posicoes(self, talhoes):
+        """Posição de cada talhão nos arrays (-1 para talhões fora do cadastro)"""
+        talhoes = np.atleast_1d(np.asarray(talhoes))
+        if self.talhoes.dtype.kind in 'iu' and talhoes.dtype.kind not in 'iu':
+            talhoes = pd.to_numeric(talhoes, errors='coerce')
+        elif self.talhoes.dtype.kind == 'U' and talhoes.dtype.kind != 'U':
+            talhoes = talhoes.astype(str)
+
+        if len(self.talhoes) == 0:
+            return np.full(len(talhoes), -1)
+
+        posicao = np.minimum(np.searchsorted(self.talhoes, talhoes), len(self.talhoes) - 1)
+        return np.where(self.talhoes[posicao] == talhoes, posicao, -1)
+
+    def coletar(self, talhoes, padroes):
+        """Arrays com um valor por talhão consultado; sem cadastro, vale o padrão"""
+        posicoes = self.posicoes(talhoes)
+        encontrado = posicoes >= 0
+        posicoes = np.where(encontrado, posicoes, 0)
+
+        coletados = {}
+        for nome, padrao in padroes.items():
+            valores = self.parametros[nome][posicoes] if len(self.talhoes) else np.full(len(posicoes), np.nan)
+            coletados[nome] = np.where(encontrado & ~np.isnan(valores), valores, padrao)
+        return coletados
+
+    def parametros_do_talhao(self, talhao):
+        """Parâmetros preenchidos de um único talhão (dict vazio se ele não estiver no cadastro)"""
+        posicao = self.posicoes([talhao])[0]
+        if posicao < 0:
+            return {}
+        return {nome: float(valores[posicao]) for nome, valores in self.parametros.items()
+                if not np.isnan(valores[posicao])}
+
+    def __contains__(self, talhao):
+        return bool(self.posicoes([talhao])[0] >= 0)
+
+    def __len__(self):
+        return len(self.talhoes)
@@ -0,0 +1,144 @@
+"""
+FarmTech Solutions - Fase 4: Controle de Irrigação com Histerese por Talhão
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+import pandas as pd
+
+# Mesmos códigos de ACOES_IRRIGACAO em recomendacoes.py
+MANTER, IRRIGAR, SUSPENDER = 0, 1, 2
+ACOES_CONTROLE = ['manter', 'irrigar', 'suspender']
+
+BANDA_HISTERESE = 5.0            # irrigação ligada segue até umidade_min + banda
+TEMPO_MINIMO_LIGADO = 600        # segundos
+TEMPO_MINIMO_DESLIGADO = 900     # segundos
+COMANDOS_POR_HORA = 4            # taxa de reposição do balde de comandos
+RAJADA_COMANDOS = 2              # comandos acumuláveis por talhão
+
+CAPACIDADE_INICIAL = 1024
+
+class ControleIrrigacao:
+    """Máquina de estados por talhão: emite só as transições, com histerese, tempo mínimo e limite de taxa
+
+    O estado de cada talhão ocupa uma posição em arrays (ação atual, instante da
+    última transição, comandos disponíveis e instante da última reposição).
+    """
+
+    def __init__(self, banda=BANDA_HISTERESE, tempo_minimo_ligado=TEMPO_MINIMO_LIGADO,
+                 tempo_minimo_desligado=TEMPO_MINIMO_DESLIGADO, comandos_por_hora=COMANDOS_POR_HORA,
+                 rajada=RAJADA_COMANDOS):
+        self.banda = banda
+        self.tempo_minimo_ligado = tempo_minimo_ligado
+        self.tempo_minimo_desligado = tempo_minimo_desligado
+        self.comandos_por_segundo = comandos_por_hora / 3600
+        self.rajada = rajada
+
+        self.talhoes = pd.Index([])
+        self.acao = np.zeros(CAPACIDADE_INICIAL, dtype=np.int8)
+        self.desde = np.full(CAPACIDADE_INICIAL, -np.inf)
+        self.comandos = np.full(CAPACIDADE_INICIAL, float(rajada))
+        self.reposicao = np.full(CAPACIDADE_INICIAL, -np.inf)
+
+        self.leituras_processadas = 0
+        self.transicoes_emitidas = 0
+
+    def _posicoes(self, talhoes):
+        """Posição de cada talhão na tabela; talhões novos entram parados (manter)"""
+        posicoes = self.talhoes.get_indexer(talhoes)
+        novos = pd.unique(talhoes[posicoes < 0])
+        if len(novos) == 0:
+            return posicoes
+
+        self.talhoes = self.talhoes.append(pd.Index(novos))
+        total = len(self.talhoes)
+        if total > len(self.acao):
+            capacidade = max(total, 2 * len(self.acao))
+            crescer = capacidade - len(self.acao)
+            self.acao = np.concatenate([self.acao, np.zeros(crescer, dtype=np.int8)])
+            self.desde = np.concatenate([self.desde, np.full(crescer, -np.inf)])
+            self.comandos = np.concatenate([self.comandos, np.full(crescer, float(self.rajada))])
+            self.reposicao = np.concatenate([self.reposicao, np.full(crescer, -np.inf)])
+        return self.talhoes.get_indexer(talhoes)
+
+    def _aplicar(self, posicoes, instantes, propostas, umidade, umidade_min):
+        """Uma leitura por talhão: decide e grava as transições (máscara, ação anterior e nova)"""
+        atual = self.acao[posicoes]
+
+        # Histerese: depois de ligada, a irrigação só para acima de umidade_min + banda
+        desejada = np.where((atual == IRRIGAR) & (propostas == MANTER) & (umidade < umidade_min + self.banda),
+                            IRRIGAR, propostas)
+
+        # Tempo mínimo no estado atual (evita liga/desliga em sequência)
+        minimo = np.where(atual == IRRIGAR, self.tempo_minimo_ligado, self.tempo_minimo_desligado)
+        permitido = instantes - self.desde[posicoes] >= minimo
+
+        # Limite de taxa: balde de comandos reposto continuamente por talhão
+        decorrido = np.minimum(instantes - self.reposicao[posicoes], self.rajada / self.comandos_por_segundo)
+        comandos = np.minimum(self.rajada, self.comandos[posicoes] + decorrido * self.comandos_por_segundo)
+        permitido &= comandos >= 1
+
+        muda = (desejada != atual) & permitido
+        self.comandos[posicoes] = comandos - muda
+        self.reposicao[posicoes] = instantes
+        self.acao[posicoes] = np.where(muda, desejada, atual)
+        self.desde[posicoes] = np.where(muda, instantes, self.desde[posicoes])
+        return muda, atual, desejada
+
+    def processar(self, talhoes, instantes, propostas, umidade, umidade_min=60):
+        """Processa leituras em ordem de tempo e retorna só as transições
+
+        propostas: ação sugerida por leitura (códigos de ACOES_CONTROLE ou o
+        Categorical de recomendar_irrigacao_lote); instantes em segundos ou datas.
+        O índice do resultado é a posição da leitura que causou cada transição.
+        """
+        talhoes = np.asarray(talhoes)
+        originais = instantes = np.asarray(instantes)
+        if instantes.dtype.kind == 'M':
+            instantes = instantes.astype('datetime64[ns]').astype(np.int64) / 1e9
+        instantes = instantes.astype(float)
+        if isinstance(propostas, pd.Categorical) or hasattr(propostas, 'cat'):
+            propostas = pd.Categorical(propostas, categories=ACOES_CONTROLE).codes
+        propostas = np.asarray(propostas, dtype=np.int8)
+        umidade = np.asarray(umidade, dtype=float)
+        umidade_min = np.broadcast_to(np.asarray(umidade_min, dtype=float), umidade.shape)
+
+        posicoes = self._posicoes(talhoes)
+
+        # Leituras do mesmo talhão são aplicadas em rodadas sucessivas (a k-ésima
+        # de cada talhão na rodada k); dentro de uma rodada tudo é vetorizado
+        ordem = np.lexsort((instantes, posicoes))
+        posicoes_ordenadas = posicoes[ordem]
+        inicio_grupo = np.r_[True, posicoes_ordenadas[1:] != posicoes_ordenadas[:-1]]
+        rodada = np.arange(len(ordem)) - np.maximum.accumulate(np.where(inicio_grupo, np.arange(len(ordem)), 0))
+
+        mudou = np.zeros(len(talhoes), dtype=bool)
+        anterior = np.zeros(len(talhoes), dtype=np.int8)
+        nova = np.zeros(len(talhoes), dtype=np.int8)
+        for k in range(int(rodada.max()) + 1 if len(rodada) else 0):
+            linhas = ordem[rodada == k]
+            mudou[linhas], anterior[linhas], nova[linhas] = self._aplicar(
+                posicoes[linhas], instantes[linhas], propostas[linhas], umidade[linhas], umidade_min[linhas]
+            )
+
+        self.leituras_processadas += len(talhoes)
+        self.transicoes_emitidas += int(mudou.sum())
+
+        linhas = np.flatnonzero(mudou)
+        linhas = linhas[np.argsort(instantes[linhas], kind='stable')]
+        return pd.DataFrame({
+            'talhao': talhoes[linhas],
+            'instante': originais[linhas],
+            'acao_anterior': pd.Categorical.from_codes(anterior[linhas], categories=ACOES_CONTROLE),
+            'acao': pd.Categorical.from_codes(nova[linhas], categories=ACOES_CONTROLE),
+            'umidade_solo': umidade[linhas]
+        }, index=linhas)
+
+    def tabela_estados(self):
+        """Estado atual de cada talhão conhecido"""
+        n = len(self.talhoes)
+        return pd.DataFrame({
+            'acao': pd.Categorical.from_codes(self.acao[:n], categories=ACOES_CONTROLE),
+            'desde': self.desde[:n],
+            'comandos_disponiveis': self.comandos[:n]
+        }, index=self.talhoes)
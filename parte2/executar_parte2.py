@@ -5,15 +5,13 @@ Autor: Richard Schmitz - RM567951
 
 import sys
 import os
+from datetime import datetime
 sys.path.append('../parte1')
 
-from modelos_preditivos import ModelosPreditivosAvancados
-from avaliacao_modelos import AvaliacaoModelos
-from recomendacoes import SistemaRecomendacoes
-from ml_pipeline import FarmTechMLPipeline
+from orquestrador import OrquestradorPipeline
 
-def executar_parte2_completa():
-    """Executa todo o pipeline da Parte 2"""
+def executar_parte2_completa(n_jobs=1):
+    """Executa todo o pipeline da Parte 2 (n_jobs > 1 treina os modelos em paralelo)"""
     
     print("="*80)
     print("FARMTECH SOLUTIONS - FASE 4: EXECUÇÃO COMPLETA DA PARTE 2")
@@ -22,63 +20,71 @@ def executar_parte2_completa():
     print("Sistema de IA para Otimização do Cultivo de Soja")
     print("="*80)
     
-    # 1. Pipeline básico
-    print("\n🚀 ETAPA 1: Pipeline de Machine Learning Básico")
-    print("-" * 50)
-    
-    pipeline_basico = FarmTechMLPipeline()
-    sucesso_basico = pipeline_basico.executar_pipeline_completo()
+    # Dados de exemplo
+    dados_exemplo = {
+        'umidade_solo': 45.2,
+        'ph_solo': 6.3,
+        'nitrogenio': 1,
+        'fosforo': 0,
+        'potassio': 1,
+        'temperatura': 32.5,
+        'chuva_mm': 0.0
+    }
     
-    if sucesso_basico:
-        print("✅ Pipeline básico executado com sucesso!")
-    else:
-        print("❌ Erro no pipeline básico")
-        return False
+    previsao_exemplo = {
+        'chuva_mm': 0.5,
+        'temperatura': 30.0
+    }
     
-    # 2. Modelos preditivos avançados
-    print("\n🤖 ETAPA 2: Modelos Preditivos Avançados")
+    # Etapas carregar → features → treinar → salvar → avaliar → recomendar;
+    # etapas cujas entradas não mudaram desde a última execução são reaproveitadas
+    orquestrador = OrquestradorPipeline(
+        dados_sensores=dados_exemplo,
+        previsao_clima=previsao_exemplo,
+        referencia=datetime.now(),
+        n_jobs=n_jobs
+    )
+    
+    # 1-2. Treinamento dos modelos básicos e avançados (dados lidos uma única vez)
+    print("\n🤖 ETAPAS 1-2: Pipeline de ML Básico e Modelos Preditivos Avançados")
     print("-" * 50)
     
-    modelos_avancados = ModelosPreditivosAvancados()
-    resultados, cv_results = modelos_avancados.treinar_todos_modelos()
+    try:
+        treino = orquestrador.saida('treinar')
+        orquestrador.saida('salvar')
+    except Exception as e:
+        print(f"❌ Erro no treinamento dos modelos: {e}")
+        return False
     
     print("\n📊 Resultados dos Modelos:")
-    for nome, resultado in resultados.items():
+    for tipo, metricas in treino['basico']['metrics'].items():
+        print(f"  Pipeline básico ({tipo}): R² = {metricas['r2']:.4f}")
+    for nome, resultado in treino['avancados']['resultados'].items():
         print(f"  {resultado['modelo']}: R² = {resultado['r2']:.4f}")
     
     # 3. Avaliação de modelos
     print("\n📈 ETAPA 3: Avaliação de Performance")
     print("-" * 50)
     
-    avaliacao = AvaliacaoModelos()
-    if avaliacao.carregar_resultados():
-        rankings = avaliacao.relatorio_completo()
+    try:
+        relatorio_avaliacao = orquestrador.saida('avaliar')
+        print(relatorio_avaliacao.para_texto(), end='')
         print("✅ Avaliação concluída!")
-    else:
-        print("⚠️ Avaliação não pôde ser executada")
+    except Exception as e:
+        print(f"⚠️ Avaliação não pôde ser executada: {e}")
     
     # 4. Sistema de recomendações
     print("\n💡 ETAPA 4: Sistema de Recomendações")
     print("-" * 50)
     
-    # Dados de exemplo
-    dados_exemplo = {
-        'umidade_solo': 45.2,
-        'ph_solo': 6.3,
-        'nitrogenio': 1,
-        'fosforo': 0,
-        'potassio': 1,
-        'temperatura': 32.5,
-        'chuva_mm': 0.0
-    }
-    
-    previsao_exemplo = {
-        'chuva_mm': 0.5,
-        'temperatura': 30.0
-    }
+    try:
+        relatorio_recomendacoes = orquestrador.saida('recomendar')
+        print(relatorio_recomendacoes.para_texto(), end='')
+    except Exception as e:
+        print(f"⚠️ Recomendações não puderam ser geradas: {e}")
     
-    sistema_rec = SistemaRecomendacoes()
-    recomendacoes = sistema_rec.gerar_relatorio_recomendacoes(dados_exemplo, previsao_exemplo)
+    if orquestrador.reaproveitadas:
+        print(f"\n♻️  Etapas reaproveitadas do cache: {', '.join(orquestrador.reaproveitadas)}")
     
     # 5. Resumo final
     print("\n🎯 RESUMO FINAL")
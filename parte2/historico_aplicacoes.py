@@ -0,0 +1,142 @@
+"""
+FarmTech Solutions - Fase 4: Histórico de Aplicações de Fertilizantes
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+import pandas as pd
+
+NUTRIENTES_HISTORICO = ['nitrogenio', 'fosforo', 'potassio', 'calcario']
+COLUNAS_HISTORICO = ['talhao', 'nutriente', 'data', 'dose_kg_ha']
+
+# Cada chave do índice junta a série (talhão, nutriente) nos bits altos e o
+# instante em segundos desde 1970 nos 34 bits baixos (válido até o ano 2514)
+BITS_INSTANTE = 34
+MAXIMO_INSTANTE = (1 << BITS_INSTANTE) - 1
+
+def como_datetime64(datas):
+    """Data única (Timestamp, datetime, str) ou coleção de datas como datetime64[s]"""
+    if isinstance(datas, (pd.Series, pd.Index)):
+        datas = datas.to_numpy()
+    elif np.ndim(datas) == 0 and not isinstance(datas, np.ndarray):
+        datas = pd.Timestamp(datas).to_datetime64()
+    return np.asarray(datas).astype('datetime64[s]')
+
+def _segundos(datas):
+    """Instantes como inteiros (segundos desde 1970), limitados à faixa do índice"""
+    return np.clip(como_datetime64(datas).astype(np.int64), 0, MAXIMO_INSTANTE)
+
+class HistoricoAplicacoes:
+    """Aplicações por talhão e nutriente em um array ordenado de chaves (consultas por busca binária)"""
+
+    def __init__(self, registros=None):
+        self.registros = pd.DataFrame(columns=COLUNAS_HISTORICO) if registros is None else registros
+        self._pendentes = []
+        self._indexar()
+
+    @classmethod
+    def carregar(cls, caminho="../data/historico_aplicacoes.csv"):
+        """Lê o histórico de um CSV com as colunas talhao, nutriente, data e dose_kg_ha"""
+        return cls(pd.read_csv(caminho, parse_dates=['data']))
+
+    def salvar(self, caminho="../data/historico_aplicacoes.csv"):
+        self._consolidar()
+        self.registros.to_csv(caminho, index=False)
+
+    def registrar(self, talhao, nutriente, data, dose_kg_ha):
+        """Anota uma aplicação; o índice é refeito uma vez, na próxima consulta"""
+        if nutriente not in NUTRIENTES_HISTORICO:
+            raise ValueError(f"Nutriente desconhecido: {nutriente}")
+        self._pendentes.append((talhao, nutriente, pd.Timestamp(data), float(dose_kg_ha)))
+
+    def _consolidar(self):
+        if not self._pendentes:
+            return
+        novos = pd.DataFrame(self._pendentes, columns=COLUNAS_HISTORICO)
+        self.registros = novos if self.registros.empty else pd.concat([self.registros, novos],
+                                                                      ignore_index=True)
+        self._pendentes = []
+        self._indexar()
+
+    def _indexar(self):
+        talhoes = self.registros['talhao'].to_numpy()
+        if talhoes.dtype == object:
+            talhoes = talhoes.astype(str)
+        self.talhoes = np.unique(talhoes)
+
+        nutrientes = pd.Categorical(self.registros['nutriente'], categories=NUTRIENTES_HISTORICO).codes
+        if (nutrientes < 0).any():
+            raise ValueError(f"Nutrientes desconhecidos no histórico: "
+                             f"{sorted(set(self.registros['nutriente'][nutrientes < 0]))}")
+
+        series = np.searchsorted(self.talhoes, talhoes).astype(np.int64) * len(NUTRIENTES_HISTORICO) + nutrientes
+        chaves = (series << BITS_INSTANTE) | _segundos(self.registros['data'])
+
+        ordem = np.argsort(chaves, kind='stable')
+        self._chaves = chaves[ordem]
+        self._doses = self.registros['dose_kg_ha'].to_numpy(dtype=float)[ordem]
+        self._doses_acumuladas = np.concatenate([[0.0], np.cumsum(self._doses)])
+
+    def _series(self, talhoes, nutriente):
+        """Série (talhão, nutriente) de cada talhão consultado; -1 se ele não tem aplicações"""
+        talhoes = np.atleast_1d(np.asarray(talhoes))
+        if self.talhoes.dtype.kind == 'U' and talhoes.dtype.kind != 'U':
+            talhoes = talhoes.astype(str)
+        if len(self.talhoes) == 0:
+            return np.full(len(talhoes), -1, dtype=np.int64)
+
+        posicao = np.minimum(np.searchsorted(self.talhoes, talhoes), len(self.talhoes) - 1)
+        encontrado = self.talhoes[posicao] == talhoes
+        series = posicao.astype(np.int64) * len(NUTRIENTES_HISTORICO) + NUTRIENTES_HISTORICO.index(nutriente)
+        return np.where(encontrado, series, -1)
+
+    def aplicado_no_periodo(self, talhoes, nutriente, inicio, fim):
+        """Dose total (kg/ha) aplicada em cada talhão entre inicio e fim, inclusive"""
+        self._consolidar()
+        series = self._series(talhoes, nutriente)
+        base = np.where(series >= 0, series, 0) << BITS_INSTANTE
+
+        antes = np.searchsorted(self._chaves, base | _segundos(inicio), side='left')
+        ate = np.searchsorted(self._chaves, base | _segundos(fim), side='right')
+        total = self._doses_acumuladas[ate] - self._doses_acumuladas[antes]
+        return np.where(series >= 0, total, 0.0)
+
+    def ultima_aplicacao(self, talhoes, nutriente, ate):
+        """Data da última aplicação de cada talhão até a data informada (NaT se não houver)"""
+        self._consolidar()
+        series = self._series(talhoes, nutriente)
+        base = np.where(series >= 0, series, 0) << BITS_INSTANTE
+
+        posicao = np.searchsorted(self._chaves, base | _segundos(ate), side='right') - 1
+        chave = self._chaves[np.maximum(posicao, 0)] if len(self._chaves) else np.zeros_like(base)
+        encontrada = (series >= 0) & (posicao >= 0) & ((chave >> BITS_INSTANTE) == series)
+
+        segundos = (chave & MAXIMO_INSTANTE).astype('datetime64[s]')
+        return np.where(encontrada, segundos, np.datetime64('NaT', 's'))
+
+    def aplicacoes(self, talhao, inicio=None, fim=None):
+        """Aplicações de um talhão (todos os nutrientes) no período, em ordem de data"""
+        self._consolidar()
+        inicio = 0 if inicio is None else _segundos(inicio)
+        fim = MAXIMO_INSTANTE if fim is None else _segundos(fim)
+
+        partes = []
+        for nutriente in NUTRIENTES_HISTORICO:
+            serie = self._series([talhao], nutriente)[0]
+            if serie < 0:
+                continue
+            base = serie << BITS_INSTANTE
+            antes = np.searchsorted(self._chaves, base | inicio, side='left')
+            ate = np.searchsorted(self._chaves, base | fim, side='right')
+            partes.append(pd.DataFrame({
+                'nutriente': nutriente,
+                'data': (self._chaves[antes:ate] & MAXIMO_INSTANTE).astype('datetime64[s]'),
+                'dose_kg_ha': self._doses[antes:ate]
+            }))
+
+        if not partes:
+            return pd.DataFrame(columns=['nutriente', 'data', 'dose_kg_ha'])
+        return pd.concat(partes, ignore_index=True).sort_values('data', kind='stable', ignore_index=True)
+
+    def __len__(self):
+        return len(self.registros) + len(self._pendentes)
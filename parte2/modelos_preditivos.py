@@ -3,42 +3,94 @@ FarmTech Solutions - Fase 4: Modelos Preditivos Avançados
 Autor: Richard Schmitz - RM567951
 """
 
+import sys
+import time
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, KFold
+from sklearn.base import clone
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler, PolynomialFeatures
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.metrics import r2_score
 import joblib
+from joblib import Parallel, delayed
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+sys.path.append('../parte1')
+from dados_sensores import ler_csv_em_blocos, TAMANHO_BLOCO_PADRAO
+from feature_store import FeatureStore, criar_todas_features
+from treino_incremental import EstatisticasSuficientes, aplicar_coeficientes
+from arvores_compiladas import compilar_modelo
+from acumulador_metricas import calcular_metricas
+from armazem_resultados import salvar_resultados
+
+# Modelos treinados por treinar_todos_modelos, na ordem em que aparecem nos resultados
+ETAPAS_TREINAMENTO = [
+    ('Regressão Linear Simples', 'modelo_regressao_linear_simples'),
+    ('Regressão Múltipla', 'modelo_regressao_multipla'),
+    ('Regressão Polinomial', 'modelo_regressao_polinomial'),
+    ('Random Forest', 'modelo_random_forest'),
+    ('Gradient Boosting', 'modelo_gradient_boosting')
+]
+
+# Colunas que os modelos avançados e a validação cruzada leem do feature store
+COLUNAS_MODELOS = ['umidade_solo', 'ph_solo', 'temperatura', 'nutrientes_total', 'chuva_mm', 'hora',
+                   'nitrogenio', 'fosforo', 'potassio', 'deficit_umidade', 'excesso_umidade',
+                   'irrigacao_ativa', 'rendimento_estimado', 'volume_irrigacao',
+                   'necessidade_fertilizacao', 'indice_saude']
+
+# Estimadores comparados na validação cruzada (cada fold ajusta um clone)
+MODELOS_VALIDACAO = {
+    'Linear': LinearRegression(),
+    'Ridge': Ridge(),
+    'Lasso': Lasso(),
+    'Random Forest': RandomForestRegressor(n_estimators=50, random_state=42),
+    'Gradient Boosting': GradientBoostingRegressor(n_estimators=50, random_state=42)
+}
+
+def _avaliar_fold(estimador, X, y, indices_treino, indices_teste):
+    """Ajusta um clone do estimador em um fold e devolve o R² e o tempo gasto"""
+    inicio = time.perf_counter()
+    
+    modelo = clone(estimador)
+    modelo.fit(X[indices_treino], y[indices_treino])
+    score = r2_score(y[indices_teste], modelo.predict(X[indices_teste]))
+    
+    return score, time.perf_counter() - inicio
+
+def _treinar_modelo_isolado(nome_metodo, dados):
+    """Treina um único modelo em um processo separado e devolve o que ele produziu"""
+    modelos = ModelosPreditivosAvancados()
+    modelos.dados = dados
+    getattr(modelos, nome_metodo)()
+    return modelos.modelos, modelos.pipelines, modelos.resultados, modelos.estatisticas
+
 class ModelosPreditivosAvancados:
-    def __init__(self):
+    def __init__(self, feature_store=None):
         self.modelos = {}
         self.pipelines = {}
         self.resultados = {}
+        self.estatisticas = {}
+        self.compilados = {}
         self.dados = None
+        self.feature_store = feature_store or FeatureStore()
         
     def carregar_dados(self, arquivo_path="../data/dados_treinamento.csv"):
         """Carrega e prepara dados com features engenheiradas"""
-        df = pd.read_csv(arquivo_path)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Feature engineering
-        df['hora'] = df['timestamp'].dt.hour
-        df['nutrientes_total'] = df['nitrogenio'] + df['fosforo'] + df['potassio']
-        df['deficit_umidade'] = np.maximum(0, 60 - df['umidade_solo'])
-        df['excesso_umidade'] = np.maximum(0, df['umidade_solo'] - 80)
-        df['ph_ideal'] = ((df['ph_solo'] >= 6.0) & (df['ph_solo'] <= 6.8)).astype(int)
-        df['temp_stress'] = (df['temperatura'] > 30).astype(int)
-        df['chuva_categoria'] = pd.cut(df['chuva_mm'], bins=[-0.1, 0, 1, 5, 100], 
-                                      labels=['sem_chuva', 'leve', 'moderada', 'forte'])
-        
-        self.dados = df
-        return df
+        self.dados = self.feature_store.obter(arquivo_path, COLUNAS_MODELOS)
+        return self.dados
+    
+    def carregar_dados_em_blocos(self, arquivo_path="../data/dados_treinamento.csv", tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        """Modo streaming: gera blocos do histórico com as features engenheiradas"""
+        for bloco in ler_csv_em_blocos(arquivo_path, tamanho_bloco):
+            yield self.criar_features(bloco)
+    
+    def criar_features(self, df):
+        """Feature engineering e variáveis alvo (vale para o arquivo inteiro ou um bloco)"""
+        return criar_todas_features(df)
     
     def modelo_regressao_linear_simples(self):
         """Modelo de regressão linear simples para umidade"""
@@ -48,7 +100,10 @@ class ModelosPreditivosAvancados:
         X = df[['temperatura']].values
         y = df['umidade_solo'].values
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        # As posições das linhas de teste acompanham o split (avaliação por segmento)
+        X_train, X_test, y_train, y_test, _, indices_teste = train_test_split(
+            X, y, np.arange(len(df)), test_size=0.3, random_state=42
+        )
         
         modelo = LinearRegression()
         modelo.fit(X_train, y_train)
@@ -59,16 +114,15 @@ class ModelosPreditivosAvancados:
             'modelo': 'Regressão Linear Simples',
             'target': 'umidade_solo',
             'features': ['temperatura'],
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred),
+            **calcular_metricas(y_test, y_pred),
             'y_test': y_test,
-            'y_pred': y_pred
+            'y_pred': y_pred,
+            'indices_teste': indices_teste
         }
         
         self.modelos['linear_simples'] = modelo
         self.resultados['linear_simples'] = resultados
+        self.estatisticas['linear_simples'] = EstatisticasSuficientes(1).atualizar(X_train, y_train)
         
         return modelo, resultados
     
@@ -76,19 +130,13 @@ class ModelosPreditivosAvancados:
         """Modelo de regressão múltipla para rendimento estimado"""
         df = self.dados
         
-        # Criar variável de rendimento estimado baseada nas condições
-        df['rendimento_estimado'] = (
-            (df['umidade_solo'] / 100) * 0.3 +
-            (df['ph_ideal']) * 0.2 +
-            (df['nutrientes_total'] / 3) * 0.3 +
-            (1 - df['temp_stress']) * 0.2
-        ) * 100  # Escala 0-100
-        
         features = ['umidade_solo', 'ph_solo', 'temperatura', 'nutrientes_total', 'chuva_mm']
         X = df[features]
         y = df['rendimento_estimado']
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        X_train, X_test, y_train, y_test, _, indices_teste = train_test_split(
+            X, y, np.arange(len(df)), test_size=0.3, random_state=42
+        )
         
         # Pipeline com normalização
         pipeline = Pipeline([
@@ -103,16 +151,15 @@ class ModelosPreditivosAvancados:
             'modelo': 'Regressão Múltipla',
             'target': 'rendimento_estimado',
             'features': features,
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred),
+            **calcular_metricas(y_test, y_pred),
             'y_test': y_test,
-            'y_pred': y_pred
+            'y_pred': y_pred,
+            'indices_teste': indices_teste
         }
         
         self.pipelines['multipla'] = pipeline
         self.resultados['multipla'] = resultados
+        self.estatisticas['multipla'] = EstatisticasSuficientes(len(features)).atualizar(X_train, y_train)
         
         return pipeline, resultados
     
@@ -120,19 +167,13 @@ class ModelosPreditivosAvancados:
         """Modelo de regressão polinomial para relações não-lineares"""
         df = self.dados
         
-        # Volume de irrigação baseado em múltiplas variáveis
-        df['volume_irrigacao'] = np.where(
-            df['irrigacao_ativa'] == 1,
-            np.maximum(0, (60 - df['umidade_solo']) * 2 + 
-                      (df['temperatura'] - 20) * 0.5),
-            0
-        )
-        
         features = ['umidade_solo', 'temperatura', 'deficit_umidade']
         X = df[features]
         y = df['volume_irrigacao']
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        X_train, X_test, y_train, y_test, _, indices_teste = train_test_split(
+            X, y, np.arange(len(df)), test_size=0.3, random_state=42
+        )
         
         # Pipeline com features polinomiais
         pipeline = Pipeline([
@@ -148,36 +189,33 @@ class ModelosPreditivosAvancados:
             'modelo': 'Regressão Polinomial',
             'target': 'volume_irrigacao',
             'features': features,
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred),
+            **calcular_metricas(y_test, y_pred),
             'y_test': y_test,
-            'y_pred': y_pred
+            'y_pred': y_pred,
+            'indices_teste': indices_teste
         }
         
         self.pipelines['polinomial'] = pipeline
         self.resultados['polinomial'] = resultados
         
+        # Estatísticas no espaço das features polinomiais (entrada do scaler)
+        X_train_poly = pipeline.named_steps['poly'].transform(X_train)
+        self.estatisticas['polinomial'] = EstatisticasSuficientes(X_train_poly.shape[1]).atualizar(X_train_poly, y_train)
+        
         return pipeline, resultados
     
     def modelo_random_forest(self):
         """Modelo Random Forest para previsões complexas"""
         df = self.dados
         
-        # Necessidade de fertilização baseada em nutrientes e condições
-        df['necessidade_fertilizacao'] = (
-            (3 - df['nutrientes_total']) * 0.4 +
-            (1 - df['ph_ideal']) * 0.3 +
-            (df['temp_stress']) * 0.3
-        ) * 10  # Escala 0-30
-        
         features = ['umidade_solo', 'ph_solo', 'temperatura', 'nitrogenio', 
                    'fosforo', 'potassio', 'chuva_mm', 'hora']
         X = df[features]
         y = df['necessidade_fertilizacao']
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        X_train, X_test, y_train, y_test, _, indices_teste = train_test_split(
+            X, y, np.arange(len(df)), test_size=0.3, random_state=42
+        )
         
         modelo = RandomForestRegressor(
             n_estimators=100,
@@ -196,17 +234,16 @@ class ModelosPreditivosAvancados:
             'modelo': 'Random Forest',
             'target': 'necessidade_fertilizacao',
             'features': features,
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred),
+            **calcular_metricas(y_test, y_pred),
             'importancias': importancias,
             'y_test': y_test,
-            'y_pred': y_pred
+            'y_pred': y_pred,
+            'indices_teste': indices_teste
         }
         
         self.modelos['random_forest'] = modelo
         self.resultados['random_forest'] = resultados
+        self.compilados.pop('random_forest', None)
         
         return modelo, resultados
     
@@ -214,20 +251,14 @@ class ModelosPreditivosAvancados:
         """Modelo Gradient Boosting para previsões avançadas"""
         df = self.dados
         
-        # Índice de saúde da cultura
-        df['indice_saude'] = (
-            (df['ph_ideal'] * 25) +
-            (np.clip((df['umidade_solo'] - 40) / 40, 0, 1) * 25) +
-            ((df['nutrientes_total'] / 3) * 25) +
-            ((1 - df['temp_stress']) * 25)
-        )
-        
         features = ['umidade_solo', 'ph_solo', 'temperatura', 'nutrientes_total', 
                    'chuva_mm', 'deficit_umidade', 'excesso_umidade']
         X = df[features]
         y = df['indice_saude']
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        X_train, X_test, y_train, y_test, _, indices_teste = train_test_split(
+            X, y, np.arange(len(df)), test_size=0.3, random_state=42
+        )
         
         modelo = GradientBoostingRegressor(
             n_estimators=100,
@@ -243,76 +274,139 @@ class ModelosPreditivosAvancados:
             'modelo': 'Gradient Boosting',
             'target': 'indice_saude',
             'features': features,
-            'mae': mean_absolute_error(y_test, y_pred),
-            'mse': mean_squared_error(y_test, y_pred),
-            'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
-            'r2': r2_score(y_test, y_pred),
+            **calcular_metricas(y_test, y_pred),
             'y_test': y_test,
-            'y_pred': y_pred
+            'y_pred': y_pred,
+            'indices_teste': indices_teste
         }
         
         self.modelos['gradient_boosting'] = modelo
         self.resultados['gradient_boosting'] = resultados
+        self.compilados.pop('gradient_boosting', None)
         
         return modelo, resultados
     
-    def validacao_cruzada(self):
-        """Executa validação cruzada em todos os modelos"""
+    def validacao_cruzada(self, n_jobs=1, n_folds=5):
+        """Executa validação cruzada em todos os modelos, distribuindo (modelo x fold) entre processos"""
         df = self.dados
         
-        # Preparar dados para validação cruzada
-        modelos_cv = {
-            'Linear': LinearRegression(),
-            'Ridge': Ridge(),
-            'Lasso': Lasso(),
-            'Random Forest': RandomForestRegressor(n_estimators=50, random_state=42),
-            'Gradient Boosting': GradientBoostingRegressor(n_estimators=50, random_state=42)
-        }
-        
         features = ['umidade_solo', 'ph_solo', 'temperatura', 'nutrientes_total', 'chuva_mm']
-        X = df[features]
-        y = df['irrigacao_ativa']
+        X = df[features].to_numpy(dtype=float)
+        y = df['irrigacao_ativa'].to_numpy(dtype=float)
+        
+        # Folds calculados uma vez e compartilhados por todos os modelos
+        folds = list(KFold(n_splits=n_folds).split(X))
+        tarefas = [(nome, i) for nome in MODELOS_VALIDACAO for i in range(len(folds))]
+        
+        # X e y vão para os processos como uma única cópia somente leitura
+        # (o joblib usa memmap para arrays maiores que max_nbytes)
+        saidas = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(_avaliar_fold)(MODELOS_VALIDACAO[nome], X, y, *folds[i])
+            for nome, i in tarefas
+        )
         
         resultados_cv = {}
         
-        for nome, modelo in modelos_cv.items():
-            scores = cross_val_score(modelo, X, y, cv=5, scoring='r2')
+        for nome in MODELOS_VALIDACAO:
+            por_fold = [saida for (nome_tarefa, _), saida in zip(tarefas, saidas) if nome_tarefa == nome]
+            scores = np.array([score for score, _ in por_fold])
+            tempos = np.array([tempo for _, tempo in por_fold])
+            
             resultados_cv[nome] = {
                 'mean_r2': scores.mean(),
                 'std_r2': scores.std(),
-                'scores': scores
+                'scores': scores,
+                'tempos_fold': tempos,
+                'tempo_total': tempos.sum()
             }
         
         return resultados_cv
     
-    def treinar_todos_modelos(self):
-        """Treina todos os modelos e retorna comparação"""
-        print("Carregando dados...")
-        self.carregar_dados()
-        
-        print("Treinando Regressão Linear Simples...")
-        self.modelo_regressao_linear_simples()
-        
-        print("Treinando Regressão Múltipla...")
-        self.modelo_regressao_multipla()
-        
-        print("Treinando Regressão Polinomial...")
-        self.modelo_regressao_polinomial()
-        
-        print("Treinando Random Forest...")
-        self.modelo_random_forest()
-        
-        print("Treinando Gradient Boosting...")
-        self.modelo_gradient_boosting()
+    def treinar_todos_modelos(self, n_jobs=1, dados=None, salvar=True):
+        """Treina todos os modelos e retorna comparação (n_jobs > 1 treina em paralelo)"""
+        if dados is None:
+            print("Carregando dados...")
+            self.carregar_dados()
+        else:
+            self.dados = dados
+        
+        if n_jobs == 1:
+            for titulo, nome_metodo in ETAPAS_TREINAMENTO:
+                print(f"Treinando {titulo}...")
+                getattr(self, nome_metodo)()
+        else:
+            print(f"Treinando {len(ETAPAS_TREINAMENTO)} modelos em paralelo (n_jobs={n_jobs})...")
+            saidas = Parallel(n_jobs=n_jobs)(
+                delayed(_treinar_modelo_isolado)(nome_metodo, self.dados)
+                for _, nome_metodo in ETAPAS_TREINAMENTO
+            )
+            
+            # Parallel devolve as saídas na ordem das etapas, então os resultados são determinísticos
+            for modelos, pipelines, resultados, estatisticas in saidas:
+                self.modelos.update(modelos)
+                for nome in modelos:
+                    self.compilados.pop(nome, None)
+                self.pipelines.update(pipelines)
+                self.resultados.update(resultados)
+                self.estatisticas.update(estatisticas)
         
         print("Executando Validação Cruzada...")
-        cv_results = self.validacao_cruzada()
+        cv_results = self.validacao_cruzada(n_jobs=n_jobs)
         
         # Salvar modelos automaticamente
-        self.salvar_modelos()
+        if salvar:
+            self.salvar_modelos()
         
         return self.resultados, cv_results
     
+    def atualizar_modelos_lineares(self, df_novos):
+        """Atualiza os modelos lineares (simples, múltipla e polinomial) só com as linhas novas"""
+        df_novos = criar_todas_features(df_novos.copy())
+        
+        if 'linear_simples' in self.estatisticas:
+            resultado = self.resultados['linear_simples']
+            X = df_novos[resultado['features']].values
+            y = df_novos[resultado['target']].values
+            
+            self.estatisticas['linear_simples'].atualizar(X, y)
+            aplicar_coeficientes(self.modelos['linear_simples'], self.estatisticas['linear_simples'])
+        
+        if 'multipla' in self.estatisticas:
+            resultado = self.resultados['multipla']
+            pipeline = self.pipelines['multipla']
+            X = df_novos[resultado['features']]
+            y = df_novos[resultado['target']]
+            
+            pipeline.named_steps['scaler'].partial_fit(X)
+            self.estatisticas['multipla'].atualizar(X, y)
+            aplicar_coeficientes(pipeline.named_steps['regressor'], self.estatisticas['multipla'],
+                                 pipeline.named_steps['scaler'])
+        
+        if 'polinomial' in self.estatisticas:
+            resultado = self.resultados['polinomial']
+            pipeline = self.pipelines['polinomial']
+            X_poly = pipeline.named_steps['poly'].transform(df_novos[resultado['features']])
+            y = df_novos[resultado['target']]
+            
+            pipeline.named_steps['scaler'].partial_fit(X_poly)
+            self.estatisticas['polinomial'].atualizar(X_poly, y)
+            aplicar_coeficientes(pipeline.named_steps['regressor'], self.estatisticas['polinomial'],
+                                 pipeline.named_steps['scaler'])
+    
+    def avaliador_compilado(self, nome):
+        """FlorestaCompilada do modelo (None se ele não for um ensemble de árvores)"""
+        if nome not in self.compilados:
+            self.compilados[nome] = compilar_modelo(self.modelos[nome])
+        return self.compilados[nome]
+    
+    def prever(self, nome, X):
+        """Previsões de um modelo treinado; Random Forest e Gradient Boosting usam o avaliador compilado"""
+        if nome in self.pipelines:
+            return self.pipelines[nome].predict(X)
+        
+        modelo = self.avaliador_compilado(nome) or self.modelos[nome]
+        return modelo.predict(X)
+    
     def salvar_modelos(self, diretorio="../models/modelos_treinados"):
         """Salva todos os modelos treinados"""
         import os
@@ -322,24 +416,22 @@ class ModelosPreditivosAvancados:
         for nome, modelo in self.modelos.items():
             joblib.dump(modelo, f"{diretorio}/modelo_{nome}.pkl")
         
+        # Ensembles de árvores também são salvos achatados, prontos para mmap
+        for nome in self.modelos:
+            compilado = self.avaliador_compilado(nome)
+            if compilado is not None:
+                compilado.salvar(f"{diretorio}/compilado_{nome}.pkl")
+        
         # Salvar pipelines
         for nome, pipeline in self.pipelines.items():
             joblib.dump(pipeline, f"{diretorio}/pipeline_{nome}.pkl")
         
-        # Salvar resultados
-        import json
-        with open(f"{diretorio}/resultados_parte2.json", 'w') as f:
-            # Converter arrays numpy para listas para serialização JSON
-            resultados_json = {}
-            for nome, resultado in self.resultados.items():
-                resultado_copy = resultado.copy()
-                if 'y_test' in resultado_copy:
-                    resultado_copy['y_test'] = resultado_copy['y_test'].tolist()
-                if 'y_pred' in resultado_copy:
-                    resultado_copy['y_pred'] = resultado_copy['y_pred'].tolist()
-                resultados_json[nome] = resultado_copy
-            
-            json.dump(resultados_json, f, indent=2)
+        # Salvar estatísticas do treinamento incremental
+        for nome, estatisticas in self.estatisticas.items():
+            joblib.dump(estatisticas, f"{diretorio}/estatisticas_{nome}.pkl")
+        
+        # Salvar resultados: métricas no índice JSON, y_test/y_pred como .npy
+        salvar_resultados(self.resultados, diretorio)
         
         print(f"Modelos salvos em: {diretorio}")
 
@@ -367,9 +459,6 @@ def main():
         print(f"\n{nome}:")
         print(f"  R² médio: {resultado['mean_r2']:.4f} ± {resultado['std_r2']:.4f}")
     
-    # Salvar modelos
-    modelos.salvar_modelos()
-    
     return modelos
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+"""
+FarmTech Solutions - Fase 4: Motor de Regras de Limiar Compiladas
+Autor: Richard Schmitz - RM567951
+"""
+
+import operator
+import numpy as np
+
+OPERADORES = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+# As regras ativas de cada linha cabem em uma máscara de 64 bits
+MAXIMO_REGRAS = 64
+
+class Regra:
+    def __init__(self, nome, variavel, operador, limite, descricao=None):
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador desconhecido na regra '{nome}': {operador}")
+        self.nome = nome
+        self.variavel = variavel
+        self.operador = operador
+        self.limite = limite  # número ou nome de um threshold
+        self.descricao = descricao or f"{variavel} {operador} {limite}"
+
+    def chave(self):
+        """Valores que definem a regra: duas regras com a mesma chave compilam igual"""
+        return (self.nome, self.variavel, self.operador, self.limite, self.descricao)
+
+class RegrasAtivas:
+    """Resultado da avaliação: uma máscara de bits por linha, uma regra por bit"""
+
+    def __init__(self, mascara, bits):
+        self.mascara = mascara
+        self._bits = bits
+
+    def __getitem__(self, nome):
+        return (self.mascara & self._bits[nome]) != 0
+
+    def ativas(self, linha=0):
+        """Nomes das regras satisfeitas em uma linha"""
+        return {nome for nome, bit in self._bits.items() if self.mascara[linha] & bit}
+
+class MotorRegras:
+    """Tabela de regras compilada em um índice de intervalos ordenados por variável"""
+
+    def __init__(self, regras, thresholds=None):
+        regras = list(regras)
+        if len(regras) > MAXIMO_REGRAS:
+            raise ValueError(f"No máximo {MAXIMO_REGRAS} regras por motor ({len(regras)} informadas)")
+
+        thresholds = thresholds or {}
+        self.regras = regras
+        self.bits = {regra.nome: np.uint64(1) << np.uint64(i) for i, regra in enumerate(regras)}
+        self.indices = {}
+
+        por_variavel = {}
+        for regra in regras:
+            limite = thresholds[regra.limite] if isinstance(regra.limite, str) else regra.limite
+            por_variavel.setdefault(regra.variavel, []).append((regra, float(limite)))
+
+        for variavel, regras_variavel in por_variavel.items():
+            self.indices[variavel] = self._compilar(regras_variavel)
+
+    def _compilar(self, regras_variavel):
+        # Os limites dividem a reta em células: 2i é o intervalo aberto antes do
+        # limite i, 2i + 1 é o próprio limite e a última célula guarda os NaN.
+        # Dentro de uma célula toda regra tem o mesmo resultado, então basta
+        # avaliá-la uma vez em um valor representativo
+        pontos = np.unique([limite for _, limite in regras_variavel])
+        representantes = []
+        for i, ponto in enumerate(pontos):
+            anterior = pontos[i - 1] if i > 0 else ponto - 1.0
+            representantes.extend([(anterior + ponto) / 2, ponto])
+        representantes.extend([pontos[-1] + 1.0, np.nan])
+
+        mascaras = np.zeros(len(representantes), dtype=np.uint64)
+        for celula, valor in enumerate(representantes):
+            for regra, limite in regras_variavel:
+                if OPERADORES[regra.operador](valor, limite):
+                    mascaras[celula] |= self.bits[regra.nome]
+
+        return pontos, mascaras
+
+    def _celulas(self, pontos, valores):
+        posicao = np.searchsorted(pontos, valores, side='left')
+        no_limite = pontos[np.minimum(posicao, len(pontos) - 1)] == valores
+        celulas = 2 * posicao + no_limite
+        celulas[np.isnan(valores)] = 2 * len(pontos) + 1
+        return celulas
+
+    def avaliar(self, variaveis, limites=None):
+        """Avalia todas as regras: uma busca binária e uma consulta de tabela por variável
+
+        limites: thresholds com um valor por linha (ex.: por talhão); as regras que
+        os usam são comparadas diretamente em vez de pela tabela compilada.
+        """
+        variaveis = {nome: np.atleast_1d(np.asarray(valores, dtype=float))
+                     for nome, valores in variaveis.items()}
+        n = max((len(valores) for valores in variaveis.values()), default=0)
+
+        mascara = np.zeros(n, dtype=np.uint64)
+        for nome, valores in variaveis.items():
+            if nome in self.indices:
+                pontos, mascaras = self.indices[nome]
+                mascara |= mascaras[self._celulas(pontos, valores)]
+
+        limites = limites or {}
+        for regra in self.regras:
+            if isinstance(regra.limite, str) and regra.limite in limites and regra.variavel in variaveis:
+                bit = self.bits[regra.nome]
+                satisfeita = OPERADORES[regra.operador](variaveis[regra.variavel],
+                                                       np.asarray(limites[regra.limite], dtype=float))
+                mascara = (mascara & ~bit) | np.where(satisfeita, bit, np.uint64(0))
+
+        return RegrasAtivas(mascara, self.bits)
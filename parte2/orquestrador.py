@@ -0,0 +1,251 @@
+"""
+FarmTech Solutions - Fase 4: Orquestrador do Pipeline (DAG de Etapas)
+Autor: Richard Schmitz - RM567951
+"""
+
+import hashlib
+import json
+import os
+import sys
+import joblib
+import pandas as pd
+
+sys.path.append('../parte1')
+from dados_sensores import carregar_sensores
+from feature_store import criar_todas_features, hash_arquivo
+from ml_pipeline import FarmTechMLPipeline
+from modelos_preditivos import ModelosPreditivosAvancados
+from avaliacao_modelos import AvaliacaoModelos
+from recomendacoes import SistemaRecomendacoes
+
+# Módulos cujo código entra na chave das etapas: qualquer alteração invalida o cache
+MODULOS_PIPELINE = ['dados_sensores', 'feature_store', 'ml_pipeline', 'modelos_preditivos',
+                    'avaliacao_modelos', 'recomendacoes']
+
+def _assinatura_arquivos(diretorio):
+    """Tamanho e mtime de cada arquivo sob o diretório, como o FeatureStore faz com as origens"""
+    assinatura = {}
+    for raiz, _, arquivos in os.walk(diretorio):
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            info = os.stat(caminho)
+            assinatura[caminho] = [info.st_size, info.st_mtime_ns]
+    return assinatura
+
+def _arquivos_inalterados(assinatura):
+    for caminho, (tamanho, mtime_ns) in assinatura.items():
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            return False
+        if info.st_size != tamanho or info.st_mtime_ns != mtime_ns:
+            return False
+    return True
+
+def _hash_codigo():
+    hasher = hashlib.sha256()
+    for nome in MODULOS_PIPELINE:
+        with open(sys.modules[nome].__file__, 'rb') as f:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+class Etapa:
+    def __init__(self, nome, funcao, dependencias=(), parametros=None, persistir=True,
+                 verificar=None, titulo=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = tuple(dependencias)
+        self.parametros = parametros
+        self.persistir = persistir
+        self.verificar = verificar
+        self.titulo = titulo or nome
+
+class OrquestradorPipeline:
+    def __init__(self, arquivo_dados="../data/dados_treinamento.csv",
+                 diretorio_modelos="../models/modelos_treinados",
+                 diretorio_cache="../models/cache_etapas",
+                 dados_sensores=None, previsao_clima=None, referencia=None, n_jobs=1):
+        self.arquivo_dados = arquivo_dados
+        self.diretorio_modelos = diretorio_modelos
+        self.diretorio_cache = diretorio_cache
+        self.dados_sensores = dados_sensores or {}
+        self.previsao_clima = previsao_clima
+        # Instante das recomendações; entra na chave da etapa, então sem uma
+        # referência explícita o relatório não é gravado no cache (nunca seria reaproveitado)
+        self.referencia_explicita = referencia is not None
+        self.referencia = pd.Timestamp.now() if referencia is None else pd.Timestamp(referencia)
+        self.n_jobs = n_jobs
+
+        self.etapas = {}
+        self.executadas = []
+        self.reaproveitadas = []
+        self._chaves = {}
+        self._saidas = {}
+        self._codigo = _hash_codigo()
+
+        self._registrar_etapas_padrao()
+
+    def adicionar_etapa(self, etapa):
+        """Registra uma etapa; as dependências precisam ter sido registradas antes"""
+        for dependencia in etapa.dependencias:
+            if dependencia not in self.etapas:
+                raise ValueError(f"Etapa '{etapa.nome}' depende de '{dependencia}', que não existe")
+        self.etapas[etapa.nome] = etapa
+
+    def _registrar_etapas_padrao(self):
+        # n_jobs não entra nos parâmetros: não altera os resultados, só o tempo
+        self.adicionar_etapa(Etapa(
+            'carregar', self._carregar, persistir=False, titulo="Carregamento dos dados",
+            parametros=lambda: {'arquivo': self.arquivo_dados,
+                                'conteudo': hash_arquivo(self.arquivo_dados)}
+        ))
+        self.adicionar_etapa(Etapa(
+            'features', self._features, ('carregar',), persistir=False,
+            titulo="Engenharia de features"
+        ))
+        self.adicionar_etapa(Etapa(
+            'treinar', self._treinar, ('features',), titulo="Treinamento dos modelos"
+        ))
+        self.adicionar_etapa(Etapa(
+            'salvar', self._salvar, ('treinar',), titulo="Gravação dos modelos",
+            parametros=lambda: {'diretorio': self.diretorio_modelos},
+            # Outro ponto de entrada (ml_pipeline, treino incremental) pode ter regravado os modelos
+            verificar=lambda saida: (isinstance(saida.get('arquivos'), dict) and
+                                     _arquivos_inalterados(saida['arquivos']))
+        ))
+        self.adicionar_etapa(Etapa(
+            'avaliar', self._avaliar, ('treinar',), titulo="Avaliação de performance"
+        ))
+        self.adicionar_etapa(Etapa(
+            'recomendar', self._recomendar, ('salvar',), titulo="Recomendações",
+            persistir=self.referencia_explicita,
+            parametros=lambda: {'dados_sensores': self.dados_sensores,
+                                'previsao_clima': self.previsao_clima,
+                                'referencia': self.referencia.isoformat()}
+        ))
+
+    def chave(self, nome):
+        """Chave da etapa: código, parâmetros e chaves das etapas de que ela depende"""
+        if nome not in self._chaves:
+            etapa = self.etapas[nome]
+            parametros = etapa.parametros() if callable(etapa.parametros) else etapa.parametros
+
+            conteudo = json.dumps({
+                'etapa': nome,
+                'codigo': self._codigo,
+                'parametros': parametros,
+                'dependencias': [self.chave(dependencia) for dependencia in etapa.dependencias]
+            }, sort_keys=True, default=str)
+
+            self._chaves[nome] = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+        return self._chaves[nome]
+
+    def _arquivo_cache(self, nome):
+        return os.path.join(self.diretorio_cache, f"{nome}_{self.chave(nome)[:16]}.pkl")
+
+    def saida(self, nome):
+        """Resultado de uma etapa, executando-a só se suas entradas mudaram"""
+        if nome in self._saidas:
+            return self._saidas[nome]
+
+        etapa = self.etapas[nome]
+        arquivo = self._arquivo_cache(nome)
+
+        if etapa.persistir and os.path.exists(arquivo):
+            saida = joblib.load(arquivo)
+            if etapa.verificar is None or etapa.verificar(saida):
+                print(f"♻️  {etapa.titulo}: sem alterações, reaproveitado do cache")
+                self.reaproveitadas.append(nome)
+                self._saidas[nome] = saida
+                return saida
+
+        # Dependências são resolvidas sob demanda: etapas em cache não puxam as anteriores
+        entradas = {dependencia: self.saida(dependencia) for dependencia in etapa.dependencias}
+
+        print(f"▶️  {etapa.titulo}...")
+        saida = etapa.funcao(**entradas)
+        self.executadas.append(nome)
+
+        if etapa.persistir:
+            os.makedirs(self.diretorio_cache, exist_ok=True)
+            joblib.dump(saida, arquivo)
+            self._remover_chaves_antigas(nome, arquivo)
+
+        self._saidas[nome] = saida
+        return saida
+
+    def _remover_chaves_antigas(self, nome, atual):
+        """Só a chave mais recente de cada etapa fica no cache, que assim não cresce sem limite"""
+        for arquivo in os.listdir(self.diretorio_cache):
+            caminho = os.path.join(self.diretorio_cache, arquivo)
+            # {nome}_{16 hex}.pkl: o tamanho exato evita apagar etapas com prefixo em comum
+            if (arquivo.startswith(f"{nome}_") and arquivo.endswith('.pkl') and
+                    len(arquivo) == len(nome) + 21 and caminho != atual):
+                os.remove(caminho)
+
+    def executar(self, etapas=None):
+        """Executa (ou reaproveita) as etapas pedidas, por padrão todas"""
+        for nome in (etapas or list(self.etapas)):
+            self.saida(nome)
+        return self._saidas
+
+    def _carregar(self):
+        return carregar_sensores(self.arquivo_dados)
+
+    def _features(self, carregar):
+        return criar_todas_features(carregar.copy())
+
+    def _treinar(self, features):
+        pipeline_basico = FarmTechMLPipeline()
+        pipeline_basico.treinar_modelos(features, n_jobs=self.n_jobs)
+
+        modelos_avancados = ModelosPreditivosAvancados()
+        resultados, cv_results = modelos_avancados.treinar_todos_modelos(
+            n_jobs=self.n_jobs, dados=features, salvar=False
+        )
+
+        return {
+            'basico': {
+                'models': pipeline_basico.models,
+                'scalers': pipeline_basico.scalers,
+                'metrics': pipeline_basico.metrics,
+                'estatisticas': pipeline_basico.estatisticas
+            },
+            'avancados': {
+                'modelos': modelos_avancados.modelos,
+                'pipelines': modelos_avancados.pipelines,
+                'resultados': resultados,
+                'estatisticas': modelos_avancados.estatisticas
+            },
+            'cv': cv_results
+        }
+
+    def _salvar(self, treinar):
+        pipeline_basico = FarmTechMLPipeline()
+        pipeline_basico.models = treinar['basico']['models']
+        pipeline_basico.scalers = treinar['basico']['scalers']
+        pipeline_basico.metrics = treinar['basico']['metrics']
+        pipeline_basico.estatisticas = treinar['basico']['estatisticas']
+        pipeline_basico.salvar_modelos(self.diretorio_modelos)
+
+        modelos_avancados = ModelosPreditivosAvancados()
+        modelos_avancados.modelos = treinar['avancados']['modelos']
+        modelos_avancados.pipelines = treinar['avancados']['pipelines']
+        modelos_avancados.resultados = treinar['avancados']['resultados']
+        modelos_avancados.estatisticas = treinar['avancados']['estatisticas']
+        modelos_avancados.salvar_modelos(self.diretorio_modelos)
+
+        return {'diretorio': self.diretorio_modelos, 'arquivos': _assinatura_arquivos(self.diretorio_modelos)}
+
+    # Avaliação e recomendações devolvem o relatório estruturado (sem imprimir):
+    # a saída reaproveitada do cache pode ser exibida de novo por quem chama
+    def _avaliar(self, treinar):
+        avaliacao = AvaliacaoModelos()
+        avaliacao.resultados = treinar['avancados']['resultados']
+        return avaliacao.construir_relatorio()
+
+    def _recomendar(self, salvar):
+        sistema = SistemaRecomendacoes()
+        return sistema.construir_relatorio(self.dados_sensores, self.previsao_clima,
+                                           referencia=self.referencia)
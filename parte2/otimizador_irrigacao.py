@@ -0,0 +1,156 @@
+"""
+FarmTech Solutions - Fase 4: Otimizador do Cronograma de Irrigação (Programação Dinâmica)
+Autor: Richard Schmitz - RM567951
+"""
+
+import numpy as np
+from cadastro_talhoes import AREA_PADRAO_M2, VAZAO_PADRAO_L_MIN
+
+# Balanço diário padrão da umidade (em pontos percentuais), usado quando não há
+# modelo: a chuva repõe e a evapotranspiração consome, mais no calor
+GANHO_POR_MM_CHUVA = 2.0
+PERDA_DIARIA_BASE = 5.0
+
+# Operação da bomba: minutos de irrigação disponíveis por dia
+MINUTOS_BOMBA_DIA = 480
+
+# Custo (em litros equivalentes) de cada ponto percentual fora da faixa ideal
+PENALIDADE_FAIXA = 1e6
+
+def fator_temperatura(temperatura):
+    """Mesmo ajuste de recomendar_irrigacao: +2% de água por grau acima de 25°C"""
+    return 1 + np.maximum(0, (np.asarray(temperatura, dtype=float) - 25) * 0.02)
+
+def variacao_climatica(temperatura, chuva_mm):
+    """Variação natural da umidade em um dia, sem irrigação"""
+    return (GANHO_POR_MM_CHUVA * np.asarray(chuva_mm, dtype=float) -
+            PERDA_DIARIA_BASE * fator_temperatura(temperatura))
+
+def _minimo_em_janelas(valores, larguras):
+    """Mínimo (e posição) de valores[:, t:t + largura] para todo t, com largura por linha
+
+    Tabela esparsa: mínimos de janelas de 2^k combinados em duas janelas
+    sobrepostas; custo O(S log S) por linha, independente da largura.
+    """
+    n, S = valores.shape
+    larguras = np.clip(larguras, 1, S)
+    k = np.floor(np.log2(larguras)).astype(int)
+
+    niveis_valor = [valores]
+    niveis_indice = [np.broadcast_to(np.arange(S), (n, S))]
+    for nivel in range(k.max()):
+        tamanho = 1 << nivel
+        valor, indice = niveis_valor[-1].copy(), niveis_indice[-1].copy()
+        # Em empate fica a posição menor (menos água); o fim da linha não tem vizinho à direita
+        direita_menor = valor[:, tamanho:] < valor[:, :-tamanho]
+        np.copyto(valor[:, :-tamanho], valor[:, tamanho:], where=direita_menor)
+        np.copyto(indice[:, :-tamanho], indice[:, tamanho:], where=direita_menor)
+        niveis_valor.append(valor)
+        niveis_indice.append(indice)
+
+    minimo = np.empty((n, S))
+    posicao = np.empty((n, S), dtype=int)
+
+    # Talhões com a mesma potência de 2 na largura usam o mesmo nível da tabela
+    for nivel in np.unique(k):
+        linhas = np.flatnonzero(k == nivel)
+        valor, indice = niveis_valor[nivel][linhas], niveis_indice[nivel][linhas]
+        segundo = np.minimum(np.arange(S) + (larguras[linhas] - (1 << nivel))[:, None], S - 1)
+        valor_b = np.take_along_axis(valor, segundo, axis=1)
+        b_menor = valor_b < valor
+        minimo[linhas] = np.where(b_menor, valor_b, valor)
+        posicao[linhas] = np.where(b_menor, np.take_along_axis(indice, segundo, axis=1), indice)
+
+    return minimo, posicao
+
+class OtimizadorIrrigacao:
+    """Cronograma de irrigação de gasto mínimo de água para muitos talhões ao mesmo tempo"""
+
+    def __init__(self, umidade_min=60, umidade_max=80, passo=0.5, penalidade=PENALIDADE_FAIXA):
+        self.umidade_min = umidade_min
+        self.umidade_max = umidade_max
+        self.passo = passo
+        self.penalidade = penalidade
+        self.niveis = np.arange(0, 100 + passo / 2, passo)
+
+    def otimizar(self, umidade_atual, variacao, temperatura=25, area_m2=AREA_PADRAO_M2, vazao_l_min=VAZAO_PADRAO_L_MIN,
+                 minutos_max_dia=MINUTOS_BOMBA_DIA):
+        """Programação dinâmica sobre níveis discretos de umidade
+
+        umidade_atual: (talhões,); variacao e temperatura: (dias,) ou (talhões, dias);
+        area_m2, vazao_l_min, minutos_max_dia e a faixa de umidade: escalares ou um
+        valor por talhão.
+        A cada dia a irrigação acontece antes da variação natural; a umidade no
+        fim do dia deve ficar na faixa [umidade_min, umidade_max].
+        """
+        umidade_atual = np.atleast_1d(np.asarray(umidade_atual, dtype=float))
+        n = len(umidade_atual)
+        variacao = np.atleast_2d(np.asarray(variacao, dtype=float))
+        dias = variacao.shape[1]
+        variacao = np.broadcast_to(variacao, (n, dias))
+
+        temperatura = np.broadcast_to(np.atleast_2d(np.asarray(temperatura, dtype=float)), (n, dias))
+        area_m2 = np.broadcast_to(np.asarray(area_m2, dtype=float), (n,))
+        vazao_l_min = np.broadcast_to(np.asarray(vazao_l_min, dtype=float), (n,))
+        minutos_max_dia = np.broadcast_to(np.asarray(minutos_max_dia, dtype=float), (n,))
+        umidade_min = np.broadcast_to(np.asarray(self.umidade_min, dtype=float), (n,))[:, None]
+        umidade_max = np.broadcast_to(np.asarray(self.umidade_max, dtype=float), (n,))[:, None]
+
+        # Litros por ponto percentual de umidade (mesma conta de recomendar_irrigacao)
+        litros_por_ponto = area_m2[:, None] * 0.01 * fator_temperatura(temperatura)
+        custo_passo = litros_por_ponto * self.passo
+        capacidade_passos = np.floor(vazao_l_min * minutos_max_dia / custo_passo.T).T.astype(int)
+
+        S = len(self.niveis)
+        estados = np.arange(S)
+        deslocamento = variacao / self.passo
+
+        # Excesso de irrigação acima da faixa também é penalizado
+        penalidade_acima = self.penalidade * np.maximum(0, self.niveis - umidade_max)
+
+        custo_futuro = np.zeros((n, S))
+        politicas = []
+
+        for dia in reversed(range(dias)):
+            # t = nível logo após a irrigação; o dia termina em t + variação
+            final = np.clip(estados + deslocamento[:, dia:dia + 1], 0, S - 1)
+            nivel_final = final * self.passo
+            fora_da_faixa = (np.maximum(0, umidade_min - nivel_final) +
+                             np.maximum(0, nivel_final - umidade_max))
+            proximo = np.rint(final).astype(int)
+
+            # custo(t) - custo(s) = custo_passo * (t - s): minimiza custo_passo * t + W(t)
+            # na janela s <= t <= s + capacidade
+            W = (self.penalidade * fora_da_faixa + penalidade_acima +
+                 np.take_along_axis(custo_futuro, proximo, axis=1))
+            custo_passo_dia = custo_passo[:, dia:dia + 1]
+            minimo, melhor_t = _minimo_em_janelas(custo_passo_dia * estados + W,
+                                                  capacidade_passos[:, dia] + 1)
+
+            custo_futuro = minimo - custo_passo_dia * estados
+            politicas.append(melhor_t)
+
+        politicas.reverse()
+
+        # Percorre a política a partir da leitura atual
+        volume = np.zeros((n, dias))
+        umidade_prevista = np.zeros((n, dias))
+        estado = np.clip(np.rint(umidade_atual / self.passo), 0, S - 1).astype(int)
+        talhoes = np.arange(n)
+
+        for dia in range(dias):
+            alvo = politicas[dia][talhoes, estado]
+            volume[:, dia] = (alvo - estado) * custo_passo[:, dia]
+            final = np.clip(alvo + deslocamento[:, dia], 0, S - 1)
+            umidade_prevista[:, dia] = final * self.passo
+            estado = np.rint(final).astype(int)
+
+        volume_litros = np.round(volume).astype(int)
+        return {
+            'volume_litros': volume_litros,
+            'duracao_minutos': np.round(volume / vazao_l_min[:, None]).astype(int),
+            'umidade_prevista': umidade_prevista,
+            'agua_total_litros': volume_litros.sum(axis=1),
+            'dentro_da_faixa': ((umidade_prevista >= umidade_min - self.passo / 2) &
+                                (umidade_prevista <= umidade_max + self.passo / 2)).all(axis=1)
+        }
@@ -3,14 +3,84 @@ FarmTech Solutions - Fase 4: Sistema de Recomendações Agrícolas
 Autor: Richard Schmitz - RM567951
 """
 
+import sys
 import pandas as pd
 import numpy as np
-import joblib
 from datetime import datetime, timedelta
 
+sys.path.append('../parte1')
+from artefatos import carregar_artefatos
+from dados_sensores import ler_csv_em_blocos
+from motor_regras import MotorRegras, Regra
+from cache_previsoes import CachePrevisoes
+from historico_aplicacoes import HistoricoAplicacoes, como_datetime64
+from cadastro_talhoes import CadastroTalhoes, AREA_PADRAO_M2, VAZAO_PADRAO_L_MIN
+from otimizador_irrigacao import OtimizadorIrrigacao, variacao_climatica, MINUTOS_BOMBA_DIA
+from relatorios import RelatorioRecomendacoes
+
+# Tabela de regras agronômicas. O limite é um número ou o nome de uma chave de
+# thresholds; mudar um limite ou operador aqui vale para o modo individual e o em lote
+REGRAS_PADRAO = [
+    Regra('umidade_baixa', 'umidade_solo', '<', 'umidade_min'),
+    Regra('umidade_alta', 'umidade_solo', '>', 'umidade_max'),
+    Regra('umidade_excessiva', 'umidade_solo', '>', 85, "Melhorar drenagem e monitorar doenças fúngicas"),
+    Regra('ph_baixo', 'ph_solo', '<', 'ph_min'),
+    Regra('ph_alto', 'ph_solo', '>', 'ph_max'),
+    Regra('ph_acido', 'ph_solo', '<', 6.0, "Aplicar calcário"),
+    Regra('ph_alcalino', 'ph_solo', '>', 7.0, "Reduzir doses de fertilizante"),
+    Regra('nutrientes_insuficientes', 'nutrientes_total', '<', 'nutrientes_min'),
+    Regra('temperatura_alta', 'temperatura', '>', 'temp_max'),
+    Regra('temperatura_elevada', 'temperatura', '>', 28, "Justifica irrigação adicional"),
+    Regra('stress_termico', 'temperatura', '>', 32, "Monitorar stress hídrico e sombrear"),
+    Regra('deficit_umidade', 'deficit_umidade', '>', 0),
+    Regra('deficit_medio', 'deficit_umidade', '>', 5),
+    Regra('deficit_alto', 'deficit_umidade', '>', 15),
+    Regra('chuva_prevista', 'chuva_prevista', '>=', 2, "Suspende a irrigação"),
+    Regra('nitrogenio_ausente', 'nitrogenio', '==', 0),
+    Regra('fosforo_ausente', 'fosforo', '==', 0),
+    Regra('potassio_ausente', 'potassio', '==', 0),
+    Regra('aplicacao_solo', 'nutrientes_ausentes', '>=', 2, "Aplicação no solo em vez de foliar")
+]
+
+# Bits da máscara de alertas do modo em lote (uma condição por bit)
+ALERTA_UMIDADE_BAIXA = 1
+ALERTA_UMIDADE_ALTA = 2
+ALERTA_PH = 4
+ALERTA_NUTRIENTES = 8
+ALERTA_TEMPERATURA = 16
+
+# Bits da máscara de nutrientes deficientes e dose recomendada de cada um (kg/ha)
+NUTRIENTES_FERTILIZACAO = {
+    'nitrogenio': (1, 30),
+    'fosforo': (2, 20),
+    'potassio': (4, 25)
+}
+DOSE_CALCARIO = 500
+FATOR_DOSE_PH_ALCALINO = 0.8
+
+# Janela de reentrada (dias): o que foi aplicado nela é descontado da nova dose
+JANELA_REENTRADA_DIAS = {
+    'nitrogenio': 30,
+    'fosforo': 60,
+    'potassio': 45,
+    'calcario': 180
+}
+
+# Previsão de umidade do modelo da Parte 1 (mesmas features do treinamento)
+FEATURES_UMIDADE = ['temperatura', 'chuva_mm', 'hora', 'nutrientes_total']
+HORIZONTE_PREVISAO_HORAS = 2
+
+# Categorias das colunas de texto do modo em lote
+ACOES_IRRIGACAO = ['manter', 'irrigar', 'suspender']
+PRIORIDADES = ['baixa', 'media', 'alta']
+
+def _categorias(codigos, categorias):
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
 class SistemaRecomendacoes:
-    def __init__(self):
+    def __init__(self, regras=None, cache_previsoes=None, cadastro=None, historico_aplicacoes=None):
         self.modelos = {}
+        self.scalers = {}
         self.thresholds = {
             'umidade_min': 60,
             'umidade_max': 80,
@@ -19,42 +89,129 @@ class SistemaRecomendacoes:
             'temp_max': 30,
             'nutrientes_min': 2
         }
+        self.regras = list(regras or REGRAS_PADRAO)
+        self._motor = None
+        self._assinatura_motor = None
+        self.cache_previsoes = cache_previsoes or CachePrevisoes()
+        self.cadastro = cadastro
+        self.historico_aplicacoes = historico_aplicacoes
         
     def carregar_modelos(self, diretorio="../models/modelos_treinados"):
         """Carrega modelos treinados"""
         try:
-            # Carregar modelos da Parte 1
-            self.modelos['umidade'] = joblib.load(f"{diretorio}/modelo_umidade.pkl")
-            self.modelos['ph'] = joblib.load(f"{diretorio}/modelo_ph.pkl")
-            self.modelos['irrigacao'] = joblib.load(f"{diretorio}/modelo_irrigacao.pkl")
+            # Modelos e scalers da Parte 1, lidos do disco no primeiro uso de cada tipo
+            self.modelos, self.scalers = carregar_artefatos(diretorio, ['umidade', 'ph', 'irrigacao'])
             
-            # Carregar scalers
-            self.scalers = {}
-            self.scalers['umidade'] = joblib.load(f"{diretorio}/scaler_umidade.pkl")
-            self.scalers['ph'] = joblib.load(f"{diretorio}/scaler_ph.pkl")
-            self.scalers['irrigacao'] = joblib.load(f"{diretorio}/scaler_irrigacao.pkl")
+            # Previsões em cache vieram dos modelos anteriores
+            self.cache_previsoes.limpar()
             
             return True
         except Exception as e:
             print(f"Erro ao carregar modelos: {e}")
             return False
     
-    def analisar_condicoes_atuais(self, dados_sensores):
+    def carregar_cadastro(self, caminho="../data/talhoes.csv"):
+        """Carrega área, vazão e limites de cada talhão"""
+        try:
+            self.cadastro = CadastroTalhoes.carregar(caminho)
+            return True
+        except Exception as e:
+            print(f"Erro ao carregar cadastro de talhões: {e}")
+            return False
+    
+    def carregar_historico(self, caminho="../data/historico_aplicacoes.csv"):
+        """Carrega o histórico de aplicações de fertilizantes por talhão"""
+        try:
+            self.historico_aplicacoes = HistoricoAplicacoes.carregar(caminho)
+            return True
+        except Exception as e:
+            print(f"Erro ao carregar histórico de aplicações: {e}")
+            return False
+    
+    def doses_aplicadas(self, historico, talhoes, referencia):
+        """Dose de cada nutriente já aplicada dentro da janela de reentrada (kg/ha, uma por talhão)"""
+        referencia = como_datetime64(referencia)
+        return {
+            nutriente: historico.aplicado_no_periodo(talhoes, nutriente,
+                                                     referencia - np.timedelta64(dias, 'D'), referencia)
+            for nutriente, dias in JANELA_REENTRADA_DIAS.items()
+        }
+    
+    def _parametros_padrao(self):
+        return {'area_m2': AREA_PADRAO_M2, 'vazao_l_min': VAZAO_PADRAO_L_MIN, **self.thresholds}
+    
+    def parametros_talhoes(self, leituras):
+        """Área, vazão e limites de cada linha do lote, indexados pela coluna 'talhao' no cadastro"""
+        padroes = self._parametros_padrao()
+        if self.cadastro is None or 'talhao' not in leituras:
+            return {nome: np.full(len(leituras), valor, dtype=float) for nome, valor in padroes.items()}
+        return self.cadastro.coletar(leituras['talhao'].to_numpy(), padroes)
+    
+    def parametros_talhao(self, dados_sensores):
+        """Área, vazão e limites do talhão de uma leitura (padrões se não estiver no cadastro)"""
+        padroes = self._parametros_padrao()
+        if self.cadastro is None or 'talhao' not in dados_sensores:
+            return padroes
+        return {**padroes, **self.cadastro.parametros_do_talhao(dados_sensores['talhao'])}
+    
+    def _limites(self, parametros):
+        # Só os thresholds entram na avaliação das regras; sem cadastro, vale a tabela compilada
+        if self.cadastro is None:
+            return None
+        return {nome: parametros[nome] for nome in self.thresholds}
+    
+    def _agora(self, referencia=None):
+        """Instante de referência das recomendações (o relógio só é lido se nenhum for informado)"""
+        return datetime.now() if referencia is None else pd.Timestamp(referencia).to_pydatetime()
+    
+    def _instantes(self, referencia, n):
+        """Instante de referência de cada linha do lote: um único para todas ou um por linha"""
+        if isinstance(referencia, pd.Series):
+            referencia = referencia.to_numpy()
+        if referencia is None or np.ndim(referencia) == 0:
+            return pd.DatetimeIndex(np.full(n, pd.Timestamp(self._agora(referencia)).to_datetime64()))
+        return pd.DatetimeIndex(referencia)
+    
+    def motor_regras(self):
+        """Tabela de regras compilada; só é recompilada quando as regras ou os thresholds mudam"""
+        # Pelos valores das regras, não pela identidade: uma regra editada ou
+        # recriada com outro limite também invalida o motor compilado
+        assinatura = (tuple(regra.chave() for regra in self.regras), tuple(sorted(self.thresholds.items())))
+        if self._motor is None or self._assinatura_motor != assinatura:
+            self._motor = MotorRegras(self.regras, self.thresholds)
+            self._assinatura_motor = assinatura
+        return self._motor
+    
+    def avaliar_regras(self, limites=None, **variaveis):
+        """Avalia a tabela de regras; cada variável (e limite) é um escalar ou um array com um valor por talhão"""
+        return self.motor_regras().avaliar(variaveis, limites)
+    
+    def analisar_condicoes_atuais(self, dados_sensores, referencia=None):
         """Analisa condições atuais dos sensores"""
         analise = {
-            'timestamp': datetime.now(),
+            'timestamp': self._agora(referencia),
             'condicoes': {},
             'alertas': [],
             'status_geral': 'normal'
         }
         
-        # Análise da umidade
         umidade = dados_sensores.get('umidade_solo', 0)
-        if umidade < self.thresholds['umidade_min']:
+        ph = dados_sensores.get('ph_solo', 7.0)
+        nutrientes = (dados_sensores.get('nitrogenio', 0) + 
+                     dados_sensores.get('fosforo', 0) + 
+                     dados_sensores.get('potassio', 0))
+        temperatura = dados_sensores.get('temperatura', 25)
+        parametros = self.parametros_talhao(dados_sensores)
+        
+        ativas = self.avaliar_regras(self._limites(parametros), umidade_solo=umidade, ph_solo=ph,
+                                     nutrientes_total=nutrientes, temperatura=temperatura).ativas()
+        
+        # Análise da umidade
+        if 'umidade_baixa' in ativas:
             analise['condicoes']['umidade'] = 'baixa'
             analise['alertas'].append(f"Umidade baixa ({umidade}%) - Irrigação necessária")
             analise['status_geral'] = 'atencao'
-        elif umidade > self.thresholds['umidade_max']:
+        elif 'umidade_alta' in ativas:
             analise['condicoes']['umidade'] = 'alta'
             analise['alertas'].append(f"Umidade alta ({umidade}%) - Risco de encharcamento")
             analise['status_geral'] = 'atencao'
@@ -62,20 +219,16 @@ class SistemaRecomendacoes:
             analise['condicoes']['umidade'] = 'ideal'
         
         # Análise do pH
-        ph = dados_sensores.get('ph_solo', 7.0)
-        if ph < self.thresholds['ph_min'] or ph > self.thresholds['ph_max']:
+        if 'ph_baixo' in ativas or 'ph_alto' in ativas:
             analise['condicoes']['ph'] = 'inadequado'
-            analise['alertas'].append(f"pH inadequado ({ph}) - Faixa ideal: 6.0-6.8")
+            analise['alertas'].append(f"pH inadequado ({ph}) - Faixa ideal: "
+                                      f"{parametros['ph_min']}-{parametros['ph_max']}")
             analise['status_geral'] = 'atencao'
         else:
             analise['condicoes']['ph'] = 'ideal'
         
         # Análise dos nutrientes
-        nutrientes = (dados_sensores.get('nitrogenio', 0) + 
-                     dados_sensores.get('fosforo', 0) + 
-                     dados_sensores.get('potassio', 0))
-        
-        if nutrientes < self.thresholds['nutrientes_min']:
+        if 'nutrientes_insuficientes' in ativas:
             analise['condicoes']['nutrientes'] = 'insuficientes'
             analise['alertas'].append(f"Nutrientes insuficientes ({nutrientes}/3)")
             analise['status_geral'] = 'atencao'
@@ -83,8 +236,7 @@ class SistemaRecomendacoes:
             analise['condicoes']['nutrientes'] = 'adequados'
         
         # Análise da temperatura
-        temperatura = dados_sensores.get('temperatura', 25)
-        if temperatura > self.thresholds['temp_max']:
+        if 'temperatura_alta' in ativas:
             analise['condicoes']['temperatura'] = 'alta'
             analise['alertas'].append(f"Temperatura alta ({temperatura}°C) - Stress térmico")
             if analise['status_geral'] == 'normal':
@@ -94,62 +246,135 @@ class SistemaRecomendacoes:
         
         return analise
     
-    def recomendar_irrigacao(self, dados_sensores, previsao_clima=None):
-        """Recomenda ações de irrigação"""
+    def prever_umidade_lote(self, leituras, previsao_clima=None, horizonte_horas=HORIZONTE_PREVISAO_HORAS,
+                            referencia=None):
+        """Umidade prevista pelo modelo para horizonte_horas após a referência (None sem modelo carregado)"""
+        if 'umidade' not in self.modelos:
+            return None
+        
+        n = len(leituras)
+        hora = (self._instantes(referencia, n) + pd.Timedelta(hours=horizonte_horas)).hour
+        X = np.column_stack([
+            self._temperatura_prevista(previsao_clima, self._coluna(leituras, 'temperatura', 25)),
+            self._chuva_prevista(previsao_clima, n),
+            np.asarray(hora, dtype=float),
+            (self._coluna(leituras, 'nitrogenio', 0) +
+             self._coluna(leituras, 'fosforo', 0) +
+             self._coluna(leituras, 'potassio', 0))
+        ])
+        
+        # Leituras que caem no mesmo passo de quantização são previstas uma única vez
+        cache = self.cache_previsoes
+        codigos = cache.quantizar(FEATURES_UMIDADE, X)
+        unicos, inverso = np.unique(codigos, axis=0, return_inverse=True)
+        
+        previsoes = np.empty(len(unicos))
+        faltando = []
+        for i, linha in enumerate(unicos):
+            valor = cache.obter(('umidade',) + tuple(linha.tolist()))
+            if valor is None:
+                faltando.append(i)
+            else:
+                previsoes[i] = valor
+        
+        if faltando:
+            entradas = pd.DataFrame(cache.representantes(FEATURES_UMIDADE, unicos[faltando]),
+                                    columns=FEATURES_UMIDADE)
+            novas = self.modelos['umidade'].predict(self.scalers['umidade'].transform(entradas))
+            for i, valor in zip(faltando, novas):
+                previsoes[i] = valor
+                cache.guardar(('umidade',) + tuple(unicos[i].tolist()), float(valor))
+        
+        return previsoes[inverso.reshape(-1)]
+    
+    def prever_umidade(self, dados_sensores, previsao_clima=None, horizonte_horas=HORIZONTE_PREVISAO_HORAS,
+                       referencia=None):
+        """Umidade prevista para uma leitura (None sem modelo carregado)"""
+        previsoes = self.prever_umidade_lote(pd.DataFrame([dados_sensores]), previsao_clima, horizonte_horas,
+                                             referencia)
+        return None if previsoes is None else float(previsoes[0])
+    
+    def recomendar_irrigacao(self, dados_sensores, previsao_clima=None, usar_modelo=False, referencia=None):
+        """Recomenda ações de irrigação
+
+        usar_modelo: considera também a umidade prevista pelo modelo; referencia:
+        instante da recomendação (padrão: agora), base da próxima verificação.
+        """
+        agora = self._agora(referencia)
         recomendacao = {
             'acao': 'manter',
             'volume_litros': 0,
             'duracao_minutos': 0,
             'prioridade': 'baixa',
             'justificativa': [],
-            'proxima_verificacao': datetime.now() + timedelta(hours=2)
+            'proxima_verificacao': agora + timedelta(hours=2)
         }
         
         umidade = dados_sensores.get('umidade_solo', 70)
         temperatura = dados_sensores.get('temperatura', 25)
         chuva_prevista = previsao_clima.get('chuva_mm', 0) if previsao_clima else 0
         
+        # Com o modelo, irriga antecipadamente se a umidade prevista ficar abaixo da atual
+        umidade_prevista = (self.prever_umidade(dados_sensores, previsao_clima, referencia=agora)
+                            if usar_modelo else None)
+        umidade_referencia = umidade
+        if umidade_prevista is not None:
+            recomendacao['umidade_prevista'] = umidade_prevista
+            umidade_referencia = min(umidade, umidade_prevista)
+        
         # Calcular necessidade de irrigação
-        deficit_umidade = max(0, self.thresholds['umidade_min'] - umidade)
+        parametros = self.parametros_talhao(dados_sensores)
+        deficit_umidade = max(0, parametros['umidade_min'] - umidade_referencia)
         
-        if deficit_umidade > 0 and chuva_prevista < 2:
+        ativas = self.avaliar_regras(self._limites(parametros), umidade_solo=umidade, temperatura=temperatura,
+                                     chuva_prevista=chuva_prevista, deficit_umidade=deficit_umidade).ativas()
+        
+        if 'deficit_umidade' in ativas and 'chuva_prevista' not in ativas:
             recomendacao['acao'] = 'irrigar'
             
-            # Calcular volume baseado no déficit
-            area_m2 = 1000  # Área padrão em m²
-            volume_base = deficit_umidade * area_m2 * 0.01  # Litros
+            # Calcular volume baseado no déficit e na área do talhão
+            volume_base = deficit_umidade * parametros['area_m2'] * 0.01  # Litros
             
             # Ajustar por temperatura
             fator_temperatura = 1 + max(0, (temperatura - 25) * 0.02)
             volume_final = volume_base * fator_temperatura
             
             recomendacao['volume_litros'] = round(volume_final)
-            recomendacao['duracao_minutos'] = round(volume_final / 10)  # 10L/min
+            recomendacao['duracao_minutos'] = round(volume_final / parametros['vazao_l_min'])
             
             # Definir prioridade
-            if deficit_umidade > 15:
+            if 'deficit_alto' in ativas:
                 recomendacao['prioridade'] = 'alta'
-                recomendacao['proxima_verificacao'] = datetime.now() + timedelta(hours=1)
-            elif deficit_umidade > 5:
+                recomendacao['proxima_verificacao'] = agora + timedelta(hours=1)
+            elif 'deficit_medio' in ativas:
                 recomendacao['prioridade'] = 'media'
             
             recomendacao['justificativa'].append(f"Déficit de umidade: {deficit_umidade}%")
             
-            if temperatura > 28:
+            if umidade_prevista is not None and umidade_prevista < umidade:
+                recomendacao['justificativa'].append(
+                    f"Umidade prevista em {HORIZONTE_PREVISAO_HORAS}h: {umidade_prevista:.1f}%"
+                )
+            
+            if 'temperatura_elevada' in ativas:
                 recomendacao['justificativa'].append(f"Temperatura elevada: {temperatura}°C")
         
-        elif chuva_prevista >= 2:
+        elif 'chuva_prevista' in ativas:
             recomendacao['acao'] = 'suspender'
             recomendacao['justificativa'].append(f"Chuva prevista: {chuva_prevista}mm")
         
-        elif umidade > self.thresholds['umidade_max']:
+        elif 'umidade_alta' in ativas:
             recomendacao['acao'] = 'suspender'
             recomendacao['justificativa'].append(f"Umidade alta: {umidade}%")
         
         return recomendacao
     
-    def recomendar_fertilizacao(self, dados_sensores, historico_aplicacao=None):
-        """Recomenda fertilização baseada em nutrientes e condições"""
+    def recomendar_fertilizacao(self, dados_sensores, historico_aplicacao=None, referencia=None):
+        """Recomenda fertilização baseada em nutrientes e condições
+
+        referencia: fim da janela de reentrada do histórico (padrão: timestamp da
+        leitura ou agora).
+        """
         recomendacao = {
             'necessaria': False,
             'nutrientes': [],
@@ -159,175 +384,457 @@ class SistemaRecomendacoes:
             'justificativa': []
         }
         
-        # Verificar nutrientes disponíveis
-        nitrogenio = dados_sensores.get('nitrogenio', 1)
-        fosforo = dados_sensores.get('fosforo', 1)
-        potassio = dados_sensores.get('potassio', 1)
+        nutrientes = {nutriente: dados_sensores.get(nutriente, 1) for nutriente in NUTRIENTES_FERTILIZACAO}
         ph = dados_sensores.get('ph_solo', 6.5)
         
+        ativas = self.avaliar_regras(ph_solo=ph, **nutrientes).ativas()
+        
         # Análise de necessidade por nutriente
-        if not nitrogenio:
-            recomendacao['necessaria'] = True
-            recomendacao['nutrientes'].append('nitrogenio')
-            recomendacao['quantidade_kg_ha']['nitrogenio'] = 30
-            recomendacao['justificativa'].append("Deficiência de nitrogênio detectada")
-        
-        if not fosforo:
-            recomendacao['necessaria'] = True
-            recomendacao['nutrientes'].append('fosforo')
-            recomendacao['quantidade_kg_ha']['fosforo'] = 20
-            recomendacao['justificativa'].append("Deficiência de fósforo detectada")
-        
-        if not potassio:
-            recomendacao['necessaria'] = True
-            recomendacao['nutrientes'].append('potassio')
-            recomendacao['quantidade_kg_ha']['potassio'] = 25
-            recomendacao['justificativa'].append("Deficiência de potássio detectada")
+        nomes_exibicao = {'nitrogenio': 'nitrogênio', 'fosforo': 'fósforo', 'potassio': 'potássio'}
+        for nutriente, (_, dose) in NUTRIENTES_FERTILIZACAO.items():
+            if f'{nutriente}_ausente' in ativas:
+                recomendacao['necessaria'] = True
+                recomendacao['nutrientes'].append(nutriente)
+                recomendacao['quantidade_kg_ha'][nutriente] = dose
+                recomendacao['justificativa'].append(f"Deficiência de {nomes_exibicao[nutriente]} detectada")
         
         # Ajustar por pH
-        if ph < 6.0:
+        if 'ph_acido' in ativas:
             recomendacao['justificativa'].append(f"pH baixo ({ph}) - Aplicar calcário")
-            recomendacao['quantidade_kg_ha']['calcario'] = 500
-        elif ph > 7.0:
+            recomendacao['quantidade_kg_ha']['calcario'] = DOSE_CALCARIO
+        elif 'ph_alcalino' in ativas:
             recomendacao['justificativa'].append(f"pH alto ({ph}) - Reduzir aplicação")
             # Reduzir quantidades em 20%
             for nutriente in recomendacao['quantidade_kg_ha']:
                 if nutriente != 'calcario':
-                    recomendacao['quantidade_kg_ha'][nutriente] *= 0.8
+                    recomendacao['quantidade_kg_ha'][nutriente] *= FATOR_DOSE_PH_ALCALINO
+        
+        # Descontar o que já foi aplicado dentro da janela de reentrada
+        historico = historico_aplicacao if historico_aplicacao is not None else self.historico_aplicacoes
+        if historico is not None and 'talhao' in dados_sensores:
+            if referencia is None:
+                referencia = dados_sensores.get('timestamp') or datetime.now()
+            aplicadas = self.doses_aplicadas(historico, [dados_sensores['talhao']], referencia)
+            
+            for nutriente in list(recomendacao['quantidade_kg_ha']):
+                aplicada = float(aplicadas[nutriente][0])
+                if aplicada <= 0:
+                    continue
+                
+                restante = max(0, recomendacao['quantidade_kg_ha'][nutriente] - aplicada)
+                nome = nomes_exibicao.get(nutriente, nutriente)
+                motivo = f"{aplicada:g} kg/ha aplicados nos últimos {JANELA_REENTRADA_DIAS[nutriente]} dias"
+                if restante > 0:
+                    recomendacao['quantidade_kg_ha'][nutriente] = restante
+                    recomendacao['justificativa'].append(f"Dose de {nome} reduzida: {motivo}")
+                else:
+                    del recomendacao['quantidade_kg_ha'][nutriente]
+                    if nutriente in recomendacao['nutrientes']:
+                        recomendacao['nutrientes'].remove(nutriente)
+                    recomendacao['justificativa'].append(f"Aplicação de {nome} suspensa: {motivo}")
+            
+            recomendacao['necessaria'] = bool(recomendacao['nutrientes'])
         
         # Definir tipo de aplicação
-        if len(recomendacao['nutrientes']) >= 2:
+        if 'aplicacao_solo' in self.avaliar_regras(nutrientes_ausentes=len(recomendacao['nutrientes'])).ativas():
             recomendacao['tipo_aplicacao'] = 'solo'
             recomendacao['melhor_horario'] = '16:00-18:00'
         
         return recomendacao
     
-    def recomendar_manejo_geral(self, dados_sensores, previsao_clima=None):
-        """Recomendações gerais de manejo da cultura"""
+    def recomendar_manejo_geral(self, dados_sensores, previsao_clima=None, analise=None, previsao_dias=None,
+                                referencia=None):
+        """Recomendações gerais de manejo da cultura
+
+        analise: reaproveita uma análise já feita; previsao_dias: previsão diária
+        (ver planejar_irrigacao) para incluir as irrigações no cronograma semanal;
+        referencia: dia em que o cronograma começa (padrão: agora).
+        """
+        hoje = self._agora(referencia)
         recomendacoes = {
-            'irrigacao': self.recomendar_irrigacao(dados_sensores, previsao_clima),
-            'fertilizacao': self.recomendar_fertilizacao(dados_sensores),
+            'irrigacao': self.recomendar_irrigacao(dados_sensores, previsao_clima, referencia=hoje),
+            'fertilizacao': self.recomendar_fertilizacao(dados_sensores, referencia=referencia),
             'monitoramento': [],
             'acoes_preventivas': [],
             'cronograma_semanal': {}
         }
         
         # Análise das condições
-        analise = self.analisar_condicoes_atuais(dados_sensores)
+        if analise is None:
+            analise = self.analisar_condicoes_atuais(dados_sensores, hoje)
         
         # Recomendações de monitoramento
         if analise['status_geral'] == 'atencao':
             recomendacoes['monitoramento'].append("Aumentar frequência de monitoramento para 2x/dia")
         
-        temperatura = dados_sensores.get('temperatura', 25)
-        if temperatura > 32:
+        ativas = self.avaliar_regras(temperatura=dados_sensores.get('temperatura', 25),
+                                     umidade_solo=dados_sensores.get('umidade_solo', 70)).ativas()
+        
+        if 'stress_termico' in ativas:
             recomendacoes['monitoramento'].append("Monitorar stress hídrico das plantas")
             recomendacoes['acoes_preventivas'].append("Considerar sombreamento temporário")
         
         # Ações preventivas
-        umidade = dados_sensores.get('umidade_solo', 70)
-        if umidade > 85:
+        if 'umidade_excessiva' in ativas:
             recomendacoes['acoes_preventivas'].append("Melhorar drenagem do solo")
             recomendacoes['acoes_preventivas'].append("Monitorar doenças fúngicas")
         
         # Cronograma semanal
-        hoje = datetime.now()
+        plano = None
+        if previsao_dias is not None:
+            plano = self.planejar_irrigacao(pd.DataFrame([dados_sensores]), previsao_dias)
+        
         for i in range(7):
             data = hoje + timedelta(days=i)
             dia_semana = data.strftime('%A')
+            atividades = []
+            
+            if plano is not None and i < len(plano) and plano['volume_litros'].iloc[i] > 0:
+                atividades.append(f"Irrigar {plano['volume_litros'].iloc[i]}L "
+                                  f"({plano['duracao_minutos'].iloc[i]} min)")
             
             if i == 0:  # Hoje
-                recomendacoes['cronograma_semanal'][dia_semana] = "Aplicar recomendações atuais"
+                atividades.append("Aplicar recomendações atuais")
             elif i == 2:  # Daqui a 2 dias
-                recomendacoes['cronograma_semanal'][dia_semana] = "Verificar desenvolvimento das plantas"
+                atividades.append("Verificar desenvolvimento das plantas")
             elif i == 4:  # Daqui a 4 dias
-                recomendacoes['cronograma_semanal'][dia_semana] = "Análise completa do solo"
+                atividades.append("Análise completa do solo")
             elif i == 6:  # Daqui a 6 dias
-                recomendacoes['cronograma_semanal'][dia_semana] = "Planejamento da próxima semana"
+                atividades.append("Planejamento da próxima semana")
+            
+            if atividades:
+                recomendacoes['cronograma_semanal'][dia_semana] = "; ".join(atividades)
         
         return recomendacoes
     
-    def gerar_relatorio_recomendacoes(self, dados_sensores, previsao_clima=None):
-        """Gera relatório completo de recomendações"""
-        print("="*80)
-        print("RELATÓRIO DE RECOMENDAÇÕES AGRÍCOLAS - FARMTECH SOLUTIONS")
-        print("="*80)
-        print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        print(f"Cultura: Soja")
-        
-        # Análise das condições atuais
-        analise = self.analisar_condicoes_atuais(dados_sensores)
-        
-        print(f"\nSTATUS GERAL: {analise['status_geral'].upper()}")
-        print("-" * 40)
-        
-        print(f"\nCONDIÇÕES ATUAIS:")
-        for parametro, status in analise['condicoes'].items():
-            print(f"  {parametro.title()}: {status}")
-        
-        if analise['alertas']:
-            print(f"\nALERTAS:")
-            for alerta in analise['alertas']:
-                print(f"  ⚠ {alerta}")
-        
-        # Recomendações detalhadas
-        recomendacoes = self.recomendar_manejo_geral(dados_sensores, previsao_clima)
-        
-        print(f"\nRECOMENDAÇÕES DE IRRIGAÇÃO:")
-        print("-" * 40)
-        irrig = recomendacoes['irrigacao']
-        print(f"  Ação: {irrig['acao'].upper()}")
-        print(f"  Prioridade: {irrig['prioridade']}")
-        
-        if irrig['acao'] == 'irrigar':
-            print(f"  Volume: {irrig['volume_litros']} litros")
-            print(f"  Duração: {irrig['duracao_minutos']} minutos")
-        
-        print(f"  Próxima verificação: {irrig['proxima_verificacao'].strftime('%H:%M')}")
-        
-        if irrig['justificativa']:
-            print(f"  Justificativa:")
-            for just in irrig['justificativa']:
-                print(f"    - {just}")
-        
-        print(f"\nRECOMENDAÇÕES DE FERTILIZAÇÃO:")
-        print("-" * 40)
-        fert = recomendacoes['fertilizacao']
-        
-        if fert['necessaria']:
-            print(f"  Fertilização: NECESSÁRIA")
-            print(f"  Nutrientes: {', '.join(fert['nutrientes'])}")
-            print(f"  Tipo de aplicação: {fert['tipo_aplicacao']}")
-            print(f"  Melhor horário: {fert['melhor_horario']}")
-            
-            if fert['quantidade_kg_ha']:
-                print(f"  Quantidades (kg/ha):")
-                for nutriente, quantidade in fert['quantidade_kg_ha'].items():
-                    print(f"    {nutriente.title()}: {quantidade}")
+    def _previsao_diaria(self, previsao_dias, temperatura_atual):
+        """Temperatura e chuva de cada dia do horizonte como arrays (talhões, dias)"""
+        n = len(temperatura_atual)
+        if isinstance(previsao_dias, pd.DataFrame):
+            # Uma linha por dia, a mesma previsão para todos os talhões
+            previsao_dias = {coluna: previsao_dias[coluna].to_numpy(dtype=float) for coluna in previsao_dias}
+        
+        chuva = np.atleast_2d(np.asarray(previsao_dias['chuva_mm'], dtype=float))
+        dias = chuva.shape[1]
+        chuva = np.broadcast_to(chuva, (n, dias))
+        
+        if 'temperatura' in previsao_dias:
+            temperatura = np.atleast_2d(np.asarray(previsao_dias['temperatura'], dtype=float))
+            temperatura = np.broadcast_to(temperatura, (n, dias))
         else:
-            print(f"  Fertilização: NÃO NECESSÁRIA no momento")
+            temperatura = np.repeat(temperatura_atual[:, None], dias, axis=1)
         
-        # Monitoramento e ações preventivas
-        if recomendacoes['monitoramento']:
-            print(f"\nMONITORAMENTO:")
-            print("-" * 40)
-            for item in recomendacoes['monitoramento']:
-                print(f"  • {item}")
-        
-        if recomendacoes['acoes_preventivas']:
-            print(f"\nAÇÕES PREVENTIVAS:")
-            print("-" * 40)
-            for acao in recomendacoes['acoes_preventivas']:
-                print(f"  • {acao}")
-        
-        print(f"\nCRONOGRAMA SEMANAL:")
-        print("-" * 40)
-        for dia, atividade in recomendacoes['cronograma_semanal'].items():
-            print(f"  {dia}: {atividade}")
-        
-        print("\n" + "="*80)
+        return temperatura, chuva
+    
+    def variacao_umidade_prevista(self, leituras, previsao_dias, usar_modelo=False):
+        """Variação natural (sem irrigação) da umidade de cada talhão em cada dia do horizonte"""
+        temperatura_atual = self._coluna(leituras, 'temperatura', 25)
+        temperatura, chuva = self._previsao_diaria(previsao_dias, temperatura_atual)
+        
+        if not usar_modelo or 'umidade' not in self.modelos:
+            return variacao_climatica(temperatura, chuva)
+        
+        # O modelo dá a umidade esperada para o clima de cada dia; a variação é a
+        # diferença entre dias seguidos, partindo do clima das leituras atuais
+        niveis = [self.prever_umidade_lote(
+            leituras,
+            pd.DataFrame({'temperatura': temperatura_atual, 'chuva_mm': self._coluna(leituras, 'chuva_mm', 0)}),
+            horizonte_horas=0
+        )]
+        for dia in range(temperatura.shape[1]):
+            niveis.append(self.prever_umidade_lote(
+                leituras,
+                pd.DataFrame({'temperatura': temperatura[:, dia], 'chuva_mm': chuva[:, dia]}),
+                horizonte_horas=24 * (dia + 1)
+            ))
+        
+        return np.diff(np.column_stack(niveis), axis=1)
+    
+    def planejar_irrigacao(self, leituras, previsao_dias, usar_modelo=False, minutos_max_dia=MINUTOS_BOMBA_DIA):
+        """Cronograma de irrigação de menor gasto de água que mantém a umidade na faixa ideal
+
+        leituras: DataFrame com uma linha por talhão; previsao_dias: DataFrame com
+        uma linha por dia (chuva_mm e, opcionalmente, temperatura) ou dict de
+        arrays (talhões, dias). Área, vazão e faixa de umidade vêm do cadastro de
+        talhões; minutos_max_dia (limite da bomba) aceita um valor por talhão.
+        Retorna uma linha por (talhão, dia).
+        """
+        if isinstance(leituras, dict):
+            leituras = pd.DataFrame([leituras])
+        
+        temperatura, _ = self._previsao_diaria(previsao_dias, self._coluna(leituras, 'temperatura', 25))
+        parametros = self.parametros_talhoes(leituras)
+        otimizador = OtimizadorIrrigacao(parametros['umidade_min'], parametros['umidade_max'])
+        plano = otimizador.otimizar(
+            self._coluna(leituras, 'umidade_solo', 70),
+            self.variacao_umidade_prevista(leituras, previsao_dias, usar_modelo),
+            temperatura=temperatura,
+            area_m2=parametros['area_m2'],
+            vazao_l_min=parametros['vazao_l_min'],
+            minutos_max_dia=minutos_max_dia
+        )
+        
+        n, dias = plano['volume_litros'].shape
+        talhoes = leituras['talhao'] if 'talhao' in leituras else leituras.index
+        indice = pd.MultiIndex.from_product([talhoes, range(dias)], names=['talhao', 'dia'])
+        return pd.DataFrame({
+            'volume_litros': plano['volume_litros'].ravel(),
+            'duracao_minutos': plano['duracao_minutos'].ravel(),
+            'umidade_prevista': plano['umidade_prevista'].ravel(),
+            'dentro_da_faixa': np.repeat(plano['dentro_da_faixa'], dias)
+        }, index=indice)
+    
+    def _coluna(self, leituras, nome, padrao):
+        """Coluna do lote como array float; ausente, vale o mesmo padrão do .get() do modo individual"""
+        if nome in leituras:
+            return leituras[nome].to_numpy(dtype=float)
+        return np.full(len(leituras), padrao, dtype=float)
+    
+    def _chuva_prevista(self, previsao_clima, n):
+        # Previsão única (dict) para todos os talhões ou uma linha por talhão (DataFrame)
+        if previsao_clima is None:
+            return np.zeros(n)
+        if isinstance(previsao_clima, pd.DataFrame):
+            return previsao_clima['chuva_mm'].to_numpy(dtype=float)
+        return np.full(n, previsao_clima.get('chuva_mm', 0), dtype=float)
+    
+    def _temperatura_prevista(self, previsao_clima, temperatura_atual):
+        # Sem previsão de temperatura, a leitura atual é usada
+        if isinstance(previsao_clima, pd.DataFrame) and 'temperatura' in previsao_clima:
+            return previsao_clima['temperatura'].to_numpy(dtype=float)
+        if isinstance(previsao_clima, dict) and 'temperatura' in previsao_clima:
+            return np.full(len(temperatura_atual), previsao_clima['temperatura'], dtype=float)
+        return temperatura_atual
+    
+    def analisar_condicoes_lote(self, leituras):
+        """Versão em lote de analisar_condicoes_atuais: uma linha por talhão, alertas como máscara de bits"""
+        regras = self.avaliar_regras(
+            self._limites(self.parametros_talhoes(leituras)),
+            umidade_solo=self._coluna(leituras, 'umidade_solo', 0),
+            ph_solo=self._coluna(leituras, 'ph_solo', 7.0),
+            nutrientes_total=(self._coluna(leituras, 'nitrogenio', 0) +
+                              self._coluna(leituras, 'fosforo', 0) +
+                              self._coluna(leituras, 'potassio', 0)),
+            temperatura=self._coluna(leituras, 'temperatura', 25)
+        )
+        
+        umidade_baixa = regras['umidade_baixa']
+        umidade_alta = ~umidade_baixa & regras['umidade_alta']
+        ph_inadequado = regras['ph_baixo'] | regras['ph_alto']
+        nutrientes_insuficientes = regras['nutrientes_insuficientes']
+        temperatura_alta = regras['temperatura_alta']
+        
+        alertas = (umidade_baixa * ALERTA_UMIDADE_BAIXA |
+                   umidade_alta * ALERTA_UMIDADE_ALTA |
+                   ph_inadequado * ALERTA_PH |
+                   nutrientes_insuficientes * ALERTA_NUTRIENTES |
+                   temperatura_alta * ALERTA_TEMPERATURA).astype(np.uint8)
+        
+        return pd.DataFrame({
+            'condicao_umidade': _categorias(np.select([umidade_baixa, umidade_alta], [1, 2], 0),
+                                            ['ideal', 'baixa', 'alta']),
+            'condicao_ph': _categorias(ph_inadequado.astype(int), ['ideal', 'inadequado']),
+            'condicao_nutrientes': _categorias(nutrientes_insuficientes.astype(int),
+                                               ['adequados', 'insuficientes']),
+            'condicao_temperatura': _categorias(temperatura_alta.astype(int), ['normal', 'alta']),
+            'alertas': alertas,
+            'status_geral': _categorias((alertas != 0).astype(int), ['normal', 'atencao'])
+        }, index=leituras.index)
+    
+    def recomendar_irrigacao_lote(self, leituras, previsao_clima=None, usar_modelo=False, referencia=None):
+        """Versão em lote de recomendar_irrigacao
+
+        previsao_clima: dict único ou DataFrame por talhão; referencia: um instante
+        para todo o lote ou um por linha (ex.: leituras['timestamp']).
+        """
+        agora = self._instantes(referencia, len(leituras))
+        umidade = self._coluna(leituras, 'umidade_solo', 70)
+        temperatura = self._coluna(leituras, 'temperatura', 25)
+        chuva_prevista = self._chuva_prevista(previsao_clima, len(leituras))
+        
+        umidade_prevista = (self.prever_umidade_lote(leituras, previsao_clima, referencia=agora)
+                            if usar_modelo else None)
+        umidade_referencia = umidade if umidade_prevista is None else np.minimum(umidade, umidade_prevista)
+        
+        parametros = self.parametros_talhoes(leituras)
+        deficit_umidade = parametros['umidade_min'] - umidade_referencia
+        deficit_umidade = np.where(deficit_umidade > 0, deficit_umidade, 0)
+        
+        regras = self.avaliar_regras(self._limites(parametros), umidade_solo=umidade, temperatura=temperatura,
+                                     chuva_prevista=chuva_prevista, deficit_umidade=deficit_umidade)
+        
+        irrigar = regras['deficit_umidade'] & ~regras['chuva_prevista']
+        suspender = ~irrigar & (regras['chuva_prevista'] | regras['umidade_alta'])
+        
+        # Mesma sequência de operações do modo individual, para resultados idênticos
+        volume_base = deficit_umidade * parametros['area_m2'] * 0.01
+        ajuste_temperatura = (temperatura - 25) * 0.02
+        volume_final = volume_base * (1 + np.where(ajuste_temperatura > 0, ajuste_temperatura, 0))
+        
+        prioridade = np.select([irrigar & regras['deficit_alto'], irrigar & regras['deficit_medio']], [2, 1], 0)
+        
+        horas_verificacao = np.where(prioridade == 2, 1, 2)
+        
+        colunas_previsao = {} if umidade_prevista is None else {'umidade_prevista': umidade_prevista}
+        
+        return pd.DataFrame({
+            'acao': _categorias(np.select([irrigar, suspender], [1, 2], 0), ACOES_IRRIGACAO),
+            'volume_litros': np.where(irrigar, np.round(volume_final), 0).astype(int),
+            'duracao_minutos': np.where(irrigar, np.round(volume_final / parametros['vazao_l_min']), 0).astype(int),
+            'prioridade': _categorias(prioridade, PRIORIDADES),
+            'deficit_umidade': deficit_umidade,
+            'proxima_verificacao': agora + pd.to_timedelta(horas_verificacao, unit='h'),
+            **colunas_previsao
+        }, index=leituras.index)
+    
+    def controlar_irrigacao(self, leituras, controle, previsao_clima=None, usar_modelo=False):
+        """Passa as recomendações do lote pela máquina de estados e retorna só as transições
+
+        leituras precisa das colunas 'talhao' e 'timestamp'; a faixa de histerese
+        parte do umidade_min de cada talhão.
+        """
+        irrigacao = self.recomendar_irrigacao_lote(leituras, previsao_clima, usar_modelo)
+        transicoes = controle.processar(
+            leituras['talhao'].to_numpy(),
+            leituras['timestamp'].to_numpy(),
+            irrigacao['acao'],
+            self._coluna(leituras, 'umidade_solo', 70),
+            self.parametros_talhoes(leituras)['umidade_min']
+        )
+        
+        # Volume e duração da recomendação que originou cada transição
+        detalhes = irrigacao.iloc[transicoes.index][['volume_litros', 'duracao_minutos', 'prioridade']]
+        return pd.concat([transicoes, detalhes.set_axis(transicoes.index)], axis=1)
+    
+    def recomendar_fertilizacao_lote(self, leituras, historico_aplicacao=None, referencia=None):
+        """Versão em lote de recomendar_fertilizacao: nutrientes recomendados como máscara de bits"""
+        regras = self.avaliar_regras(
+            ph_solo=self._coluna(leituras, 'ph_solo', 6.5),
+            **{nutriente: self._coluna(leituras, nutriente, 1) for nutriente in NUTRIENTES_FERTILIZACAO}
+        )
+        
+        # Calcário em pH ácido; senão, doses reduzidas em pH alcalino
+        ph_acido = regras['ph_acido']
+        fator_ph = np.where(~ph_acido & regras['ph_alcalino'], FATOR_DOSE_PH_ALCALINO, 1.0)
+        
+        # Doses já aplicadas na janela de reentrada de cada nutriente (uma busca binária por talhão)
+        historico = historico_aplicacao if historico_aplicacao is not None else self.historico_aplicacoes
+        aplicadas = {}
+        if historico is not None and 'talhao' in leituras:
+            if referencia is None:
+                referencia = leituras['timestamp'] if 'timestamp' in leituras else datetime.now()
+            aplicadas = self.doses_aplicadas(historico, leituras['talhao'].to_numpy(), referencia)
+        
+        colunas = {}
+        deficientes = np.zeros(len(leituras), dtype=np.uint8)
+        suprimidos = np.zeros(len(leituras), dtype=np.uint8)
+        quantidade_deficientes = np.zeros(len(leituras), dtype=int)
+        
+        for nutriente, (bit, dose) in NUTRIENTES_FERTILIZACAO.items():
+            deficiente = regras[f'{nutriente}_ausente']
+            dose_final = np.where(deficiente, dose * fator_ph, 0)
+            if nutriente in aplicadas:
+                aplicada = aplicadas[nutriente]
+                dose_final = np.where(aplicada > 0, np.maximum(0, dose_final - aplicada), dose_final)
+                suprimidos |= ((deficiente & (dose_final == 0)) * bit).astype(np.uint8)
+                deficiente = deficiente & (dose_final > 0)
+            
+            deficientes |= (deficiente * bit).astype(np.uint8)
+            quantidade_deficientes += deficiente
+            colunas[f'dose_{nutriente}'] = dose_final
+        
+        colunas['dose_calcario'] = np.where(ph_acido, DOSE_CALCARIO, 0)
+        if 'calcario' in aplicadas:
+            colunas['dose_calcario'] = np.maximum(0, colunas['dose_calcario'] - aplicadas['calcario'])
+        
+        aplicacao_solo = self.avaliar_regras(nutrientes_ausentes=quantidade_deficientes)['aplicacao_solo']
+        
+        return pd.DataFrame({
+            'fertilizacao_necessaria': deficientes != 0,
+            'nutrientes_deficientes': deficientes,
+            'nutrientes_suprimidos': suprimidos,
+            **colunas,
+            'tipo_aplicacao': _categorias(aplicacao_solo.astype(int), ['foliar', 'solo']),
+            'melhor_horario': _categorias(aplicacao_solo.astype(int), ['06:00-08:00', '16:00-18:00'])
+        }, index=leituras.index)
+    
+    def recomendar_lote(self, leituras, previsao_clima=None, usar_modelo=False, referencia=None):
+        """Análise, irrigação e fertilização de muitos talhões de uma vez (uma linha por talhão)"""
+        return pd.concat([
+            self.analisar_condicoes_lote(leituras),
+            self.recomendar_irrigacao_lote(leituras, previsao_clima, usar_modelo, referencia),
+            self.recomendar_fertilizacao_lote(leituras, referencia=referencia)
+        ], axis=1)
+    
+    def backfill(self, leituras, previsao_clima=None, usar_modelo=False, periodo='D'):
+        """Refaz as recomendações de um histórico de leituras, em lotes vetorizados em ordem de tempo
+
+        leituras: DataFrame com a coluna 'timestamp' ou um iterável de blocos em
+        ordem de tempo (ex.: ler_csv_em_blocos). Cada leitura é avaliada no seu
+        próprio instante, então o resultado não depende de quando o backfill roda.
+        previsao_clima: dict único ou DataFrame com uma linha por leitura, com o
+        mesmo índice do histórico (cada lote usa as linhas do seu índice).
+        """
+        blocos = [leituras] if isinstance(leituras, pd.DataFrame) else leituras
+        resultados = []
+        
+        for bloco in blocos:
+            bloco = bloco.sort_values('timestamp', kind='stable')
+            for _, lote in bloco.groupby(bloco['timestamp'].dt.floor(periodo), sort=True):
+                identificacao = [coluna for coluna in ('talhao', 'timestamp') if coluna in lote]
+                resultados.append(pd.concat([
+                    lote[identificacao],
+                    self.recomendar_lote(lote, self._previsao_do_lote(previsao_clima, lote), usar_modelo,
+                                         referencia=lote['timestamp'])
+                ], axis=1))
+        
+        return pd.concat(resultados) if resultados else pd.DataFrame()
+    
+    def _previsao_do_lote(self, previsao_clima, lote):
+        """Linhas da previsão por leitura que correspondem ao lote (pelo índice do histórico)"""
+        if not isinstance(previsao_clima, pd.DataFrame):
+            return previsao_clima
+        ausentes = ~lote.index.isin(previsao_clima.index)
+        if ausentes.any():
+            raise ValueError(f"Previsão por leitura sem {int(ausentes.sum())} linha(s) do histórico: "
+                             f"o índice de previsao_clima deve ser o mesmo das leituras")
+        return previsao_clima.loc[lote.index]
+    
+    def backfill_arquivo(self, arquivo_path="../data/dados_treinamento.csv", previsao_clima=None,
+                         usar_modelo=False, periodo='D'):
+        """Backfill direto de um CSV de sensores, lido em blocos"""
+        return self.backfill(ler_csv_em_blocos(arquivo_path), previsao_clima, usar_modelo, periodo)
+    
+    def construir_relatorio(self, dados_sensores, previsao_clima=None, cultura='Soja', talhao=None,
+                            previsao_dias=None, referencia=None):
+        """Relatório estruturado (sem imprimir nada), com a análise calculada uma única vez"""
+        data_hora = self._agora(referencia)
+        analise = self.analisar_condicoes_atuais(dados_sensores, data_hora)
+        recomendacoes = self.recomendar_manejo_geral(dados_sensores, previsao_clima, analise=analise,
+                                                     previsao_dias=previsao_dias, referencia=data_hora)
+        
+        return RelatorioRecomendacoes(analise, recomendacoes, data_hora, cultura, talhao)
+    
+    def relatorios_por_talhao(self, leituras, previsao_clima=None, coluna_talhao='talhao', referencia=None):
+        """Gera (talhão, relatório) para cada linha de um DataFrame de leituras
+
+        O talhão fica na leitura (parâmetros do cadastro e histórico de
+        aplicações); o timestamp da linha, se houver, é o instante do relatório.
+        """
+        for posicao, dados_sensores in enumerate(leituras.to_dict('records')):
+            talhao = dados_sensores.get(coluna_talhao, posicao)
+            if coluna_talhao in dados_sensores:
+                dados_sensores['talhao'] = talhao
+            instante = dados_sensores.get('timestamp')
+            yield talhao, self.construir_relatorio(dados_sensores, previsao_clima, talhao=talhao,
+                                                   referencia=referencia if pd.isna(instante) else instante)
+    
+    def gerar_relatorio_recomendacoes(self, dados_sensores, previsao_clima=None, referencia=None):
+        """Gera e imprime o relatório completo de recomendações"""
+        relatorio = self.construir_relatorio(dados_sensores, previsao_clima, referencia=referencia)
+        print(relatorio.para_texto(), end='')
         
-        return recomendacoes
+        return relatorio.recomendacoes
 
 def main():
     # Dados de exemplo dos sensores
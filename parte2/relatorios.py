@@ -0,0 +1,376 @@
+"""
+FarmTech Solutions - Fase 4: Relatórios Estruturados (texto, JSON e Markdown)
+Autor: Richard Schmitz - RM567951
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+import numpy as np
+
+# Extensão dos arquivos de cada formato
+EXTENSOES = {
+    'texto': '.txt',
+    'json': '.json',
+    'markdown': '.md'
+}
+
+def _serializar(valor):
+    """Converte valores que o json não conhece (datas e escalares/arrays numpy)"""
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    return str(valor)
+
+class Relatorio(ABC):
+    """Base dos relatórios: os dados ficam guardados e são renderizados só quando pedidos"""
+
+    @abstractmethod
+    def para_dict(self):
+        """Dados do relatório em tipos serializáveis"""
+
+    @abstractmethod
+    def linhas_texto(self):
+        """Linhas da versão em texto"""
+
+    @abstractmethod
+    def linhas_markdown(self):
+        """Linhas da versão em Markdown"""
+
+    def para_texto(self):
+        return "\n".join(self.linhas_texto()) + "\n"
+
+    def para_markdown(self):
+        return "\n".join(self.linhas_markdown()) + "\n"
+
+    def para_json(self, indent=2):
+        return json.dumps(self.para_dict(), ensure_ascii=False, indent=indent, default=_serializar)
+
+    def renderizar(self, formato='texto'):
+        if formato == 'texto':
+            return self.para_texto()
+        if formato == 'json':
+            return self.para_json()
+        if formato == 'markdown':
+            return self.para_markdown()
+        raise ValueError(f"Formato de relatório desconhecido: {formato}")
+
+    def salvar(self, arquivo, formato=None):
+        """Grava o relatório; sem formato, ele é deduzido da extensão do arquivo"""
+        if formato is None:
+            extensao = os.path.splitext(arquivo)[1]
+            formato = next((nome for nome, ext in EXTENSOES.items() if ext == extensao), 'texto')
+
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(self.renderizar(formato))
+        return arquivo
+
+class RelatorioRecomendacoes(Relatorio):
+    """Análise e recomendações de um talhão"""
+
+    def __init__(self, analise, recomendacoes, data_hora=None, cultura='Soja', talhao=None):
+        self.analise = analise
+        self.recomendacoes = recomendacoes
+        self.data_hora = data_hora or datetime.now()
+        self.cultura = cultura
+        self.talhao = talhao
+
+    def para_dict(self):
+        return {
+            'talhao': self.talhao,
+            'data_hora': self.data_hora,
+            'cultura': self.cultura,
+            'analise': self.analise,
+            'recomendacoes': self.recomendacoes
+        }
+
+    def linhas_texto(self):
+        analise = self.analise
+        irrig = self.recomendacoes['irrigacao']
+        fert = self.recomendacoes['fertilizacao']
+
+        linhas = [
+            "=" * 80,
+            "RELATÓRIO DE RECOMENDAÇÕES AGRÍCOLAS - FARMTECH SOLUTIONS",
+            "=" * 80,
+            f"Data/Hora: {self.data_hora.strftime('%d/%m/%Y %H:%M:%S')}",
+            f"Cultura: {self.cultura}"
+        ]
+        if self.talhao is not None:
+            linhas.append(f"Talhão: {self.talhao}")
+
+        linhas += [f"\nSTATUS GERAL: {analise['status_geral'].upper()}", "-" * 40, "\nCONDIÇÕES ATUAIS:"]
+        linhas += [f"  {parametro.title()}: {status}" for parametro, status in analise['condicoes'].items()]
+
+        if analise['alertas']:
+            linhas.append("\nALERTAS:")
+            linhas += [f"  ⚠ {alerta}" for alerta in analise['alertas']]
+
+        linhas += [
+            "\nRECOMENDAÇÕES DE IRRIGAÇÃO:",
+            "-" * 40,
+            f"  Ação: {irrig['acao'].upper()}",
+            f"  Prioridade: {irrig['prioridade']}"
+        ]
+        if irrig['acao'] == 'irrigar':
+            linhas.append(f"  Volume: {irrig['volume_litros']} litros")
+            linhas.append(f"  Duração: {irrig['duracao_minutos']} minutos")
+        linhas.append(f"  Próxima verificação: {irrig['proxima_verificacao'].strftime('%H:%M')}")
+        if irrig['justificativa']:
+            linhas.append("  Justificativa:")
+            linhas += [f"    - {just}" for just in irrig['justificativa']]
+
+        linhas += ["\nRECOMENDAÇÕES DE FERTILIZAÇÃO:", "-" * 40]
+        if fert['necessaria']:
+            linhas += [
+                "  Fertilização: NECESSÁRIA",
+                f"  Nutrientes: {', '.join(fert['nutrientes'])}",
+                f"  Tipo de aplicação: {fert['tipo_aplicacao']}",
+                f"  Melhor horário: {fert['melhor_horario']}"
+            ]
+            if fert['quantidade_kg_ha']:
+                linhas.append("  Quantidades (kg/ha):")
+                linhas += [f"    {nutriente.title()}: {quantidade}"
+                           for nutriente, quantidade in fert['quantidade_kg_ha'].items()]
+        else:
+            linhas.append("  Fertilização: NÃO NECESSÁRIA no momento")
+
+        if self.recomendacoes['monitoramento']:
+            linhas += ["\nMONITORAMENTO:", "-" * 40]
+            linhas += [f"  • {item}" for item in self.recomendacoes['monitoramento']]
+
+        if self.recomendacoes['acoes_preventivas']:
+            linhas += ["\nAÇÕES PREVENTIVAS:", "-" * 40]
+            linhas += [f"  • {acao}" for acao in self.recomendacoes['acoes_preventivas']]
+
+        linhas += ["\nCRONOGRAMA SEMANAL:", "-" * 40]
+        linhas += [f"  {dia}: {atividade}" for dia, atividade in self.recomendacoes['cronograma_semanal'].items()]
+
+        linhas.append("\n" + "=" * 80)
+        return linhas
+
+    def linhas_markdown(self):
+        analise = self.analise
+        irrig = self.recomendacoes['irrigacao']
+        fert = self.recomendacoes['fertilizacao']
+
+        titulo = "# Relatório de Recomendações Agrícolas"
+        if self.talhao is not None:
+            titulo += f" - Talhão {self.talhao}"
+
+        linhas = [
+            titulo,
+            "",
+            f"**Data/Hora:** {self.data_hora.strftime('%d/%m/%Y %H:%M:%S')}  ",
+            f"**Cultura:** {self.cultura}  ",
+            f"**Status geral:** {analise['status_geral'].upper()}",
+            "",
+            "## Condições atuais",
+            "",
+            "| Parâmetro | Status |",
+            "|---|---|"
+        ]
+        linhas += [f"| {parametro.title()} | {status} |" for parametro, status in analise['condicoes'].items()]
+
+        if analise['alertas']:
+            linhas += ["", "## Alertas", ""]
+            linhas += [f"- ⚠ {alerta}" for alerta in analise['alertas']]
+
+        linhas += [
+            "",
+            "## Irrigação",
+            "",
+            f"- **Ação:** {irrig['acao'].upper()}",
+            f"- **Prioridade:** {irrig['prioridade']}"
+        ]
+        if irrig['acao'] == 'irrigar':
+            linhas.append(f"- **Volume:** {irrig['volume_litros']} litros")
+            linhas.append(f"- **Duração:** {irrig['duracao_minutos']} minutos")
+        linhas.append(f"- **Próxima verificação:** {irrig['proxima_verificacao'].strftime('%H:%M')}")
+        linhas += [f"- {just}" for just in irrig['justificativa']]
+
+        linhas += ["", "## Fertilização", ""]
+        if fert['necessaria']:
+            linhas += [
+                f"- **Nutrientes:** {', '.join(fert['nutrientes'])}",
+                f"- **Tipo de aplicação:** {fert['tipo_aplicacao']}",
+                f"- **Melhor horário:** {fert['melhor_horario']}"
+            ]
+            linhas += [f"- {nutriente.title()}: {quantidade} kg/ha"
+                       for nutriente, quantidade in fert['quantidade_kg_ha'].items()]
+        else:
+            linhas.append("Não necessária no momento.")
+
+        if self.recomendacoes['monitoramento']:
+            linhas += ["", "## Monitoramento", ""]
+            linhas += [f"- {item}" for item in self.recomendacoes['monitoramento']]
+
+        if self.recomendacoes['acoes_preventivas']:
+            linhas += ["", "## Ações preventivas", ""]
+            linhas += [f"- {acao}" for acao in self.recomendacoes['acoes_preventivas']]
+
+        linhas += ["", "## Cronograma semanal", "", "| Dia | Atividade |", "|---|---|"]
+        linhas += [f"| {dia} | {atividade} |" for dia, atividade in self.recomendacoes['cronograma_semanal'].items()]
+        return linhas
+
+class RelatorioAvaliacao(Relatorio):
+    """Rankings e análise detalhada dos modelos preditivos"""
+
+    def __init__(self, rankings, detalhes):
+        self.rankings = rankings
+        self.detalhes = detalhes
+
+    @property
+    def melhor_modelo(self):
+        return self.rankings['r2'][0]
+
+    def para_dict(self):
+        return {
+            'rankings': self.rankings,
+            'detalhes': self.detalhes,
+            'melhor_modelo': {'nome': self.melhor_modelo[0], 'r2': self.melhor_modelo[1]}
+        }
+
+    def _veredito(self):
+        r2 = self.melhor_modelo[1]
+        if r2 >= 0.8:
+            return "✓ Modelo adequado para uso em produção"
+        elif r2 >= 0.6:
+            return "⚠ Modelo adequado para análises, mas pode ser melhorado"
+        return "✗ Modelo necessita melhorias significativas"
+
+    def linhas_texto(self):
+        linhas = [
+            "=" * 80,
+            "RELATÓRIO DE AVALIAÇÃO DOS MODELOS - FARMTECH SOLUTIONS",
+            "=" * 80,
+            f"\n{'RANKING DOS MODELOS':<30}",
+            "-" * 50
+        ]
+
+        for chave, titulo, rotulo in [('r2', "Por R² (Coeficiente de Determinação):", "R²"),
+                                      ('rmse', "Por RMSE (Erro Quadrático Médio):", "RMSE"),
+                                      ('mae', "Por MAE (Erro Absoluto Médio):", "MAE")]:
+            linhas.append(f"\n{titulo}")
+            linhas += [f"  {i}. {modelo:<20} {rotulo} = {valor:.4f}"
+                       for i, (modelo, valor) in enumerate(self.rankings[chave], 1)]
+
+        linhas += [f"\n{'ANÁLISE DETALHADA POR MODELO':<30}", "-" * 50]
+
+        for nome_modelo, detalhe in self.detalhes.items():
+            linhas += [
+                f"\n{nome_modelo.upper()}:",
+                f"  Target: {detalhe['target']}",
+                f"  Features: {detalhe['n_features']}",
+                f"  MAE: {detalhe['mae']:.4f}",
+                f"  RMSE: {detalhe['rmse']:.4f}",
+                f"  R²: {detalhe['r2']:.4f}"
+            ]
+
+            interpretacao = detalhe['interpretacao']
+            if interpretacao:
+                linhas += [
+                    f"  Qualidade: {interpretacao['qualidade_geral']}",
+                    f"  Precisão: {interpretacao['precisao']}",
+                    f"  Aplicabilidade: {interpretacao['aplicabilidade']}"
+                ]
+                if interpretacao['recomendacoes']:
+                    linhas.append("  Recomendações:")
+                    linhas += [f"    - {rec}" for rec in interpretacao['recomendacoes']]
+
+            residuos = detalhe['residuos']
+            if residuos:
+                linhas += [
+                    f"  Média dos resíduos: {residuos['media_residuos']:.4f}",
+                    f"  Desvio padrão dos resíduos: {residuos['std_residuos']:.4f}",
+                    f"  Outliers detectados: {residuos['outliers']}"
+                ]
+
+        melhor = self.melhor_modelo
+        linhas += [
+            f"\n{'RECOMENDAÇÕES GERAIS':<30}",
+            "-" * 50,
+            f"\nMelhor modelo geral: {melhor[0]} (R² = {melhor[1]:.4f})",
+            self._veredito(),
+            "\nPara melhorar a performance:",
+            "- Coletar mais dados históricos",
+            "- Adicionar features meteorológicas",
+            "- Implementar ensemble de modelos",
+            "- Ajustar hiperparâmetros via grid search"
+        ]
+        return linhas
+
+    def linhas_markdown(self):
+        linhas = [
+            "# Relatório de Avaliação dos Modelos",
+            "",
+            "## Ranking dos modelos",
+            "",
+            "| Posição | Modelo | R² | RMSE | MAE |",
+            "|---|---|---|---|---|"
+        ]
+        for i, (modelo, r2) in enumerate(self.rankings['r2'], 1):
+            detalhe = self.detalhes[modelo]
+            linhas.append(f"| {i} | {modelo} | {r2:.4f} | {detalhe['rmse']:.4f} | {detalhe['mae']:.4f} |")
+
+        linhas += ["", "## Análise detalhada por modelo"]
+        for nome_modelo, detalhe in self.detalhes.items():
+            linhas += [
+                "",
+                f"### {nome_modelo}",
+                "",
+                f"- **Target:** {detalhe['target']}",
+                f"- **Features:** {detalhe['n_features']}"
+            ]
+            interpretacao = detalhe['interpretacao']
+            if interpretacao:
+                linhas += [
+                    f"- **Qualidade:** {interpretacao['qualidade_geral']}",
+                    f"- **Precisão:** {interpretacao['precisao']}",
+                    f"- **Aplicabilidade:** {interpretacao['aplicabilidade']}"
+                ]
+                linhas += [f"- {rec}" for rec in interpretacao['recomendacoes']]
+            residuos = detalhe['residuos']
+            if residuos:
+                linhas.append(f"- **Resíduos:** média {residuos['media_residuos']:.4f}, "
+                              f"desvio {residuos['std_residuos']:.4f}, {residuos['outliers']} outliers")
+
+        melhor = self.melhor_modelo
+        linhas += [
+            "",
+            "## Recomendações gerais",
+            "",
+            f"Melhor modelo geral: **{melhor[0]}** (R² = {melhor[1]:.4f})",
+            "",
+            self._veredito()
+        ]
+        return linhas
+
+def gravar_relatorios(relatorios, diretorio, formato='json'):
+    """Grava muitos relatórios de uma vez, sem passar pelo stdout
+
+    relatorios: iterável de (identificador, relatório). Com formato 'jsonl' tudo
+    vai para um único arquivo, uma linha por relatório; nos demais, um arquivo
+    por identificador.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+
+    if formato == 'jsonl':
+        arquivo = os.path.join(diretorio, 'relatorios.jsonl')
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            for _, relatorio in relatorios:
+                f.write(relatorio.para_json(indent=None))
+                f.write("\n")
+        return [arquivo]
+
+    arquivos = []
+    for identificador, relatorio in relatorios:
+        arquivo = os.path.join(diretorio, f"relatorio_{identificador}{EXTENSOES[formato]}")
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            f.write(relatorio.renderizar(formato))
+        arquivos.append(arquivo)
+    return arquivos
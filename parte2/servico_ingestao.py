@@ -0,0 +1,306 @@
+"""
+FarmTech Solutions - Fase 4: Serviço Assíncrono de Ingestão de Leituras dos Sensores
+Autor: Richard Schmitz - RM567951
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+sys.path.append('../parte1')
+from dados_sensores import ler_csv_em_blocos, DTYPES_SENSORES
+from ml_pipeline import FarmTechMLPipeline
+from recomendacoes import SistemaRecomendacoes
+from controle_irrigacao import ControleIrrigacao
+
+PORTA_PADRAO = 8765
+
+# Marca de fim de fluxo nas filas internas
+_FIM = object()
+
+def validar_leitura(leitura):
+    """Cópia da leitura com os campos dos sensores convertidos para float
+
+    Levanta ValueError (ou TypeError) se a leitura não for um objeto, se um
+    campo de sensor não for um número finito ou se o timestamp não for uma data.
+    Campos ausentes continuam ausentes e valem os padrões das recomendações.
+    """
+    if not isinstance(leitura, Mapping):
+        raise TypeError(f"Leitura deve ser um objeto, não {type(leitura).__name__}")
+
+    leitura = dict(leitura)
+    for campo in DTYPES_SENSORES:
+        if campo in leitura:
+            valor = float(leitura[campo])
+            if not math.isfinite(valor):
+                raise ValueError(f"Valor inválido em '{campo}': {leitura[campo]!r}")
+            leitura[campo] = valor
+
+    if 'timestamp' in leitura:
+        leitura['timestamp'] = pd.Timestamp(leitura['timestamp'])
+        if leitura['timestamp'] is pd.NaT:
+            raise ValueError("Timestamp ausente")
+    return leitura
+
+class ServicoIngestao:
+    """Recebe leituras de muitas sondas, agrupa em janelas de tempo e gera recomendações por talhão"""
+
+    def __init__(self, sistema=None, pipeline=None, previsao_clima=None, usar_modelo=False,
+                 janela_segundos=0.25, tamanho_maximo_lote=5000, capacidade_fila=100_000, controle=None):
+        self.sistema = sistema or SistemaRecomendacoes()
+        self.pipeline = pipeline
+        self.controle = controle
+        self.previsao_clima = previsao_clima
+        self.usar_modelo = usar_modelo
+        self.janela_segundos = janela_segundos
+        self.tamanho_maximo_lote = tamanho_maximo_lote
+
+        self.capacidade_fila = capacidade_fila
+        self._entrada = None
+        self._saida = None
+        self._executor = None
+        self._tarefa = None
+
+        self.leituras_recebidas = 0
+        self.leituras_invalidas = 0
+        self.lotes_processados = 0
+        self.lotes_com_erro = 0
+
+    async def __aenter__(self):
+        self.iniciar()
+        return self
+
+    async def __aexit__(self, *excecao):
+        await self.encerrar()
+
+    def iniciar(self):
+        # Fila de entrada limitada: sondas rápidas demais esperam (backpressure)
+        self._entrada = asyncio.Queue(maxsize=self.capacidade_fila)
+        self._saida = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._tarefa = asyncio.get_running_loop().create_task(self._agrupar())
+
+    async def encerrar(self):
+        """Processa o que ainda está na fila e fecha o fluxo de resultados"""
+        await self._entrada.put(_FIM)
+        await self._tarefa
+        self._executor.shutdown(wait=True)
+
+    async def receber(self, leitura):
+        """Enfileira uma leitura (dict com 'talhao' e os campos dos sensores)"""
+        self.leituras_recebidas += 1
+        await self._entrada.put((leitura, asyncio.get_running_loop().time()))
+
+    async def resultados(self):
+        """Recomendações por talhão, entregues assim que cada lote é processado"""
+        while True:
+            resultado = await self._saida.get()
+            if resultado is _FIM:
+                return
+            yield resultado
+
+    def processar_lote(self, leituras):
+        """Recomendação (e previsão do modelo de irrigação) para um lote de leituras
+
+        Com controle, todas as leituras passam pela máquina de estados e só as
+        transições de irrigação seguem adiante.
+        """
+        df = pd.DataFrame(leituras)
+
+        if self.controle is not None:
+            df['timestamp'] = pd.to_datetime(df['timestamp']) if 'timestamp' in df else pd.Timestamp.now()
+            return self.sistema.controlar_irrigacao(df, self.controle, self.previsao_clima, self.usar_modelo)
+
+        # Várias leituras do mesmo talhão na janela: vale a mais recente
+        if 'talhao' in df:
+            df = df.drop_duplicates('talhao', keep='last')
+
+        resultado = self.sistema.recomendar_lote(df, self.previsao_clima, self.usar_modelo)
+
+        if self.pipeline is not None and 'irrigacao' in self.pipeline.models:
+            # A coluna sempre sai com o modelo configurado: NaN nas linhas sem todas as features
+            resultado['irrigacao_prevista'] = self._prever_irrigacao(df)
+
+        identificacao = [coluna for coluna in ('talhao', 'timestamp') if coluna in df]
+        return pd.concat([df[identificacao], resultado], axis=1)
+
+    def _prever_irrigacao(self, df):
+        """Previsão do modelo de irrigação por linha; NaN onde falta alguma feature"""
+        previsoes = np.full(len(df), np.nan)
+        features = self.pipeline.preparar_features(df)['irrigacao']
+        entradas = df.assign(nutrientes_total=df.get('nitrogenio', 0) + df.get('fosforo', 0) +
+                             df.get('potassio', 0))
+
+        ausentes = [feature for feature in features if feature not in entradas]
+        if ausentes:
+            print(f"Previsão de irrigação indisponível no lote: faltam as features {ausentes}")
+            return previsoes
+
+        completas = entradas[features].notna().all(axis=1).to_numpy()
+        if completas.any():
+            previsoes[completas] = self.pipeline.fazer_previsoes_em_lote('irrigacao', entradas.loc[completas, features])
+        return previsoes
+
+    async def _proximo_lote(self, loop):
+        """Espera a primeira leitura e junta as que chegarem até o fim da janela"""
+        item = await self._entrada.get()
+        if item is _FIM:
+            return [], True
+
+        lote = [item]
+        prazo = loop.time() + self.janela_segundos
+
+        while len(lote) < self.tamanho_maximo_lote:
+            if self._entrada.empty():
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._entrada.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._entrada.get_nowait()
+
+            if item is _FIM:
+                return lote, True
+            lote.append(item)
+
+        return lote, False
+
+    async def _agrupar(self):
+        loop = asyncio.get_running_loop()
+        fim = False
+
+        while not fim:
+            lote, fim = await self._proximo_lote(loop)
+            if not lote:
+                continue
+
+            # Uma leitura malformada é descartada sozinha, sem derrubar o lote
+            leituras = []
+            chegadas = []
+            for leitura, chegada in lote:
+                try:
+                    leituras.append(validar_leitura(leitura))
+                except (TypeError, ValueError):
+                    self.leituras_invalidas += 1
+                    continue
+                chegadas.append(chegada)
+            if not leituras:
+                continue
+
+            try:
+                # O processamento roda fora do event loop, que segue aceitando leituras
+                resultado = await loop.run_in_executor(self._executor, self.processar_lote, leituras)
+            except Exception as e:
+                print(f"Erro ao processar lote de {len(leituras)} leituras: {e}")
+                self.lotes_com_erro += 1
+                continue
+
+            self.lotes_processados += 1
+            concluido = loop.time()
+            for posicao, registro in zip(resultado.index, resultado.to_dict('records')):
+                registro['latencia_ms'] = (concluido - chegadas[posicao]) * 1000
+                await self._saida.put(registro)
+
+        await self._saida.put(_FIM)
+
+    async def _atender_conexao(self, reader, writer):
+        # Protocolo: uma leitura JSON por linha
+        try:
+            async for linha in reader:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    leitura = json.loads(linha)
+                except ValueError:
+                    # Linha malformada também conta como recebida: inválidas <= recebidas
+                    self.leituras_recebidas += 1
+                    self.leituras_invalidas += 1
+                    continue
+                await self.receber(leitura)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def servir_tcp(self, host='127.0.0.1', porta=PORTA_PADRAO):
+        """Endpoint TCP local: cada sonda envia leituras JSON, uma por linha"""
+        return await asyncio.start_server(self._atender_conexao, host, porta)
+
+    async def reproduzir_arquivo(self, arquivo_path="../data/dados_treinamento.csv", aceleracao=None):
+        """Reenvia as leituras de um CSV como se viessem das sondas
+
+        Sem coluna 'talhao', cada linha é tratada como uma sonda diferente. Com
+        aceleracao, respeita os intervalos entre os timestamps divididos por ela;
+        sem, envia o mais rápido que a fila aceitar.
+        """
+        linha = 0
+        anterior = None
+
+        for bloco in ler_csv_em_blocos(arquivo_path):
+            if 'talhao' not in bloco:
+                bloco['talhao'] = range(linha, linha + len(bloco))
+            linha += len(bloco)
+
+            for leitura in bloco.to_dict('records'):
+                if aceleracao and anterior is not None:
+                    intervalo = (leitura['timestamp'] - anterior).total_seconds() / aceleracao
+                    await asyncio.sleep(max(0.0, intervalo))
+                anterior = leitura['timestamp']
+                await self.receber(leitura)
+
+async def _executar(args):
+    sistema = SistemaRecomendacoes()
+    sistema.carregar_modelos()
+
+    pipeline = FarmTechMLPipeline()
+    if not pipeline.carregar_modelos():
+        pipeline = None
+
+    controle = ControleIrrigacao() if args.transicoes else None
+
+    async with ServicoIngestao(sistema, pipeline, janela_segundos=args.janela, controle=controle) as servico:
+        async def exibir():
+            async for resultado in servico.resultados():
+                print(f"Talhão {resultado['talhao']}: {resultado['acao']} "
+                      f"({resultado['volume_litros']} L, prioridade {resultado['prioridade']}) "
+                      f"- {resultado['latencia_ms']:.1f} ms")
+
+        exibicao = asyncio.get_running_loop().create_task(exibir())
+
+        if args.replay:
+            await servico.reproduzir_arquivo(args.replay, args.aceleracao)
+        else:
+            servidor = await servico.servir_tcp(args.host, args.porta)
+            print(f"Recebendo leituras em {args.host}:{args.porta}")
+            async with servidor:
+                await servidor.serve_forever()
+
+    await exibicao
+    print(f"\n{servico.leituras_recebidas} leituras ({servico.leituras_invalidas} inválidas), "
+          f"{servico.lotes_processados} lotes ({servico.lotes_com_erro} com erro)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço de ingestão de leituras dos sensores")
+    parser.add_argument('--replay', help="CSV reproduzido no lugar da rede IoT")
+    parser.add_argument('--aceleracao', type=float, default=None,
+                        help="Fator de aceleração do replay (padrão: o mais rápido possível)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--janela', type=float, default=0.25, help="Janela de agrupamento em segundos")
+    parser.add_argument('--transicoes', action='store_true',
+                        help="Emite só as mudanças de estado da irrigação (histerese por talhão)")
+    args = parser.parse_args()
+
+    asyncio.run(_executar(args))
+
+if __name__ == "__main__":
+    main()